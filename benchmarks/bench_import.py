@@ -0,0 +1,97 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Import-time benchmark: how long a fresh interpreter takes to run
+# `import glpi` (and a few common follow-up imports), compared with a bare
+# interpreter start.
+#
+#   python benchmarks/bench_import.py --runs 20 --max-ms 30
+#
+# Each statement is timed against a bare start run right before it, and
+# the package is byte-compiled first (as installed packages are), so the
+# overhead doesn't include compiling the sources. Exits with status 1 when
+# the median overhead is above --max-ms.
+
+from __future__ import print_function
+
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    'import glpi',
+    'from glpi import GLPI, Ticket',
+    'from glpi import GLPI; GLPI("http://localhost", "app", "user")',
+]
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def _time(statement, env):
+    """ Wall time (ms) of `python -c statement`. """
+    start = time.time()
+    subprocess.check_call([sys.executable, '-c', statement], env=env)
+    return (time.time() - start) * 1000.0
+
+
+def run(statement, runs):
+    """
+    Median wall time (ms) of `python -c pass`, and median overhead of
+    `python -c statement` over it, over runs interleaved runs.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    baselines = []
+    overheads = []
+    for _ in range(runs):
+        baseline = _time('pass', env)
+        baselines.append(baseline)
+        overheads.append(_time(statement, env) - baseline)
+    return _median(baselines), _median(overheads)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time `import glpi` in fresh interpreters.')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if any overhead exceeds this (ms)')
+    args = parser.parse_args()
+
+    compileall.compile_dir(os.path.join(ROOT, 'glpi'), quiet=1)
+
+    worst = 0.0
+    for statement in STATEMENTS:
+        baseline, overhead = run(statement, args.runs)
+        worst = max(worst, overhead)
+        print('%-60s %+8.1f ms (python -c pass: %.1f ms)' % (
+            statement, overhead, baseline))
+
+    if args.max_ms is not None and worst > args.max_ms:
+        print('Import overhead %.1f ms is above %.1f ms' % (
+            worst, args.max_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Transport benchmark: requests per second and latency percentiles of
+# GlpiService reads through each transport, against a local fake GLPI
+# server (or a real one with --url, --app-token and --user-token).
+#
+#   python benchmarks/bench_transport.py --requests 2000 --threads 8
+#
+# Transports whose optional dependency is missing are skipped. The local
+# server only speaks HTTP/1.1: compare HTTP/2 against a real server.
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from glpi.glpi import GlpiService  # noqa: E402
+from glpi.transport import RequestsTransport, Urllib3Transport, \
+    HttpxTransport  # noqa: E402
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are separate writes: don't let Nagle delay them
+    disable_nagle_algorithm = True
+    delay = 0.0
+    page = b'[]'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith('/apirest.php/initSession'):
+            body = b'{"session_token": "bench"}'
+        else:
+            if self.delay:
+                time.sleep(self.delay)
+            body = self.page
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Content-Range', '0-49/50')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_server(rows, delay):
+    Handler.delay = delay
+    Handler.page = json.dumps([
+        {'id': i, 'name': 'Ticket %d' % i, 'status': 2,
+         'date_mod': '2017-01-01 00:00:00'} for i in range(rows)
+    ]).encode('utf-8')
+    httpd = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return httpd, 'http://127.0.0.1:%d/apirest.php' % httpd.server_address[1]
+
+
+def transports():
+    """ (name, factory) of every transport to compare. """
+    yield 'requests.request (default)', lambda: None
+    yield 'RequestsTransport', RequestsTransport
+    yield 'Urllib3Transport', Urllib3Transport
+    yield 'HttpxTransport http/1.1', lambda: HttpxTransport(http2=False)
+    yield 'HttpxTransport http/2', lambda: HttpxTransport(http2=True)
+
+
+def bench(service, requests_count, threads, path):
+    latencies = []
+    lock = threading.Lock()
+
+    def one(_):
+        started = time.time()
+        service.get_range(path, 0, 49)
+        with lock:
+            latencies.append(time.time() - started)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests_count)))
+    elapsed = time.time() - started
+    latencies.sort()
+    return (requests_count / elapsed,
+            latencies[len(latencies) // 2] * 1000.0,
+            latencies[int(len(latencies) * 0.99)] * 1000.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare the throughput of the HTTP transports.')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=50,
+                        help='rows per page of the local server')
+    parser.add_argument('--delay-ms', type=float, default=0.0,
+                        help='server latency of the local server')
+    parser.add_argument('--url', help='GLPI apirest.php URL')
+    parser.add_argument('--app-token')
+    parser.add_argument('--user-token')
+    parser.add_argument('--path', default='Ticket')
+    args = parser.parse_args()
+
+    httpd = None
+    url, app_token, user_token = args.url, args.app_token, args.user_token
+    if url is None:
+        httpd, url = start_server(args.rows, args.delay_ms / 1000.0)
+        app_token, user_token = 'app', 'user'
+
+    print('%-28s %10s %10s %10s' % ('transport', 'req/s', 'p50 ms',
+                                    'p99 ms'))
+    try:
+        for name, factory in transports():
+            try:
+                transport = factory()
+            except ImportError as e:
+                print('%-28s skipped: %s' % (name, e))
+                continue
+            service = GlpiService(url, app_token, token_auth=user_token,
+                                  transport=transport)
+            service.get_session_token()
+            # warm up the connections
+            bench(service, args.threads, args.threads, args.path)
+            rate, p50, p99 = bench(service, args.requests, args.threads,
+                                   args.path)
+            print('%-28s %10.0f %10.2f %10.2f' % (name, rate, p50, p99))
+            if transport is not None:
+                transport.close()
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
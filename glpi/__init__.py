@@ -12,15 +12,69 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import sys
+from importlib import import_module
+
 from .version import __version__  # noqa
-from .glpi import GLPI  # noqa
-from .glpi_item import GlpiItem  # noqa
-from .item_profile import GlpiProfile  # noqa
-from .item_knowbase import GlpiKnowBase  # noqa
-from .item_knowbase import KnowBase  # noqa
-from .item_ticket import GlpiTicket  # noqa
-from .item_ticket import Ticket  # noqa
-from .item_problem import GlpiProblem  # noqa
-from .item_problem import Problem  # noqa
-from .item_network_equipment import GlpiNetworkEquipment  # noqa
-from .item_network_equipment import NetworkEquipment  # noqa
+
+# Public names and the submodule defining them. They are imported on first
+# access (PEP 562), so `import glpi` stays cheap for short-lived scripts.
+_LAZY_EXPORTS = {
+    'GLPI': 'glpi',
+    'GlpiService': 'glpi',
+    'GlpiException': 'glpi',
+    'GlpiInvalidArgument': 'glpi',
+    'GlpiTimeout': 'glpi',
+    'Deadline': 'glpi',
+    'GlpiItem': 'glpi_item',
+    'ColumnarResult': 'resultset',
+    'SessionCache': 'session_cache',
+    'Mirror': 'mirror',
+    'Watcher': 'watcher',
+    'WriteQueue': 'write_queue',
+    'Outbox': 'outbox',
+    'Resolver': 'resolver',
+    'DropdownCache': 'resolver',
+    'MultiGLPI': 'fanout',
+    'Hedger': 'hedge',
+    'Cassette': 'cassette',
+    'KnowBaseIndex': 'knowbase_index',
+    'RequestsTransport': 'transport',
+    'Urllib3Transport': 'transport',
+    'HttpxTransport': 'transport',
+    'SearchQuery': 'search',
+    'Param': 'search',
+    'GlpiProfile': 'item_profile',
+    'GlpiKnowBase': 'item_knowbase',
+    'KnowBase': 'item_knowbase',
+    'GlpiTicket': 'item_ticket',
+    'Ticket': 'item_ticket',
+    'GlpiProblem': 'item_problem',
+    'Problem': 'item_problem',
+    'GlpiNetworkEquipment': 'item_network_equipment',
+    'NetworkEquipment': 'item_network_equipment',
+    'GlpiDocument': 'item_document',
+    'Document': 'item_document',
+}
+
+__all__ = ['__version__'] + sorted(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(
+            "module '%s' has no attribute '%s'" % (__name__, name))
+    value = getattr(import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ before Python 3.7: import everything now
+    for _name in _LAZY_EXPORTS:
+        __getattr__(_name)
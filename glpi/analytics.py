@@ -0,0 +1,232 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Ticket and problem analytics with NumPy/pandas.
+#
+#   tickets = to_frame(glpi.get_all('ticket', columnar=True))
+#   sla_summary(tickets, by='itilcategories_id')
+#
+# numpy and pandas are optional: they're imported when used.
+
+from collections import OrderedDict
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from .resultset import ColumnarResult, _import_optional
+from .sync import DATE_FORMAT
+
+# datetime fields of tickets and problems ('YYYY-MM-DD HH:MM:SS')
+DATE_FIELDS = ('date', 'date_mod', 'date_creation', 'solvedate',
+               'closedate', 'due_date', 'time_to_resolve', 'time_to_own',
+               'begin_waiting_date')
+
+# durations in seconds
+DURATION_FIELDS = ('actiontime', 'close_delay_stat', 'solve_delay_stat',
+                   'takeintoaccount_delay_stat', 'waiting_duration',
+                   'sla_waiting_duration')
+
+# *_delay_stat are 0 until the ticket reaches that step
+DELAY_FIELDS = ('takeintoaccount_delay_stat', 'solve_delay_stat',
+                'close_delay_stat')
+
+INTEGER_FIELDS = ('id', 'status', 'priority', 'urgency', 'impact', 'type',
+                  'is_deleted', 'global_validation',
+                  'validation_percent') + DURATION_FIELDS
+
+# summarized durations, in seconds ('resolution_time' = solvedate - date)
+SLA_DURATIONS = ('resolution_time', 'takeintoaccount_delay_stat',
+                 'solve_delay_stat', 'waiting_duration')
+
+
+def _is_integer_field(name):
+    return name in INTEGER_FIELDS or name.endswith('_id') or \
+        '_id_' in name
+
+
+def _parse_dates(pd, series):
+    """ datetime64 Series of GLPI dates; empty or invalid dates are NaT. """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # parse each distinct value once
+        categories = pd.to_datetime(series.cat.categories.astype(str),
+                                    format=DATE_FORMAT, errors='coerce')
+        values = categories.take(series.cat.codes.to_numpy(),
+                                 allow_fill=True, fill_value=pd.NaT)
+        return pd.Series(values, index=series.index, name=series.name)
+    return pd.to_datetime(series.astype(object), format=DATE_FORMAT,
+                          errors='coerce')
+
+
+def _integers(pd, series):
+    """
+    Int64 Series of series, None when some values aren't numbers (names
+    of expanded dropdowns): those columns are left as they are.
+    """
+    values = series
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    numbers = pd.to_numeric(values, errors='coerce')
+    missing = values.isna() | (values.astype(object) == '')
+    if (numbers.isna() & ~missing).any():
+        return None
+    return numbers.round().astype('Int64')
+
+
+def _rows(result):
+    if isinstance(result, dict):
+        return result.get('data', [])
+    return result
+
+
+def to_frame(result, columns=None):
+    """
+    pandas DataFrame of a get_all/get_many/search_engine result (rows,
+    ColumnarResult, or the search dict).
+
+    Date fields (DATE_FIELDS) become datetime64 columns, IDs, foreign
+    keys, statuses and durations nullable Int64 columns, unless they
+    hold names (expand_dropdowns=True): those stay as they are.
+    columns renames columns first: search results are keyed by search
+    option ID ({'12': 'status', '15': 'date', ...}).
+    """
+    pd = _import_optional('pandas')
+    rows = _rows(result)
+    if isinstance(rows, ColumnarResult):
+        frame = rows.to_pandas()
+    else:
+        frame = pd.DataFrame.from_records(
+            [dict(row) for row in rows if isinstance(row, Mapping)])
+    if columns:
+        frame = frame.rename(columns=dict(
+            (str(k), v) for k, v in columns.items()))
+
+    for name in frame.columns:
+        if name in DATE_FIELDS:
+            frame[name] = _parse_dates(pd, frame[name])
+        elif _is_integer_field(name) and frame[name].dtype != 'Int64':
+            numbers = _integers(pd, frame[name])
+            if numbers is not None:
+                frame[name] = numbers
+    return frame
+
+
+def to_arrays(result, columns=None):
+    """
+    NumPy arrays of the columns of to_frame(): dates as datetime64 (NaT
+    for missing), integers as int64, or float64 with NaN when some are
+    missing, other columns as object arrays.
+    """
+    np = _import_optional('numpy')
+    frame = to_frame(result, columns)
+    arrays = OrderedDict()
+    for name in frame.columns:
+        series = frame[name]
+        if series.dtype == 'Int64':
+            if series.isna().any():
+                arrays[name] = series.to_numpy(dtype=np.float64,
+                                               na_value=np.nan)
+            else:
+                arrays[name] = series.to_numpy(dtype=np.int64)
+        else:
+            arrays[name] = series.to_numpy()
+    return arrays
+
+
+def _seconds(pd, frame, name):
+    """ float64 seconds of a duration column, NaN when not reached. """
+    values = frame[name].astype('float64')
+    if name in DELAY_FIELDS:
+        values = values.where(values > 0)
+    return values
+
+
+def sla_summary(data, by=None, now=None, percentiles=(0.5, 0.9)):
+    """
+    SLA and time-to-resolve summary of tickets or problems (a to_frame()
+    DataFrame, or anything to_frame() accepts), overall or per `by`
+    column(s).
+
+    Columns: count, solved, then for each of SLA_DURATIONS found the
+    mean and percentiles in seconds (resolution_time_mean,
+    resolution_time_p50, ...), and the number and rate of breached
+    deadlines: ttr_breached (solved, or still open at `now`, after
+    time_to_resolve/due_date) and tto_breached (taken into account after
+    time_to_own). Durations still at 0 (*_delay_stat of steps not
+    reached) are left out of the statistics.
+    """
+    pd = _import_optional('pandas')
+    frame = data if isinstance(data, pd.DataFrame) else to_frame(data)
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    fields = set(frame.columns)
+
+    work = pd.DataFrame(index=frame.index)
+    if 'solvedate' in fields:
+        work['solved'] = frame['solvedate'].notna()
+    elif 'status' in fields:
+        work['solved'] = frame['status'].isin([5, 6]).fillna(False)
+    else:
+        work['solved'] = False
+
+    durations = []
+    for name in SLA_DURATIONS:
+        if name == 'resolution_time' and \
+                fields.issuperset(('date', 'solvedate')):
+            work[name] = (frame['solvedate'] - frame['date']) \
+                .dt.total_seconds()
+        elif name in fields:
+            work[name] = _seconds(pd, frame, name)
+        else:
+            continue
+        durations.append(name)
+
+    breaches = []
+    # due_date was renamed time_to_resolve in GLPI 9.2
+    deadline_field = 'time_to_resolve' if 'time_to_resolve' in fields \
+        else 'due_date'
+    if deadline_field in fields:
+        deadline = frame[deadline_field]
+        solved_at = frame['solvedate'].fillna(now) \
+            if 'solvedate' in fields else pd.Series(now, index=frame.index)
+        work['ttr_breached'] = (solved_at > deadline) & deadline.notna()
+        breaches.append('ttr_breached')
+    if fields.issuperset(('time_to_own', 'date',
+                          'takeintoaccount_delay_stat')):
+        deadline = frame['time_to_own']
+        delay = _seconds(pd, frame, 'takeintoaccount_delay_stat')
+        taken_at = (frame['date'] + pd.to_timedelta(delay, unit='s')) \
+            .fillna(now)
+        work['tto_breached'] = (taken_at > deadline) & deadline.notna()
+        breaches.append('tto_breached')
+
+    if by is None:
+        keys = pd.Series('all', index=frame.index, name='group')
+    elif isinstance(by, (list, tuple)):
+        keys = [frame[column] for column in by]
+    else:
+        keys = frame[by]
+    grouped = work.groupby(keys, observed=True, dropna=False)
+
+    summary = pd.DataFrame({'count': grouped.size()})
+    summary['solved'] = grouped['solved'].sum()
+    for name in durations:
+        summary[name + '_mean'] = grouped[name].mean()
+        for p in percentiles:
+            summary['%s_p%d' % (name, round(p * 100))] = \
+                grouped[name].quantile(p)
+    for name in breaches:
+        summary[name] = grouped[name].sum()
+        summary[name + '_rate'] = summary[name] / summary['count']
+    return summary
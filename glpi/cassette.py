@@ -0,0 +1,214 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Recording and replay of GLPI requests.
+#
+#   cassette = Cassette('prod.cassette')
+#   glpi = GLPI(url, apptoken, auth, transport=cassette.recorder())
+#   ...                              # requests are recorded
+#   glpi = GLPI(url, apptoken, auth, transport=cassette.player(speed=2))
+#   ...                              # same calls, served from the file
+
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+from .glpi import GlpiException
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Python 2
+    from urlparse import urlsplit
+
+
+def _body_key(value):
+    """ Request body as text for the request key. """
+    if value is None:
+        return None
+    if hasattr(value, 'read') or (
+            hasattr(value, '__iter__') and
+            not isinstance(value, (bytes, str, dict, list, tuple))):
+        # streamed upload, not read for the key
+        return '<stream>'
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+def request_key(method, url, params=None, data=None, json_body=None):
+    """
+    Key of a request: method, URL path, parameters and body. The host
+    and headers (session token...) are not part of it, so a cassette
+    replays against any server and session.
+    """
+    path = urlsplit(url).path
+    parts = [method.upper(), path,
+             sorted((params or {}).items()),
+             _body_key(data), json_body]
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class RecordedResponse(object):
+    """ Response served from a cassette (the parts GlpiService uses). """
+
+    def __init__(self, status_code, headers, content, url=None):
+        from requests.structures import CaseInsensitiveDict
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.encoding = 'utf-8'
+        self.closed = False
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self, **kwargs):
+        return json.loads(self.text, **kwargs)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class Cassette(object):
+    """
+    Request/response pairs stored in a SQLite file, bodies compressed
+    with zlib and indexed by request key (see request_key()).
+
+    recorder() and player() return transports for GlpiService/GLPI
+    (transport=...). A request recorded several times (polling, pages
+    of a changing list) is replayed in the recorded order, then the last
+    response is served again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS interactions ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, '
+            'method TEXT, url TEXT, status INTEGER, headers TEXT, '
+            'body BLOB, started REAL, elapsed REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS interactions_key '
+                          'ON interactions (key, seq)')
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute(
+                'SELECT COUNT(*) FROM interactions').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def add(self, key, method, url, response, started, elapsed):
+        """ Store one response. """
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO interactions (key, method, url, status, '
+                'headers, body, started, elapsed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, method.upper(), url, response.status_code,
+                 json.dumps(dict(response.headers)),
+                 sqlite3.Binary(zlib.compress(response.content or b'')),
+                 started, elapsed))
+            self.conn.commit()
+
+    def responses(self, key):
+        """ [(status, headers, body, elapsed)] recorded for key. """
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT status, headers, body, elapsed FROM interactions '
+                'WHERE key = ? ORDER BY seq', (key,)).fetchall()
+        return [(status, json.loads(headers), zlib.decompress(body),
+                 elapsed) for status, headers, body, elapsed in rows]
+
+    def recorder(self, transport=None):
+        return Recorder(self, transport)
+
+    def player(self, speed=None):
+        return Player(self, speed)
+
+
+class Recorder(object):
+    """
+    Transport sending requests with `transport` (requests by default)
+    and recording every response in the cassette.
+    """
+
+    def __init__(self, cassette, transport=None):
+        self.cassette = cassette
+        self.transport = transport
+
+    def __call__(self, method, url, params=None, data=None, json=None,
+                 **kwargs):
+        transport = self.transport
+        if transport is None:
+            import requests
+            transport = requests.request
+        started = time.time()
+        response = transport(method, url, params=params, data=data,
+                             json=json, **kwargs)
+        # reads the body of streamed downloads too, it stays available
+        response.content
+        self.cassette.add(request_key(method, url, params, data, json),
+                          method, url, response, started,
+                          time.time() - started)
+        return response
+
+
+class Player(object):
+    """
+    Transport answering requests from the cassette, without network.
+
+    speed None answers at once; otherwise each response is delayed by
+    its recorded latency divided by speed (1 for the original timing).
+    A request that was never recorded raises GlpiException.
+    """
+
+    def __init__(self, cassette, speed=None):
+        self.cassette = cassette
+        self.speed = speed
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, params=None, data=None, json=None,
+                 **kwargs):
+        key = request_key(method, url, params, data, json)
+        responses = self.cassette.responses(key)
+        if not responses:
+            raise GlpiException('No recorded response for %s %s' % (
+                method.upper(), url))
+        with self._lock:
+            index = min(self._served.get(key, 0), len(responses) - 1)
+            self._served[key] = index + 1
+        status, headers, body, elapsed = responses[index]
+        if self.speed:
+            time.sleep(elapsed / float(self.speed))
+        return RecordedResponse(status, headers, body, url)
+
+    def rewind(self):
+        """ Serve every recorded sequence from its start again. """
+        with self._lock:
+            self._served.clear()
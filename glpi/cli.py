@@ -0,0 +1,209 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# `glpi` command line tool.
+#
+# Connection settings come from options or the environment: GLPI_URL,
+# GLPI_APP_TOKEN, and GLPI_USER_TOKEN or GLPI_USERNAME/GLPI_PASSWORD.
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import argparse
+
+from .glpi import GLPI, GlpiException
+from .session_cache import SessionCache
+from . import export as export_module
+from . import importer as importer_module
+
+
+def _split(value):
+    if not value:
+        return None
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def add_connection_arguments(parser):
+    group = parser.add_argument_group('connection')
+    group.add_argument('--url', default=os.getenv('GLPI_URL'),
+                       help='API URL, like http://glpi/apirest.php '
+                            '(env GLPI_URL)')
+    group.add_argument('--app-token', default=os.getenv('GLPI_APP_TOKEN'),
+                       help='App-Token (env GLPI_APP_TOKEN)')
+    group.add_argument('--user-token', default=os.getenv('GLPI_USER_TOKEN'),
+                       help='user API token (env GLPI_USER_TOKEN)')
+    group.add_argument('--username', default=os.getenv('GLPI_USERNAME'),
+                       help='login, instead of a user token '
+                            '(env GLPI_USERNAME)')
+    group.add_argument('--password', default=os.getenv('GLPI_PASSWORD'),
+                       help='password (env GLPI_PASSWORD)')
+    group.add_argument('--session-cache', action='store_true',
+                       help='reuse session tokens between runs')
+
+
+def connect(args):
+    """ GLPI connection from the parsed connection arguments. """
+    if not args.url or not args.app_token:
+        raise GlpiException('--url and --app-token are required')
+    if args.user_token:
+        auth = args.user_token
+    elif args.username and args.password:
+        auth = (args.username, args.password)
+    else:
+        raise GlpiException(
+            'Use --user-token, or --username and --password')
+
+    cache = SessionCache() if args.session_cache else None
+    glpi = GLPI(args.url, args.app_token, auth, session_cache=cache)
+    glpi.init_api()
+    return glpi
+
+
+def _open_output(path, resume):
+    if path is None or path == '-':
+        if resume:
+            raise GlpiException('--resume needs --output FILE')
+        return getattr(sys.stdout, 'buffer', sys.stdout), None
+    if resume and os.path.exists(path):
+        return open(path, 'r+b'), path + '.state'
+    return open(path, 'wb'), path + '.state'
+
+
+def cmd_export(args):
+    glpi = connect(args)
+    fields = _split(args.fields)
+    params = {}
+    path = args.itemtype
+
+    if args.criteria:
+        criteria = json.loads(args.criteria)
+        if isinstance(criteria, list):
+            criteria = {'criteria': criteria}
+        query, forcedisplay = glpi.build_search_query(
+            args.itemtype, criteria, _split(args.forcedisplay))
+        path = 'search/' + query
+        params['uid_cols'] = True
+        for idx, column in enumerate(forcedisplay or []):
+            params['forcedisplay[%d]' % idx] = column
+    elif args.expand_dropdowns:
+        params['expand_dropdowns'] = True
+
+    stream, state_path = _open_output(args.output, args.resume)
+    try:
+        written = export_module.export(
+            glpi.api_rest, path, stream, fmt=args.format, params=params,
+            fields=fields, page_size=args.page_size, workers=args.workers,
+            state_path=state_path, resume=args.resume)
+    finally:
+        if state_path is not None:
+            stream.close()
+
+    print('Exported %d rows' % written, file=sys.stderr)
+    return 0
+
+
+def _parse_mapping(value):
+    """ 'col=field,col2=field2' -> {'col': 'field', 'col2': 'field2'} """
+    if not value:
+        return None
+    mapping = {}
+    for pair in _split(value):
+        column, sep, field = pair.partition('=')
+        if not sep:
+            raise GlpiException('Invalid --map entry "%s", use col=field'
+                                % pair)
+        mapping[column.strip()] = field.strip()
+    return mapping
+
+
+def cmd_import(args):
+    glpi = connect(args)
+    importer = importer_module.Importer(
+        glpi.api_rest, args.itemtype, mapping=_parse_mapping(args.map),
+        external_id=args.external_id, batch_size=args.batch_size,
+        workers=args.workers, log_path=args.log)
+
+    source = args.input
+    if source == '-':
+        source = sys.stdin
+    stats = importer.import_file(source, fmt=args.format)
+
+    print(json.dumps(stats, sort_keys=True), file=sys.stderr)
+    return 0 if not (stats['failed'] or stats['invalid']) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='glpi',
+                                     description='GLPI REST API tool')
+    commands = parser.add_subparsers(dest='command')
+
+    p = commands.add_parser(
+        'export', help='stream an item type or a search to NDJSON/CSV')
+    add_connection_arguments(p)
+    p.add_argument('itemtype', help='item type, like Computer or Ticket')
+    p.add_argument('-f', '--format', choices=export_module.FORMATS,
+                   default='ndjson')
+    p.add_argument('-o', '--output', help='output file (default: stdout)')
+    p.add_argument('--fields', help='comma separated keys to keep')
+    p.add_argument('--criteria',
+                   help='search criteria as JSON: a list of '
+                        '{"field", "searchtype", "value", "link"}')
+    p.add_argument('--forcedisplay',
+                   help='comma separated search columns (with --criteria)')
+    p.add_argument('--expand-dropdowns', action='store_true',
+                   help='return dropdown names instead of IDs')
+    p.add_argument('--page-size', type=int, default=500)
+    p.add_argument('--workers', type=int, default=4,
+                   help='pages fetched in parallel')
+    p.add_argument('--resume', action='store_true',
+                   help='continue an interrupted export to --output')
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser(
+        'import', help='create items from a CSV/NDJSON file')
+    add_connection_arguments(p)
+    p.add_argument('itemtype',
+                   help='Ticket, Problem, KnowBase, NetworkEquipment, ...')
+    p.add_argument('input', help='CSV or NDJSON file, - for stdin')
+    p.add_argument('-f', '--format', choices=('ndjson', 'csv'),
+                   help='input format (default: from the file extension)')
+    p.add_argument('--map', help='column mapping: col=field,col2=field2')
+    p.add_argument('--external-id',
+                   help='column identifying rows across runs; rows '
+                        'created by a previous run (see --log) are skipped')
+    p.add_argument('--log', help='per-row result log (NDJSON)')
+    p.add_argument('--batch-size', type=int, default=100)
+    p.add_argument('--workers', type=int, default=4)
+    p.set_defaults(func=cmd_import)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return 2
+    try:
+        return args.func(args)
+    except (GlpiException, ValueError) as e:
+        print('glpi: error: %s' % e, file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Python 2/3 compatibility helpers.
+
+import os
+import sys
+
+PY2 = sys.version_info[0] == 2
+
+try:
+    text_type = unicode  # noqa: F821
+except NameError:
+    text_type = str
+
+# Atomically move src over dest: os.replace overwrites dest on every
+# platform, Python 2 only has rename
+replace_file = getattr(os, 'replace', os.rename)
+
+
+def to_bytes(value, encoding='utf-8'):
+    """ value as bytes: text is encoded, byte strings (py2 str) kept. """
+    if isinstance(value, text_type):
+        return value.encode(encoding)
+    return value
@@ -0,0 +1,237 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Streaming bulk export of items and searches to NDJSON or CSV.
+
+import io
+import os
+import csv
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .glpi import GlpiInvalidArgument, Deadline
+from .compat import PY2, replace_file, to_bytes
+
+FORMATS = ('ndjson', 'csv')
+
+
+class NdjsonWriter(object):
+    """ One compact JSON object per line. """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def state(self):
+        return {}
+
+    def write_rows(self, rows):
+        # on Python 2 dumps() gives str or unicode depending on the row
+        lines = [to_bytes(json.dumps(row, separators=(',', ':'),
+                                     ensure_ascii=False)) + b'\n'
+                 for row in rows]
+        if lines:
+            self.stream.write(b''.join(lines))
+
+
+class CsvWriter(object):
+    """
+    CSV with a header line. Columns are fields, or the keys of the first
+    row; nested values are written as JSON.
+    """
+
+    def __init__(self, stream, fields=None, header_written=False):
+        self.stream = stream
+        self.fields = list(fields) if fields else None
+        self.header_written = header_written
+
+    def state(self):
+        return {'csv_fields': self.fields}
+
+    def _cell(self, value):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, separators=(',', ':'),
+                              ensure_ascii=False)
+        if value is None:
+            return ''
+        return value
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        if self.fields is None:
+            self.fields = list(rows[0])
+        if PY2:
+            # the Python 2 csv module writes UTF-8 encoded str
+            buf, encode = io.BytesIO(), to_bytes
+        else:
+            buf, encode = io.StringIO(), lambda value: value
+        writer = csv.writer(buf, lineterminator='\n')
+        if not self.header_written:
+            writer.writerow([encode(f) for f in self.fields])
+            self.header_written = True
+        for row in rows:
+            writer.writerow([encode(self._cell(row.get(f)))
+                             for f in self.fields])
+        self.stream.write(to_bytes(buf.getvalue()))
+
+
+def make_writer(fmt, stream, fields=None, state=None):
+    """ Writer for fmt, continuing the given resume state if any. """
+    if fmt == 'ndjson':
+        return NdjsonWriter(stream)
+    if fmt == 'csv':
+        if state is not None:
+            return CsvWriter(stream, state.get('csv_fields'),
+                             header_written=True)
+        return CsvWriter(stream, fields)
+    raise GlpiInvalidArgument('Unknown export format "%s". Use one of: %s'
+                              % (fmt, ', '.join(FORMATS)))
+
+
+def iter_pages(fetch, page_size, start=0, workers=1):
+    """
+    Yield (start, rows) pages in order.
+
+    fetch(start, end) returns (rows, total). The first page tells the
+    total, then up to `workers` pages are fetched concurrently; at most
+    2 * workers pages are held in memory at any time. Workers run under
+    the caller's Deadline; pages not started yet are cancelled when a
+    fetch fails.
+    """
+    fetch = Deadline.bind(fetch)
+    rows, total = fetch(start, start + page_size - 1)
+    yield start, rows
+
+    if total is None:
+        # no total from the server: walk until a short page
+        while len(rows) == page_size:
+            start += page_size
+            rows, total = fetch(start, start + page_size - 1)
+            yield start, rows
+        return
+
+    starts = iter(range(start + page_size, total, page_size))
+    window = max(1, workers) * 2
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque()
+        for page_start in starts:
+            pending.append((page_start, pool.submit(
+                fetch, page_start, page_start + page_size - 1)))
+            if len(pending) >= window:
+                break
+        try:
+            while pending:
+                page_start, future = pending.popleft()
+                rows, _ = future.result()
+                yield page_start, rows
+                for next_start in starts:
+                    pending.append((next_start, pool.submit(
+                        fetch, next_start, next_start + page_size - 1)))
+                    break
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+class ExportState(object):
+    """
+    Progress of an export to a file, stored next to it so an interrupted
+    export can resume after the last completed page.
+    """
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+
+    def load(self):
+        """ Saved state matching this export, or None. """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if state.get('signature') != self.signature:
+            raise GlpiInvalidArgument(
+                'Resume state %s belongs to another export: %s' % (
+                    self.path, state.get('signature')))
+        return state
+
+    def save(self, next_start, offset, rows, writer_state):
+        state = {'signature': self.signature, 'next_start': next_start,
+                 'offset': offset, 'rows': rows}
+        state.update(writer_state)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        replace_file(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def export(service, path, stream, fmt='ndjson', params=None, fields=None,
+           page_size=500, workers=1, state_path=None, resume=False):
+    """
+    Export every row of path (an item type like 'Computer', or a search
+    URI like 'search/Ticket?criteria[0]...') to stream, a binary file.
+
+    Pages of page_size rows are fetched by `workers` threads and written
+    in order as they arrive, so memory use doesn't grow with the export.
+    With state_path, progress is saved after each page; resume=True then
+    continues a previous interrupted run from its last completed page
+    (stream must be a seekable file opened for update).
+    Returns the number of rows written in total.
+    """
+    signature = {'path': path, 'params': params or {},
+                 'fields': fields, 'format': fmt, 'page_size': page_size}
+    state = None
+    saved = None
+    start = 0
+    written = 0
+    if state_path is not None:
+        state = ExportState(state_path, signature)
+        if resume:
+            saved = state.load()
+        else:
+            state.clear()
+        if saved is not None:
+            start = saved['next_start']
+            written = saved['rows']
+            stream.seek(saved['offset'])
+        else:
+            stream.seek(0)
+        stream.truncate()
+
+    writer = make_writer(fmt, stream, fields, saved)
+
+    def fetch(first, last):
+        return service.get_range(path, first, last, params=params,
+                                 fields=fields)
+
+    for page_start, rows in iter_pages(fetch, page_size, start, workers):
+        writer.write_rows(rows)
+        written += len(rows)
+        if state is not None:
+            stream.flush()
+            state.save(page_start + page_size, stream.tell(), written,
+                       writer.state())
+
+    stream.flush()
+    if state is not None:
+        state.clear()
+    return written
@@ -0,0 +1,187 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Fan-out of calls over several GLPI instances.
+#
+#   regions = MultiGLPI({'eu': GLPI(...), 'us': GLPI(...)}, timeout=10)
+#   result = regions.get_all('ticket')
+#   result.rows()        # every ticket, tagged with '_source'
+#   result.errors        # {'us': GlpiTimeout('Timed out after 10s')}
+
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .glpi import GlpiException, GlpiTimeout, Deadline
+
+
+def _rows(result):
+    """ Item rows of a get_all/get_many/search_engine result. """
+    if isinstance(result, dict):
+        result = result.get('data', [])
+    if isinstance(result, (list, tuple)):
+        return [row for row in result if isinstance(row, dict)]
+    return []
+
+
+class FanOutResult(object):
+    """
+    Results of one call on several instances.
+
+    results maps each instance that answered to its result, errors each
+    one that failed or timed out to the exception; seconds gives the
+    duration per instance. complete is False for partial results.
+    """
+
+    def __init__(self):
+        self.results = OrderedDict()
+        self.errors = OrderedDict()
+        self.seconds = {}
+
+    @property
+    def complete(self):
+        return not self.errors
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def rows(self, tag='_source'):
+        """
+        Rows of every instance in one list, tagged with their instance
+        name under `tag` (rows are modified in place).
+        """
+        rows = []
+        for name, result in self.results.items():
+            for row in _rows(result):
+                row[tag] = name
+                rows.append(row)
+        return rows
+
+    def __repr__(self):
+        return 'FanOutResult(results=%s, errors=%r)' % (
+            list(self.results), dict(self.errors))
+
+
+class MultiGLPI(object):
+    """
+    Run the same call on several GLPI instances at once.
+
+    instances maps names (regions...) to GLPI objects; each has its own
+    session and is used by one call at a time. timeout (seconds, or a
+    dict per instance name) bounds the wait for each instance: the
+    result of a call holds what arrived in time, the other instances are
+    reported in FanOutResult.errors. Each call runs under a Deadline of
+    its timeout, so the requests of a timed out instance are abandoned
+    soon after (see Deadline); a Deadline of the caller applies too.
+
+    GLPI methods return error messages (in a set) instead of raising;
+    those are reported as errors too.
+    """
+
+    def __init__(self, instances, timeout=30, workers=None):
+        self.instances = OrderedDict(instances)
+        self.timeout = timeout
+        self._locks = dict((name, threading.Lock())
+                           for name in self.instances)
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers or 2 * max(1, len(self.instances)))
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _timeout(self, name):
+        if isinstance(self.timeout, dict):
+            return self.timeout.get(name)
+        return self.timeout
+
+    def _call(self, name, deadline, method, args, kwargs):
+        with self._locks[name]:
+            function = getattr(self.instances[name], method)
+            if deadline is None:
+                result = function(*args, **kwargs)
+            else:
+                with deadline:
+                    result = function(*args, **kwargs)
+        if isinstance(result, set):
+            raise GlpiException('; '.join(sorted(result)))
+        return result
+
+    def stream(self, method, *args, **kwargs):
+        """
+        Call method on every instance and yield (name, result, error) as
+        each one finishes, then (name, None, error) for the instances
+        that timed out.
+        """
+        call = Deadline.bind(self._call)
+        futures = {}
+        deadlines = {}
+        for name in self.instances:
+            timeout = self._timeout(name)
+            deadline = None if timeout is None else Deadline(timeout)
+            if deadline is not None:
+                deadlines[name] = deadline.expires_at
+            future = self._pool.submit(call, name, deadline, method, args,
+                                       kwargs)
+            futures[future] = name
+        pending = set(futures)
+        while pending:
+            waiting = [deadlines[futures[f]] for f in pending
+                       if futures[f] in deadlines]
+            timeout = max(0, min(waiting) - time.time()) if waiting else None
+            done, pending = wait(pending, timeout=timeout,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                yield (futures[future],
+                       None if error else future.result(), error)
+            now = time.time()
+            for future in list(pending):
+                name = futures[future]
+                if name in deadlines and deadlines[name] <= now:
+                    pending.discard(future)
+                    future.cancel()
+                    yield name, None, GlpiTimeout(
+                        'Timed out after %ss' % self._timeout(name))
+
+    def call(self, method, *args, **kwargs):
+        """ Call method on every instance; returns a FanOutResult. """
+        started = time.time()
+        fanout = FanOutResult()
+        for name, result, error in self.stream(method, *args, **kwargs):
+            fanout.seconds[name] = round(time.time() - started, 3)
+            if error is None:
+                fanout.results[name] = result
+            else:
+                fanout.errors[name] = error
+        return fanout
+
+    def get_all(self, item_name, **read_options):
+        return self.call('get_all', item_name, **read_options)
+
+    def get(self, item_name, item_id=None, **read_options):
+        return self.call('get', item_name, item_id, **read_options)
+
+    def get_many(self, item_name, item_ids, **read_options):
+        return self.call('get_many', item_name, item_ids, **read_options)
+
+    def search_engine(self, item_name, criteria, **search_options):
+        return self.call('search_engine', item_name, criteria,
+                         **search_options)
@@ -16,21 +16,24 @@
 # https://github.com/glpi-project/glpi/blob/9.1/bugfixes/apirest.md
 
 from __future__ import print_function
-from future.utils import viewitems
 import re
 import os
 import sys
+import copy
+import time
+import threading
 import json as json_import
 import logging
-import requests
-from requests.structures import CaseInsensitiveDict
+from collections import OrderedDict
 from .version import __version__
+from .compat import replace_file
+from .glpi_item import GlpiItem, NULL_STR
+from .multipart import MultipartStream, DEFAULT_CHUNK_SIZE
 
-if sys.version_info[0] > 2:
-    from html.parser import HTMLParser
-else:
-    from HTMLParser import HTMLParser
-
+# requests, HTMLParser and the columnar result set are imported where
+# they are used: they account for most of the import time of the
+# package, and short-lived scripts often never reach a code path that
+# needs them.
 
 logger = logging.getLogger(__name__)
 
@@ -64,12 +67,157 @@ def _cleanup_param_values(dictionary):
     return dictionary
 
 
+def _project(item, fields):
+    """ Keep only the keys listed in fields of a decoded item. """
+    if isinstance(item, dict):
+        return dict([(k, item[k]) for k in fields if k in item])
+    return item
+
+
+_JSON_WS = re.compile(r'[ \t\n\r]*')
+
+
+def _iter_json_array(text):
+    """
+    Decode a JSON array one element at a time.
+    Each element is yielded as soon as it is decoded, so callers can
+    project or store it before the next one is built.
+    """
+    decoder = json_import.JSONDecoder()
+    idx = _JSON_WS.match(text, 0).end()
+    if text[idx:idx + 1] != '[':
+        raise ValueError('Expecting JSON array at char %d' % idx)
+    idx = _JSON_WS.match(text, idx + 1).end()
+    if text[idx:idx + 1] == ']':
+        return
+    while True:
+        obj, idx = decoder.raw_decode(text, idx)
+        yield obj
+        idx = _JSON_WS.match(text, idx).end()
+        char = text[idx:idx + 1]
+        if char == ',':
+            idx = _JSON_WS.match(text, idx + 1).end()
+        elif char == ']':
+            return
+        else:
+            raise ValueError('Expecting "," or "]" at char %d' % idx)
+
+
+def _decode_json(response, fields=None):
+    """
+    Decode the JSON body of response.
+    When fields is set, item records are projected to those keys while
+    the body is decoded, so unused keys are never kept around.
+    """
+    if not fields:
+        return response.json()
+
+    fields = tuple(fields)
+    text = response.text
+    if text.lstrip().startswith('['):
+        return [_project(obj, fields) for obj in _iter_json_array(text)]
+    return _project(json_import.loads(text), fields)
+
+
+def _decode_columnar(response, fields=None):
+    """
+    Decode a JSON array of items straight into a ColumnarResult.
+    Items are appended one at a time as they are decoded.
+    """
+    text = response.text
+    if not text.lstrip().startswith('['):
+        return response.json()
+
+    from .resultset import ColumnarResult
+    result = ColumnarResult()
+    for obj in _iter_json_array(text):
+        if fields:
+            obj = _project(obj, fields)
+        result.append(obj)
+    return result
+
+
+def _input_value(value):
+    """ Map SDK placeholder values to their JSON input. """
+    if value == NULL_STR:
+        return None
+    return value
+
+
+def _input_data(data):
+    """ Build the 'input' object of a write request from a dict. """
+    return dict([(k, _input_value(v)) for k, v in data.items()])
+
+
+def _update_input(data):
+    """
+    Return the input of an update for data (a dict or a GlpiItem).
+    Loaded GlpiItems only contribute their changed attributes (plus
+    'id'), None is returned when there is nothing to send.
+    """
+    if not isinstance(data, GlpiItem):
+        return _input_data(data)
+
+    item_id = data.get_attribute('id')
+    if item_id is None:
+        raise GlpiInvalidArgument('Cannot update an item without "id"')
+    if not data.is_dirty():
+        return None
+    changes = _input_data(data.get_changes())
+    changes['id'] = item_id
+    return changes
+
+
+def _updated_ids(result):
+    """ IDs reported as updated in a PUT response. """
+    updated = set()
+    if isinstance(result, list):
+        for r in result:
+            if isinstance(r, dict):
+                for k, v in r.items():
+                    if k != 'message' and v is True:
+                        updated.add(str(k))
+    return updated
+
+
+def _content_range_total(response):
+    """ Total count from a 'Content-Range: 0-49/1234' header. """
+    content_range = response.headers.get('Content-Range', '')
+    total = content_range.rpartition('/')[2]
+    if total.isdigit():
+        return int(total)
+    return None
+
+
+def _check_download(response, document_id):
+    """ Raise if response isn't a (partial) document download. """
+    if response.status_code not in (200, 206):
+        err = _glpi_html_parser(response.text)
+        raise GlpiException('Failed to download document %s: %s' % (
+            document_id, err or response.status_code))
+
+
+def _copy_stream(response, fileobj, chunk_size):
+    """ Write the response body to fileobj in chunk_size blocks. """
+    written = 0
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if chunk:
+            fileobj.write(chunk)
+            written += len(chunk)
+    return written
+
+
 def _glpi_html_parser(content):
     """
     Try to retrieve data tokens from HTML content.
     It's useful to debug GLPI rest when it's not returning JSON responses. I.E:
     when MYSQL server is down, API Rest answer html errors.
     """
+    if sys.version_info[0] > 2:
+        from html.parser import HTMLParser
+    else:
+        from HTMLParser import HTMLParser
+
     class GlpiHTMLParser(HTMLParser):
         def __init__(self, content):
             HTMLParser.__init__(self)
@@ -111,13 +259,183 @@ class GlpiInvalidArgument(GlpiException):
     pass
 
 
+class GlpiTimeout(GlpiException):
+    """
+    A request timed out or a Deadline expired. partial holds what was
+    fetched before (items of get_many, ...), None if nothing sensible.
+    """
+
+    def __init__(self, message, partial=None):
+        super(GlpiTimeout, self).__init__(message)
+        self.partial = partial
+
+
+# (connect, read) seconds of each HTTP request
+DEFAULT_TIMEOUT = (10, 120)
+
+# Shortest timeout given to a request under a nearly spent deadline:
+# HTTP clients reject 0
+MIN_TIMEOUT = 0.001
+
+
+class Deadline(object):
+    """
+    Time budget of a block of calls, in seconds.
+
+        with Deadline(30):
+            tickets = glpi.get_all('ticket')
+
+    Requests made by the thread inside the block (session setup, retries,
+    pages, chunks) wait at most for the remaining time, and raise
+    GlpiTimeout once it's spent. Deadlines nest, the earliest one wins.
+    Helpers running work in thread pools pass the caller's deadlines to
+    their workers (see bind()).
+    """
+    _local = threading.local()
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.time() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self):
+        return time.time() >= self.expires_at
+
+    def check(self, what='request'):
+        """ Raise GlpiTimeout if the deadline expired. """
+        if self.expired():
+            raise GlpiTimeout('Deadline of %ss exceeded before %s' % (
+                self.seconds, what))
+
+    def __enter__(self):
+        Deadline._stack().append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        Deadline._stack().remove(self)
+
+    @staticmethod
+    def _stack():
+        local = Deadline._local
+        if not hasattr(local, 'stack'):
+            local.stack = []
+        return local.stack
+
+    @staticmethod
+    def current():
+        """ Earliest deadline of the current thread, or None. """
+        stack = Deadline._stack()
+        if not stack:
+            return None
+        return min(stack, key=lambda d: d.expires_at)
+
+    @staticmethod
+    def bind(function):
+        """
+        Wrap function to run under the current thread's deadline, for
+        work handed to other threads.
+        """
+        deadline = Deadline.current()
+        if deadline is None:
+            return function
+
+        def bound(*args, **kwargs):
+            with deadline:
+                return function(*args, **kwargs)
+        return bound
+
+
+def _request_timeout(timeout, what):
+    """ timeout ((connect, read) or seconds) capped by the deadline. """
+    deadline = Deadline.current()
+    if deadline is None:
+        return timeout
+    deadline.check(what)
+    remaining = max(deadline.remaining(), MIN_TIMEOUT)
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, tuple):
+        return tuple(remaining if t is None else min(t, remaining)
+                     for t in timeout)
+    return min(timeout, remaining)
+
+
+def _timeout_errors():
+    """ Timeout exceptions of the HTTP clients a transport may use. """
+    import socket
+    import requests
+    import urllib3
+    errors = [requests.exceptions.Timeout, urllib3.exceptions.TimeoutError,
+              socket.timeout]
+    if 'httpx' in sys.modules:
+        errors.append(sys.modules['httpx'].TimeoutException)
+    return tuple(errors)
+
+
+def _http(method, url, timeout=DEFAULT_TIMEOUT, transport=None, **kwargs):
+    """
+    Send a request with transport (requests.request() by default), its
+    timeout capped by the current deadline; timeouts raise GlpiTimeout.
+    """
+    import requests
+    if transport is None:
+        transport = requests.request
+    try:
+        return transport(
+            method, url, timeout=_request_timeout(timeout, url), **kwargs)
+    except _timeout_errors() as e:
+        raise GlpiTimeout('Timed out requesting %s: %s' % (url, e))
+
+
+# Sub-data flags accepted by GET /:itemtype/:id
+WITH_FLAGS = (
+    'with_devices', 'with_disks', 'with_softwares', 'with_connections',
+    'with_networkports', 'with_infocoms', 'with_contracts',
+    'with_documents', 'with_tickets', 'with_problems', 'with_changes',
+    'with_notes', 'with_logs',
+)
+
+
+# Session context reads, cached per session token, and the calls that
+# change their result
+SESSION_CONTEXT = (
+    'getFullSession', 'getActiveProfile', 'getMyProfiles',
+    'getMyEntities', 'getActiveEntities',
+)
+SESSION_CHANGES = ('changeActiveEntities', 'changeActiveProfile')
+
+
+def _with_params(with_flags):
+    """ Validate with_* sub-data flags. """
+    for k in with_flags:
+        if k not in WITH_FLAGS:
+            raise GlpiInvalidArgument(
+                'Unknown read option "%s". Valid flags: %s' % (
+                    k, ', '.join(WITH_FLAGS)))
+    return dict(with_flags)
+
+
+def _list_params(name, values):
+    """ Expand a list into GLPI array parameters: name[0]=a&name[1]=b """
+    if values is None:
+        return {}
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    return dict([('%s[%d]' % (name, i), v) for i, v in enumerate(values)])
+
+
 class GlpiService(object):
     """ Polymorphic class of GLPI REST API Service. """
     __version__ = __version__
+    item_class = GlpiItem
 
     def __init__(self, url_apirest, token_app, uri=None,
                  username=None, password=None, token_auth=None,
-                 use_vcap_services=False, vcap_services_name=None):
+                 use_vcap_services=False, vcap_services_name=None,
+                 session_cache=None, timeout=DEFAULT_TIMEOUT, hedger=None,
+                 transport=None):
         """
         [TODO] Loads credentials from the VCAP_SERVICES environment variable if
         available, preferring credentials explicitly set in the request.
@@ -127,6 +445,20 @@ class GlpiService(object):
         You can choose in setup initial authentication using username and
         password, or setup with Authorization HTTP token. If token_auth is set,
         username and password credentials must be ignored.
+
+        session_cache (a SessionCache) shares session tokens between
+        processes, so a new process can skip initSession.
+
+        timeout is the (connect, read) timeout of each request in seconds,
+        or one number for both; None waits forever. Requests made inside
+        a Deadline block are also bounded by its remaining time.
+
+        hedger (a Hedger) resends GET requests that are slower than
+        usual and uses the first response.
+
+        transport sends the HTTP requests: a callable taking the
+        arguments of requests.request() and returning a response, like
+        the recorder and player of a Cassette. Defaults to requests.
         """
         self.__version__ = __version__
         self.url = url_apirest
@@ -138,6 +470,13 @@ class GlpiService(object):
         self.token_auth = token_auth
 
         self.session = None
+        self.session_cache = session_cache
+        self.timeout = timeout
+        self.hedger = hedger
+        self.transport = transport
+        # shared with the for_uri() copies, which share the session
+        self._context = {}
+        self._context_lock = threading.Lock()
 
         if token_auth is not None:
             if username is not None or password is not None:
@@ -191,14 +530,32 @@ class GlpiService(object):
     def set_uri(self, uri):
         self.uri = uri
 
+    def for_uri(self, uri):
+        """
+        Return a service for another item URI that shares this one's
+        settings and session. Use one per thread or item type instead of
+        switching set_uri() on a shared service.
+        """
+        if self.session is None:
+            self.get_session_token()
+        service = copy.copy(self)
+        service.uri = uri
+        return service
+
     def get_version(self):
         return self.__version__
 
     """
     Session Token
     """
-    def set_session_token(self):
-        """ Set up new session ID """
+    def _credentials(self):
+        """ Credentials used to open sessions (for cache keys). """
+        if self.token_auth is not None:
+            return self.token_auth
+        return (self.username, self.password)
+
+    def _init_session(self):
+        """ Open a new session on the server (initSession). """
 
         # URL should be like: http://glpi.example.com/apirest.php
         full_url = self.url + '/initSession'
@@ -207,26 +564,102 @@ class GlpiService(object):
         headers = {"App-Token": self.app_token,
                    "Content-Type": "application/json"}
 
-        if type(self.token_auth) is not tuple: # self.token_auth is not None:
-            headers["Authorization"] = "user_token "+self.token_auth
+        if self.token_auth is None:
+            auth = (self.username, self.password)
+        elif type(self.token_auth) is not tuple:
+            headers["Authorization"] = "user_token " + self.token_auth
         else:
             auth = self.token_auth
 
+        r = _http('GET', full_url, timeout=self.timeout,
+                  transport=self.transport, auth=auth, headers=headers)
+
         try:
             if r.status_code == 200:
                 self.session = r.json()['session_token']
                 return True
             else:
-                err = _glpi_html_parser(r.content)
+                err = _glpi_html_parser(r.text)
                 raise GlpiException("Failed to init session: %s" % err)
+        except GlpiException:
+            raise
         except Exception:
-            err = _glpi_html_parser(r.content)
+            err = _glpi_html_parser(r.text)
             raise GlpiException("ERROR init session: %s" % err)
 
-        return False
+    def _session_is_valid(self, session_token):
+        """ Cheap check that session_token is still open on the server. """
+        headers = {"App-Token": self.app_token,
+                   "Session-Token": session_token}
+        try:
+            r = _http('GET', self.url + '/getActiveProfile',
+                      timeout=self.timeout, transport=self.transport,
+                      headers=headers)
+        except GlpiTimeout:
+            raise
+        except Exception:
+            return False
+        return r.status_code == 200
 
-    def finish_session_token(self):
-        """ Destroy a session identified by a session token """
+    def _session_cache_key(self):
+        return self.session_cache.key(self.url, self.app_token,
+                                      self._credentials())
+
+    def set_session_token(self):
+        """
+        Set up new session ID.
+        With a session_cache, a valid token shared by another process is
+        reused instead of opening a new session.
+        """
+        self.clear_context()
+        if self.session_cache is None:
+            return self._init_session()
+
+        cache = self.session_cache
+        key = self._session_cache_key()
+        with cache.lock(key):
+            entry = cache.get(key)
+            if entry is not None:
+                if not cache.needs_revalidation(entry):
+                    self.session = entry['session_token']
+                    return True
+                if self._session_is_valid(entry['session_token']):
+                    cache.touch(key, entry)
+                    self.session = entry['session_token']
+                    return True
+                cache.invalidate(key)
+
+            self._init_session()
+            cache.put(key, self.session)
+        return True
+
+    def _drop_cached_session(self):
+        """ Forget a session rejected by the server. """
+        if self.session_cache is not None:
+            key = self._session_cache_key()
+            with self.session_cache.lock(key):
+                entry = self.session_cache.get(key)
+                if entry is not None and \
+                        entry['session_token'] == self.session:
+                    self.session_cache.invalidate(key)
+        self.session = None
+        self.clear_context()
+
+    def finish_session_token(self, force=False):
+        """
+        Destroy a session identified by a session token.
+        A session from the session_cache is shared with other processes:
+        it's only released locally, unless force is set.
+        """
+        self.clear_context()
+
+        if self.session is not None and self.session_cache is not None:
+            if not force:
+                self.session = None
+                return True
+            key = self._session_cache_key()
+            with self.session_cache.lock(key):
+                self.session_cache.invalidate(key)
 
         if self.session is not None:
             # URL should be like: http://glpi.example.com/apirest.php
@@ -244,7 +677,8 @@ class GlpiService(object):
             else:
                 auth = (self.username, self.password)
 
-            r = requests.request('GET', full_url, auth=auth, headers=headers)
+            r = _http('GET', full_url, timeout=self.timeout,
+                      transport=self.transport, auth=auth, headers=headers)
 
             try:
                 if r.status_code == 200:
@@ -276,11 +710,41 @@ class GlpiService(object):
     def update_session_token(self, session_id):
         """ Update session ID """
 
-        if session_id:
+        if session_id and session_id != self.session:
             self.session = session_id
+            self.clear_context()
 
         return self.session
 
+    """ Session context """
+    def get_context(self, endpoint, params=None):
+        """
+        Return a session context read (one of SESSION_CONTEXT, like
+        getFullSession or getMyEntities), cached per session token.
+        Calls to changeActiveEntities/changeActiveProfile and session
+        renewals clear the cache. The cached value is shared between
+        calls: don't modify it.
+        """
+        endpoint = endpoint.strip('/')
+        token = self.get_session_token()
+        params = _remove_null_values(params) or {}
+        key = (token, endpoint, tuple(sorted(params.items())))
+        with self._context_lock:
+            if key in self._context:
+                return self._context[key]
+
+        response = self.request('GET', endpoint, params=params)
+        value = _decode_json(response)
+        if response.status_code < 400:
+            with self._context_lock:
+                self._context[key] = value
+        return value
+
+    def clear_context(self):
+        """ Forget the cached session context reads. """
+        with self._context_lock:
+            self._context.clear()
+
     """ Request """
     def request(self, method, url, accept_json=False, headers={},
                 params=None, json=None, data=None, files=None, **kwargs):
@@ -288,8 +752,11 @@ class GlpiService(object):
         Make a request to GLPI Rest API.
         Return response object.
         (http://docs.python-requests.org/en/master/api/#requests.Response)
+        timeout overrides the service's timeout for this request.
         """
 
+        from requests.structures import CaseInsensitiveDict
+
         full_url = '%s/%s' % (self.url, url.strip('/'))
         input_headers = _remove_null_values(headers) if headers else {}
 
@@ -303,6 +770,8 @@ class GlpiService(object):
             if self.session is None:
                 self.set_session_token()
             headers.update({'Session-Token': self.session})
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             raise GlpiException("Unable to get Session token: {}".format(e))
 
@@ -318,13 +787,36 @@ class GlpiService(object):
         data = _remove_null_values(data)
         files = _remove_null_values(files)
 
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('transport', self.transport)
+
+        def send():
+            return _http(method, full_url, headers=headers, params=params,
+                         data=data, json=json, files=files, **kwargs)
+
+        if self.hedger is not None and method.upper() == 'GET' and \
+                not kwargs.get('stream'):
+            # reads are idempotent: a slow one may be sent twice
+            def send(send=send):
+                return self.hedger.call(send)
+
         try:
-            response = requests.request(method=method, url=full_url,
-                                        headers=headers, params=params,
-                                        data=data, **kwargs)
+            response = send()
+            if response.status_code == 401 and \
+                    self.session_cache is not None and \
+                    not hasattr(data, 'read'):
+                # a shared session may have been closed by another process
+                self._drop_cached_session()
+                self.set_session_token()
+                headers['Session-Token'] = self.session
+                response = send()
         except Exception:
-            logger.error("ERROR requesting uri(%s) payload(%s)" % (url, data))
+            logger.error(
+                "ERROR requesting uri(%s) payload(%s)" % (url, data))
             raise
+        finally:
+            if method.upper() != 'GET' and url.strip('/') in SESSION_CHANGES:
+                self.clear_context()
 
         return response
 
@@ -354,35 +846,172 @@ class GlpiService(object):
         if (data_json is None):
             return "{ 'error_message' : 'Object not found.'}"
 
-        payload = '{"input": { %s }}' % (self.get_payload(data_json))
+        if isinstance(data_json, GlpiItem):
+            data_json = data_json.get_data()
+
+        payload = json_import.dumps({"input": _input_data(data_json)})
+
+        response = self.request('POST', self.uri,
+                                data=payload, accept_json=True)
+
+        return response.json()
+
+    def create_many(self, items):
+        """
+        Create several items (dicts or GlpiItems) with one request.
+        Returns GLPI's per-item results ({"id", "message"}), in the order
+        of items.
+        """
+
+        inputs = []
+        for item in items:
+            if isinstance(item, GlpiItem):
+                item = item.get_data()
+            inputs.append(_input_data(item))
+
+        if not inputs:
+            return []
 
+        payload = json_import.dumps({"input": inputs})
         response = self.request('POST', self.uri,
                                 data=payload, accept_json=True)
 
         return response.json()
 
     # [R]EAD - Retrieve Item data
-    def get_all(self):
-        """ Return all content of Item in JSON format. """
+    def get_all(self, fields=None, only_id=None, expand_dropdowns=None,
+                get_hateoas=None, item_range=None, sort=None, order=None,
+                is_deleted=None, columnar=False):
+        """
+        Return all content of Item in JSON format.
+
+        Read options are sent as GLPI query parameters (only_id,
+        expand_dropdowns, get_hateoas, range, sort, order, is_deleted).
+        fields is a client-side projection: only those keys are kept on
+        each item while the response is decoded.
+        With columnar=True items are returned in a ColumnarResult instead
+        of a list of dicts.
+        """
+        params = {
+            'only_id': only_id,
+            'expand_dropdowns': expand_dropdowns,
+            'get_hateoas': get_hateoas,
+            'range': item_range,
+            'sort': sort,
+            'order': order,
+            'is_deleted': is_deleted,
+        }
+        res = self.request('GET', self.uri, params=params)
+        if columnar:
+            return _decode_columnar(res, fields)
+        return _decode_json(res, fields)
 
-        res = self.request('GET', self.uri)
-        return res.json()
+    def get(self, item_id, fields=None, expand_dropdowns=None,
+            get_hateoas=None, get_sha1=None, as_item=False, **with_flags):
+        """
+        Return the JSON item with ID item_id.
 
-    def get(self, item_id):
-        """ Return the JSON item with ID item_id. """
+        Accepts expand_dropdowns, get_hateoas, get_sha1 and the with_*
+        sub-data flags (see WITH_FLAGS). fields is a client-side
+        projection applied while decoding.
+        With as_item=True the item is returned as a loaded item_class
+        object that tracks its changes (see update()).
+        """
 
         if isinstance(item_id, (int, str)):
+            params = _with_params(with_flags)
+            params.update({
+                'expand_dropdowns': expand_dropdowns,
+                'get_hateoas': get_hateoas,
+                'get_sha1': get_sha1,
+            })
             uri = '%s/%s' % (self.uri, str(item_id))
-            response = self.request('GET', uri)
-            return response.json()
+            response = self.request('GET', uri, params=params)
+            if as_item and response.text.lstrip().startswith('{'):
+                if fields:
+                    return self.item_class.load(
+                        _decode_json(response, fields))
+                return self.item_class.from_json(response.text)
+            return _decode_json(response, fields)
         else:
             return {'error_message': 'Unale to get %s ID [%s]' % (self.uri,
                                                                   item_id)}
 
-    def get_path(self, path=''):
-        """ Return the JSON from path """
-        response = self.request('GET', path)
-        return response.json()
+    def get_many(self, item_ids, fields=None, expand_dropdowns=None,
+                 get_hateoas=None, chunk_size=100, **with_flags):
+        """
+        Return the items with IDs item_ids, fetched with getMultipleItems
+        in requests of up to chunk_size items.
+        Accepts the read options of get(). Items the server doesn't
+        return (deleted meanwhile, no rights) are missing from the list.
+        On timeout the GlpiTimeout carries the items of the chunks
+        already fetched in partial.
+        """
+        itemtype = self.uri.strip('/')
+        item_ids = list(item_ids)
+        items = []
+        for first in range(0, len(item_ids), chunk_size):
+            params = _with_params(with_flags)
+            params.update({
+                'expand_dropdowns': expand_dropdowns,
+                'get_hateoas': get_hateoas,
+            })
+            for idx, item_id in enumerate(
+                    item_ids[first:first + chunk_size]):
+                params['items[%d][itemtype]' % idx] = itemtype
+                params['items[%d][items_id]' % idx] = item_id
+            try:
+                response = self.request('GET', 'getMultipleItems',
+                                        accept_json=True, params=params)
+            except GlpiTimeout as e:
+                e.partial = items
+                raise
+            if response.status_code >= 400:
+                raise GlpiException('Failed to get %s items: %s' % (
+                    itemtype, _glpi_html_parser(response.text)))
+            items.extend(item for item in _decode_json(response, fields)
+                         if isinstance(item, dict) and item)
+        return items
+
+    def get_path(self, path='', fields=None, params=None):
+        """
+        Return the JSON from path.
+        Session context paths (see SESSION_CONTEXT) are cached.
+        """
+        if path.strip('/') in SESSION_CONTEXT:
+            value = self.get_context(path, params)
+            return _project(value, fields) if fields else value
+        response = self.request('GET', path, params=params)
+        return _decode_json(response, fields)
+
+    def get_range(self, path, start, end, params=None, fields=None):
+        """
+        Fetch rows start..end (inclusive) of an item list or search path,
+        without depending on self.uri (safe to call from several threads).
+
+        Returns (rows, total). total comes from 'totalcount' for searches
+        and from the Content-Range header for item lists, None if the
+        server didn't send it.
+        """
+        params = dict(params or {})
+        params['range'] = '%d-%d' % (start, end)
+        response = self.request('GET', path, accept_json=True, params=params)
+
+        if response.status_code >= 400:
+            if 'ERROR_RANGE_EXCEED_TOTAL' in response.text:
+                return [], _content_range_total(response)
+            raise GlpiException('Failed to get %s [%s]: %s' % (
+                path, params['range'], _glpi_html_parser(response.text)))
+
+        if response.text.lstrip().startswith('['):
+            return (_decode_json(response, fields),
+                    _content_range_total(response))
+
+        result = response.json()
+        rows = result.get('data', [])
+        if fields:
+            rows = [_project(row, fields) for row in rows]
+        return rows, result.get('totalcount')
 
     def search_options(self, item_name):
         """
@@ -394,17 +1023,39 @@ class GlpiService(object):
 
         return response.json()
 
-    def search_engine(self, search_query):
+    def search_engine(self, search_query, forcedisplay=None, sort=None,
+                      order=None, item_range=None, rawdata=None,
+                      withindexes=None, uid_cols=None, giveItems=None,
+                      columnar=False):
         """
         Search an item by URI.
         Use GLPI search engine passing parameter by URI.
+        forcedisplay is a list of search option IDs to return, which keeps
+        the result down to the columns actually needed.
+        With columnar=True the rows in 'data' are stored in a
+        ColumnarResult.
         #TODO could pass search criteria in payload, like others items
         operations.
         """
+        params = _list_params('forcedisplay', forcedisplay)
+        params.update({
+            'sort': sort,
+            'order': order,
+            'range': item_range,
+            'rawdata': rawdata,
+            'withindexes': withindexes,
+            'uid_cols': uid_cols,
+            'giveItems': giveItems,
+        })
         new_uri = "%s/%s" % (self.uri, search_query)
-        response = self.request('GET', new_uri, accept_json=True)
+        response = self.request('GET', new_uri, accept_json=True,
+                                params=params)
 
-        return response.json()
+        result = response.json()
+        if columnar and isinstance(result, dict) and 'data' in result:
+            from .resultset import ColumnarResult
+            result['data'] = ColumnarResult(result['data'])
+        return result
 
     def post(self, item_id, is_recursive=False, change=None):
         """ Change an object Item(Profile or entity) """
@@ -428,15 +1079,145 @@ class GlpiService(object):
 
     # [U]PDATE an Item
     def update(self, data):
-        """ Update an object Item. """
+        """
+        Update an object Item.
 
-        payload = '{"input": { %s }}' % (self.get_payload(data))
-        new_url = "%s/%d" % (self.uri, data['id'])
+        data is a dict with the 'id' and the attributes to write, or a
+        GlpiItem. Loaded items (GlpiItem.load(), get(as_item=True)) only
+        send their changed attributes, and no request is made when nothing
+        changed: an empty list is returned.
+        """
+
+        item_input = _update_input(data)
+        if item_input is None:
+            return []
+
+        payload = json_import.dumps({"input": item_input})
+        new_url = "%s/%d" % (self.uri, int(item_input['id']))
 
         response = self.request('PUT', new_url, data=payload)
 
+        result = response.json()
+        if isinstance(data, GlpiItem) and \
+                str(item_input['id']) in _updated_ids(result):
+            data.mark_clean()
+        return result
+
+    def update_many(self, items):
+        """
+        Update several items with one request.
+        Like update(), loaded GlpiItems only send their changed attributes
+        and unchanged ones are skipped. Returns [] if nothing was sent.
+        """
+
+        inputs = []
+        sent = []
+        for item in items:
+            item_input = _update_input(item)
+            if item_input is None:
+                continue
+            inputs.append(item_input)
+            sent.append(item)
+
+        if not inputs:
+            return []
+
+        payload = json_import.dumps({"input": inputs})
+        response = self.request('PUT', self.uri, data=payload)
+
+        result = response.json()
+        updated = _updated_ids(result)
+        for item, item_input in zip(sent, inputs):
+            if isinstance(item, GlpiItem) and \
+                    str(item_input['id']) in updated:
+                item.mark_clean()
+        return result
+
+    """ Documents """
+    def upload_document(self, source, name=None, filename=None,
+                        input_data=None, content_type=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Upload a file as a Document (POST with 'uploadManifest').
+
+        source is a path or a binary file object. The file is streamed in
+        chunk_size blocks, it's never loaded whole in memory.
+        input_data adds fields to the Document input (entities_id, ...).
+        """
+        fileobj = source
+        close = False
+        if not hasattr(source, 'read'):
+            fileobj = open(source, 'rb')
+            close = True
+            if filename is None:
+                filename = os.path.basename(source)
+        if filename is None:
+            filename = os.path.basename(getattr(source, 'name', 'file'))
+
+        manifest = dict(input_data or {})
+        manifest.setdefault('name', name or filename)
+        manifest['_filename'] = [filename]
+
+        try:
+            body = MultipartStream(
+                fields=[('uploadManifest',
+                         json_import.dumps({"input": manifest}))],
+                files=[('filename[0]', filename, fileobj,
+                        content_type or 'application/octet-stream')],
+                chunk_size=chunk_size)
+            response = self.request(
+                'POST', self.uri, accept_json=True, data=body,
+                headers={'Content-Type': body.content_type})
+        finally:
+            if close:
+                fileobj.close()
+
         return response.json()
 
+    def download_document(self, document_id, dest, resume=True,
+                          chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Download the file of a Document to dest (a path or a writable
+        binary file object), streaming chunk_size blocks.
+
+        When dest is a path the data goes to '<dest>.part' and is renamed
+        once complete. With resume=True an existing '.part' file is
+        continued with an HTTP Range request.
+        Returns the number of bytes written by this call.
+        """
+        uri = '%s/%d' % (self.uri, int(document_id))
+        headers = {'Accept': 'application/octet-stream'}
+
+        if hasattr(dest, 'write'):
+            response = self.request('GET', uri, headers=headers, stream=True)
+            try:
+                _check_download(response, document_id)
+                return _copy_stream(response, dest, chunk_size)
+            finally:
+                response.close()
+
+        part_path = dest + '.part'
+        offset = 0
+        if resume and os.path.exists(part_path):
+            offset = os.path.getsize(part_path)
+            headers['Range'] = 'bytes=%d-' % offset
+
+        response = self.request('GET', uri, headers=headers, stream=True)
+        try:
+            if offset and response.status_code == 416:
+                # the partial file already holds the whole document
+                written = 0
+            else:
+                _check_download(response, document_id)
+                mode = 'ab' if response.status_code == 206 else 'wb'
+                with open(part_path, mode) as f:
+                    written = _copy_stream(response, f, chunk_size)
+        finally:
+            response.close()
+
+        replace_file(part_path, dest)
+        return written
+
     # [D]ELETE an Item
     def delete(self, item_id, force_purge=False):
         """ Delete an object Item. """
@@ -460,16 +1241,31 @@ class GLPI(object):
     We can use this class to save implementation of "new classes" and
     can reuse API sessions.
     To support new items you should create the dict key/value in item_map.
+
+    Errors are returned as a set holding the error message, except
+    timeouts: GlpiTimeout is raised, with what was already fetched in
+    its partial attribute (see GlpiService.get_many()).
     """
     __version__ = __version__
 
     def __init__(self, url, app_token, auth_token,
-                 item_map=None):
-        """ Construct generic object """
+                 item_map=None, session_cache=None, timeout=DEFAULT_TIMEOUT,
+                 hedger=None, transport=None):
+        """
+        Construct generic object.
+        session_cache (a SessionCache) reuses session tokens between
+        processes. timeout is the (connect, read) timeout of requests.
+        hedger (a Hedger) hedges slow reads. transport replaces requests
+        for sending them (see GlpiService).
+        """
 
         self.url = url
         self.app_token = app_token
         self.auth_token = auth_token
+        self.session_cache = session_cache
+        self.timeout = timeout
+        self.hedger = hedger
+        self.transport = transport
 
         self.item_uri = None
         self.item_map = {
@@ -489,6 +1285,7 @@ class GLPI(object):
         }
         self.api_rest = None
         self.api_session = None
+        self._search_options = {}
 
         if item_map is not None:
             self.set_item_map(item_map)
@@ -535,7 +1332,11 @@ class GLPI(object):
         """ Initialize the API Rest connection """
 
         self.api_rest = GlpiService(self.url, self.app_token,
-                                    token_auth=self.auth_token)
+                                    token_auth=self.auth_token,
+                                    session_cache=self.session_cache,
+                                    timeout=self.timeout,
+                                    hedger=self.hedger,
+                                    transport=self.transport)
 
         try:
             self.api_session = self.api_rest.get_session_token()
@@ -553,6 +1354,8 @@ class GLPI(object):
                 self.api_rest.finish_session_token()
                 self.api_rest = None
                 self.api_session = None
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
 
@@ -575,24 +1378,50 @@ class GLPI(object):
             self.update_uri(item_name)
             return self.api_rest.create(item_data)
 
+        except GlpiTimeout:
+            raise
+        except GlpiException as e:
+            return {'{}'.format(e)}
+
+    def create_many(self, item_name, items):
+        """ Create several Resource Items of item_name in one request """
+        try:
+            if not self.api_has_session():
+                self.init_api()
+
+            self.update_uri(item_name)
+            return self.api_rest.create_many(items)
+
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
 
     # [R]EAD - Retrieve Item data
-    def get_all(self, item_name):
-        """ Get all resources from item_name """
+    def get_all(self, item_name, **read_options):
+        """
+        Get all resources from item_name.
+        read_options are passed to GlpiService.get_all (fields, only_id,
+        expand_dropdowns, ...).
+        """
         try:
             if not self.api_has_session():
                 self.init_api()
 
             self.update_uri(item_name)
-            return self.api_rest.get_all()
+            return self.api_rest.get_all(**read_options)
 
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
 
-    def get(self, item_name, item_id=None, sub_item=None):
-        """ Get item_name and/with resource by ID """
+    def get(self, item_name, item_id=None, sub_item=None, **read_options):
+        """
+        Get item_name and/with resource by ID.
+        read_options are passed to GlpiService.get (fields,
+        expand_dropdowns, with_* flags, ...).
+        """
         try:
             if not self.api_has_session():
                 self.init_api()
@@ -600,13 +1429,35 @@ class GLPI(object):
             self.update_uri(item_name)
 
             if sub_item is not None and item_id is not None:
-                return self.api_rest.get("%d/%s" % (item_id, sub_item))
+                return self.api_rest.get("%d/%s" % (item_id, sub_item),
+                                         **read_options)
 
             if item_id is None:
-                return self.api_rest.get_path(item_name)
+                return self.api_rest.get_path(
+                    item_name, fields=read_options.pop('fields', None),
+                    params=read_options)
 
-            return self.api_rest.get(item_id)
+            return self.api_rest.get(item_id, **read_options)
 
+        except GlpiTimeout:
+            raise
+        except GlpiException as e:
+            return {'{}'.format(e)}
+
+    def get_many(self, item_name, item_ids, **read_options):
+        """
+        Get several item_name resources by ID in a few requests.
+        read_options are passed to GlpiService.get_many.
+        """
+        try:
+            if not self.api_has_session():
+                self.init_api()
+
+            self.update_uri(item_name)
+            return self.api_rest.get_many(item_ids, **read_options)
+
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
 
@@ -620,6 +1471,8 @@ class GLPI(object):
             return self.api_rest.post(item_id, is_recursive=is_recursive,
                                       change=item_name)
 
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
 
@@ -632,6 +1485,8 @@ class GLPI(object):
             self.update_uri('listSearchOptions')
             return self.api_rest.search_options(item_name)
 
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
 
@@ -669,7 +1524,7 @@ class GLPI(object):
         else:
             return {"message_error": "Unable to find a valid criteria."}
 
-    def search_engine(self, item_name, criteria):
+    def search_engine(self, item_name, criteria, **search_options):
         """
         Call GLPI's search engine syntax.
 
@@ -683,87 +1538,246 @@ class GLPI(object):
             }
         ]
 
+        search_options are passed to GlpiService.search_engine
+        (forcedisplay, sort, order, item_range, ...). forcedisplay accepts
+        field names as well as search option IDs.
+
         RETURNS:
             GLPIs APIRest JSON formated with result of search in key 'data'.
         """
 
-        # Receive the possible field ids for type item_name
-        # -> to avoid wrong lookups, use uid of fields, but strip item type:
-        #    example: {"1": {"uid": "Computer.name"}} gets {"name": 1}
-        field_map = {}
-        opts = self.search_options(item_name)
-        for field_id, field_opts in viewitems(opts):
-            if field_id.isdigit() and 'uid' in field_opts:
-                # support case-insensitive strip from item_name!
-                field_name = re.sub('^'+item_name+'.', '', field_opts['uid'],
-                                    flags=re.IGNORECASE)
-                field_map[field_name] = int(field_id)
-
-        uri_query = "%s?" % item_name
-
-        for idx, c in enumerate(criteria['criteria']):
-            # build field argument
-            if idx == 0:
-                uri = ""
-            else:
-                uri = "&"
-            if 'field' in c and c['field'] is not None:
-                field_name = ""
-                # if int given, use it directly
-                if isinstance(c['field'], int) or c['field'].isdigit():
-                    field_name = int(c['field'])
-                # if name given, try to map to an int
-                elif c['field'] in field_map:
-                    field_name = field_map[c['field']]
-                else:
-                    raise GlpiInvalidArgument(
-                        'Cannot map field name "' + c['field'] + '" to ' +
-                        'a field id for '+str(idx+1)+'. criterion '+str(c))
-                uri = uri + "criteria[%d][field]=%d" % (idx, field_name)
-            else:
-                raise GlpiInvalidArgument(
-                    'Missing "field" parameter for ' + str(idx+1) +
-                    'the criteria: ' + str(c))
+        uri_query, forcedisplay = self.build_search_query(
+            item_name, criteria, search_options.get('forcedisplay'))
+        if forcedisplay is not None:
+            search_options['forcedisplay'] = forcedisplay
 
-            # build value argument
-            if 'value' not in c or c['value'] is None:
-                uri = uri + "&criteria[%d][value]=" % (idx)
-            else:
-                uri = uri + "&criteria[%d][value]=%s" % (idx, c['value'])
+        try:
+            if not self.api_has_session():
+                self.init_api()
 
-            # build searchtype argument
-            # -> optional! defaults to "contains" on the server if empty
-            if 'searchtype' in c and c['searchtype'] is not None:
-                uri = (uri + "&criteria[%d][searchtype]=%s".format(idx,
-                       c['searchtype']))
-            else:
-                uri = uri + "&criteria[%d][searchtype]=" % (idx)
+            self.update_uri('search')
+            return self.api_rest.search_engine(uri_query, **search_options)
+
+        except GlpiTimeout:
+            raise
+        except GlpiException as e:
+            return {'{}'.format(e)}
+
+    def build_search_query(self, item_name, criteria, forcedisplay=None):
+        """
+        Build the search URI of search_engine() ('Ticket?criteria[0]...'),
+        relative to /search.
+        Returns the URI and forcedisplay mapped to search option IDs.
+        """
+        from .search import field_map, _field_id
+
+        query = self._search_query(item_name, criteria)
+        compiled = query.compile(self.cached_search_options)
+        uri_query = '%s?%s' % (item_name, compiled.render())
 
+        if forcedisplay is None:
+            return uri_query, None
+
+        if not isinstance(forcedisplay, (list, tuple)):
+            forcedisplay = [forcedisplay]
+        fields = field_map(item_name, self.cached_search_options(item_name))
+        return uri_query, [_field_id(fields, f, 'forcedisplay')
+                           for f in forcedisplay]
+
+    def _search_query(self, item_name, criteria):
+        """
+        SearchQuery of criteria: a SearchQuery (copied), {'criteria':
+        [...]} as taken by search_engine() or the list of criteria.
+        """
+        from .search import SearchQuery
+
+        if isinstance(criteria, SearchQuery):
+            return criteria.copy()
+        if isinstance(criteria, dict):
+            criteria = criteria.get('criteria', [])
+
+        query = SearchQuery(item_name)
+        for idx, c in enumerate(criteria or []):
             # link is optional for 1st criterion according to docs...
             # -> error if not present but more than one criterion
             if 'link' not in c and idx > 0:
                 raise GlpiInvalidArgument(
                     'Missing link type for '+str(idx+1)+'. criterion '+str(c))
-            elif 'link' in c:
-                uri = uri + "&criteria[%d][link]=%s" % (idx, c['link'])
+            query.where(c.get('field'), c.get('value'),
+                        searchtype=c.get('searchtype'), link=c.get('link'))
+        return query
 
-            # add this criterion to the query
-            uri_query = uri_query + uri
+    def cached_search_options(self, item_name):
+        """
+        Search options of item_name, fetched once per GLPI object.
+        """
+        key = item_name.lower()
+        if key not in self._search_options:
+            opts = self.search_options(item_name)
+            if not isinstance(opts, dict):
+                raise GlpiException(
+                    'Unable to list search options of %s: %s' % (
+                        item_name, opts))
+            self._search_options[key] = opts
+        return self._search_options[key]
+
+    def compile_search(self, query):
+        """
+        Compile a SearchQuery against the cached search options. The
+        result can be executed many times with execute_search().
+        """
+        return query.compile(self.cached_search_options)
+
+    def execute_search(self, compiled, columnar=False, **values):
+        """
+        Run a CompiledSearch, filling its Param placeholders from values.
+        """
+        if not self.api_has_session():
+            self.init_api()
+
+        self.update_uri('search')
+        return self.api_rest.search_engine(
+            '%s?%s' % (compiled.itemtype, compiled.render(**values)),
+            columnar=columnar)
+
+    """ Counts """
+    def _total(self, path, params=None):
+        """ Total rows of path, from a request for its first row only. """
+        rows, total = self.api_rest.get_range(path, 0, 0, params=params)
+        if total is None:
+            if rows:
+                raise GlpiException('%s did not report a total' % path)
+            return 0
+        return int(total)
+
+    def count(self, item_name, criteria=None):
+        """
+        Number of item_name items, or of the ones matching criteria
+        (a SearchQuery, or criteria as taken by search_engine()).
 
+        Only one row is requested: the total comes from the
+        Content-Range header, or the totalcount of the search.
+        Like the other methods, errors are returned as a set.
+        """
         try:
             if not self.api_has_session():
                 self.init_api()
+            if not criteria:
+                path = self.item_map.get(item_name, item_name)
+                return self._total(path.strip('/'))
+            compiled = self.compile_search(self._search_query(item_name,
+                                                              criteria))
+            return self._total(compiled.uri())
+
+        except GlpiTimeout:
+            raise
+        except GlpiException as e:
+            return {'{}'.format(e)}
 
-            self.update_uri('search')
-            # TODO: is this call correct? shouldn't this be search_engine()?
-            return self.api_rest.search_options(uri_query)
+    def _dropdown_ids(self, item_name, field, query, max_groups, workers,
+                      page_size):
+        """
+        IDs of the dropdown items field (a search option on a dropdown
+        table: locations, categories, entities, ...) can take. None if
+        it isn't a dropdown, or when one projected search is cheaper
+        than a count per ID: the dropdown has more than max_groups items,
+        or more than the items query matches.
+        """
+        from .search import field_map, _field_id
+        from .resolver import TABLE_TYPES
+        from .export import iter_pages
+
+        options = self.cached_search_options(item_name)
+        field_id = _field_id(field_map(item_name, options), field,
+                             'group_count')
+        table = options.get(str(field_id), {}).get('table') or ''
+        if not table.startswith('glpi_'):
+            return None
+        dropdown = TABLE_TYPES.get(table[len('glpi_'):])
+        if dropdown is None:
+            return None
+
+        # the size of the dropdown, from the Content-Range of one row
+        params = {'only_id': True}
+        rows, size = self.api_rest.get_range(dropdown, 0, 0, params=params)
+        if size is None or int(size) > max_groups or \
+                int(size) > self._total(self.compile_search(query).uri()):
+            return None
+
+        ids = []
+        for _, rows in iter_pages(
+                lambda start, end: self.api_rest.get_range(
+                    dropdown, start, end, params=params),
+                page_size, workers=workers):
+            ids.extend(int(row['id']) for row in rows if 'id' in row)
+        return sorted(ids)
+
+    def group_count(self, item_name, field, values=None, criteria=None,
+                    workers=4, page_size=1000, max_groups=100):
+        """
+        Number of items per value of field ({value: count}), among the
+        ones matching criteria.
+
+        One count per value runs on `workers` threads (field equals
+        value): a few KB per value. Without values, a dropdown field (a
+        search option on a dropdown table, such as
+        'ITILCategory.completename') with at most max_groups items, and
+        no more than the items counted, is counted the same way for each
+        ID of the dropdown list (read with only_id): groups are keyed by
+        ID and unused ones count 0. Otherwise (users, large entity or
+        location trees, other fields) a single search returning only
+        field is paged through and counted on the client: values are
+        then those displayed by the search engine, and empty groups are
+        missing.
+
+        Like the other methods, errors are returned as a set.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from .search import Param
+        from .export import iter_pages
 
+        try:
+            if not self.api_has_session():
+                self.init_api()
+            query = self._search_query(item_name, criteria)
+            if values is None:
+                values = self._dropdown_ids(item_name, field, query,
+                                            max_groups, workers, page_size)
+
+            if values is not None:
+                compiled = self.compile_search(
+                    query.where(field, Param('value'), searchtype='equals'))
+                total = Deadline.bind(self._total)
+                values = list(values)
+                with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                    counts = pool.map(
+                        lambda v: total(compiled.uri(value=v)), values)
+                    return OrderedDict(zip(values, counts))
+
+            compiled = self.compile_search(query.forcedisplay(field))
+            column = str(compiled.forcedisplay[-1])
+            uri = compiled.uri()
+            counts = {}
+            for _, rows in iter_pages(
+                    lambda start, end: self.api_rest.get_range(uri, start,
+                                                               end),
+                    page_size, workers=workers):
+                for row in rows:
+                    value = row.get(column)
+                    counts[value] = counts.get(value, 0) + 1
+            return counts
+
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
 
     # [U]PDATE an Item
     def update(self, item_name, data):
-        """ Update an Resource Item. Should have all the Item payload """
+        """
+        Update an Resource Item. Should have all the Item payload, or be
+        a loaded GlpiItem (only its changed attributes are sent).
+        """
         try:
             if not self.api_has_session():
                 self.init_api()
@@ -771,9 +1785,55 @@ class GLPI(object):
             self.update_uri(item_name)
             return self.api_rest.update(data)
 
+        except GlpiTimeout:
+            raise
+        except GlpiException as e:
+            return {'{}'.format(e)}
+
+    def update_many(self, item_name, items):
+        """ Update several Resource Items of item_name in one request """
+        try:
+            if not self.api_has_session():
+                self.init_api()
+
+            self.update_uri(item_name)
+            return self.api_rest.update_many(items)
+
+        except GlpiTimeout:
+            raise
+        except GlpiException as e:
+            return {'{}'.format(e)}
+
+    def upload_document(self, source, name=None, **upload_options):
+        """
+        Upload a file (path or binary file object) as a Document.
+        upload_options are passed to GlpiService.upload_document.
+        """
+        try:
+            if not self.api_has_session():
+                self.init_api()
+
+            self.update_uri('Document')
+            return self.api_rest.upload_document(source, name=name,
+                                                 **upload_options)
+
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
 
+    def download_document(self, document_id, dest, **download_options):
+        """
+        Stream the file of a Document to dest (path or file object).
+        download_options are passed to GlpiService.download_document.
+        """
+        if not self.api_has_session():
+            self.init_api()
+
+        self.update_uri('Document')
+        return self.api_rest.download_document(document_id, dest,
+                                               **download_options)
+
     # [D]ELETE an Item
     def delete(self, item_name, item_id, force_purge=False):
         """ Delete an Resource Item. Should have all the Item payload """
@@ -784,5 +1844,7 @@ class GLPI(object):
             self.update_uri(item_name)
             return self.api_rest.delete(item_id, force_purge=force_purge)
 
+        except GlpiTimeout:
+            raise
         except GlpiException as e:
             return {'{}'.format(e)}
@@ -13,16 +13,237 @@
 # limitations under the License.
 
 
+import re
+import json
+
+try:
+    from types import MappingProxyType
+except ImportError:
+    MappingProxyType = dict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+NULL_STR = "<DEFAULT_NULL>"
+
+
+def defaults_table(values):
+    """ Build the shared, read-only defaults table of an item type. """
+    return MappingProxyType(dict(values))
+
+
+EMPTY_DEFAULTS = defaults_table({})
+
+# Marks an attribute that did not exist when the item was loaded
+_MISSING = object()
+
+# Strings and brackets, used to find the end of a nested JSON value
+_JSON_TOKENS = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+_JSON_WS = re.compile(r'[ \t\n\r]*')
+
+
+class _RawJSON(object):
+    """ A JSON sub-structure kept as text until it's first accessed. """
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def decode(self):
+        return json.loads(self.text)
+
+
+def _skip_nested(text, idx):
+    """ Return the end index of the JSON object/array starting at idx. """
+    depth = 0
+    for m in _JSON_TOKENS.finditer(text, idx):
+        token = m.group()
+        if token in '[{':
+            depth += 1
+        elif token in ']}':
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    raise ValueError('Unterminated JSON value at char %d' % idx)
+
+
+def _split_json_object(text):
+    """
+    Decode the top level of a JSON object.
+    Scalars are decoded, nested objects and arrays are kept as _RawJSON.
+    """
+    decoder = json.JSONDecoder()
+    values = {}
+    idx = _JSON_WS.match(text, 0).end()
+    if text[idx:idx + 1] != '{':
+        raise ValueError('Expecting JSON object at char %d' % idx)
+    idx = _JSON_WS.match(text, idx + 1).end()
+    if text[idx:idx + 1] == '}':
+        return values
+    while True:
+        key, idx = decoder.raw_decode(text, idx)
+        idx = _JSON_WS.match(text, idx).end()
+        if text[idx:idx + 1] != ':':
+            raise ValueError('Expecting ":" at char %d' % idx)
+        idx = _JSON_WS.match(text, idx + 1).end()
+        if text[idx:idx + 1] in ('{', '['):
+            end = _skip_nested(text, idx)
+            values[key] = _RawJSON(text[idx:end])
+            idx = end
+        else:
+            values[key], idx = decoder.raw_decode(text, idx)
+        idx = _JSON_WS.match(text, idx).end()
+        char = text[idx:idx + 1]
+        if char == ',':
+            idx = _JSON_WS.match(text, idx + 1).end()
+        elif char == '}':
+            return values
+        else:
+            raise ValueError('Expecting "," or "}" at char %d' % idx)
+
+
+class _ItemData(MutableMapping):
+    """
+    The data of an item as a mapping over its defaults and values:
+    values are decoded when read, writes go through to the item like
+    set_attribute() (and are tracked). copy() gives a plain dict.
+    """
+    __slots__ = ('_item',)
+
+    def __init__(self, item):
+        self._item = item
+
+    def __getitem__(self, key):
+        item = self._item
+        if key in item._values:
+            return item._decoded(key)
+        return item._base[key]
+
+    def __contains__(self, key):
+        return key in self._item._values or key in self._item._base
+
+    def __iter__(self):
+        base = self._item._base
+        for k in base:
+            yield k
+        for k in list(self._item._values):
+            if k not in base:
+                yield k
+
+    def __len__(self):
+        base = self._item._base
+        return len(base) + sum(1 for k in self._item._values
+                               if k not in base)
+
+    def __setitem__(self, key, value):
+        self._item.set_attribute(key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._item._delete_attribute(key)
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def copy(self):
+        return dict(self.items())
+
+
 class GlpiItem(object):
-    """ Polymorphic class of GLPI Item object. """
+    """
+    Polymorphic class of GLPI Item object.
+
+    Item types declare their defaults once in the class attribute
+    `defaults` (a read-only table shared by every instance); an instance
+    only stores the attributes that differ from them.
+
+    Items loaded from the server (load() / from_json()) track which
+    attributes were changed since, so updates can send only those.
+    """
+    __slots__ = ('_base', '_values', '_changed')
+
+    null_str = NULL_STR
+    defaults = EMPTY_DEFAULTS
+
+    def __init__(self, data=None):
+        self._base = self.defaults
+        self._values = data if data is not None else {}
+        self._changed = None
+
+    @classmethod
+    def load(cls, data):
+        """ Build an item from data loaded from the server. """
+        item = cls.__new__(cls)
+        item._base = EMPTY_DEFAULTS
+        item._values = dict(data)
+        item._changed = {}
+        return item
+
+    @classmethod
+    def from_json(cls, text):
+        """
+        Build an item from a JSON object as returned by the API.
+        Nested structures (links, sub-items, ...) are decoded on first
+        access only.
+        """
+        item = cls.__new__(cls)
+        item._base = EMPTY_DEFAULTS
+        item._values = _split_json_object(text)
+        item._changed = {}
+        return item
+
+    def _track(self, attr):
+        """ Remember the loaded value of attr before its first change. """
+        if self._changed is not None and attr not in self._changed:
+            if attr in self._values or attr in self._base:
+                self._changed[attr] = self.get_attribute(attr)
+            else:
+                self._changed[attr] = _MISSING
 
-    def __init__(self, data={}):
-        self.data = data
-        self.null_str = "<DEFAULT_NULL>"
+    def _untrack_if_restored(self, attr):
+        if self._changed is not None and attr in self._changed:
+            original = self._changed[attr]
+            if original is not _MISSING and \
+                    original == self.get_attribute(attr):
+                del self._changed[attr]
+
+    def _delete_attribute(self, attr):
+        """ Remove attr, even when it's a default. """
+        self._track(attr)
+        if attr in self._base:
+            # the shared defaults can't lose a key: copy the others
+            for k, v in self._base.items():
+                self._values.setdefault(k, v)
+            self._base = EMPTY_DEFAULTS
+        self._values.pop(attr, None)
+        self._untrack_if_restored(attr)
+
+    def _decoded(self, attr):
+        value = self._values[attr]
+        if isinstance(value, _RawJSON):
+            value = value.decode()
+            self._values[attr] = value
+        return value
+
+    @property
+    def data(self):
+        return self.get_data()
+
+    @data.setter
+    def data(self, data):
+        self._base = EMPTY_DEFAULTS
+        self._values = dict(data)
+        self._changed = None
 
     def get_data(self):
-        """ Returns entire attributes of Item data. """
-        return self.data
+        """
+        Returns entire attributes of Item data, as a mapping that reads
+        the item: changing it changes the item. copy() it for a dict.
+        """
+        return _ItemData(self)
 
     def get_attributes(self):
         """ Return an specific attribute of Item data. """
@@ -30,41 +251,79 @@ class GlpiItem(object):
 
     def get_attribute(self, attr):
         """ Returns an specific attribute. """
-        if attr in self.data:
-            return self.data[attr]
+        if attr in self._values:
+            return self._decoded(attr)
+        if attr in self._base:
+            return self._base[attr]
 
     def set_attribute(self, attr, value):
         """ Define the 'value' to an key. """
-        self.data[attr] = value
+        self._track(attr)
+        self._values[attr] = value
+        self._untrack_if_restored(attr)
 
     def set_attributes(self, attributes={}):
         """ Define attributes to override defaults.  """
-        if attributes is {}:
-            return self.data
+        for k in attributes:
+            self.set_attribute(k, attributes[k])
 
+    def reset_attributes(self, attributes):
+        """ Drop overridden attributes so their defaults apply again. """
         for k in attributes:
-            if k in self.data.keys():
-                self.data[k] = attributes[k]
-            else:
-                self.data.update({k: attributes[k]})
+            if k in self._values:
+                self._track(k)
+                del self._values[k]
+                self._untrack_if_restored(k)
 
     def unset_attributes(self):
         """ Clean all attributes. """
-        self.data = {}
-        return self.data
+        self._base = EMPTY_DEFAULTS
+        self._values = {}
+        self._changed = None
+        return {}
+
+    """ Change tracking """
+    def is_tracked(self):
+        """ True if the item was loaded and records its changes. """
+        return self._changed is not None
+
+    def is_dirty(self):
+        """ True if any attribute changed since the item was loaded. """
+        return self._changed is None or bool(self._changed)
+
+    def get_changed_attributes(self):
+        """ Names of the attributes changed since the item was loaded. """
+        if self._changed is None:
+            return list(self.get_data())
+        return [k for k in self._changed if k in self._values]
+
+    def get_changes(self):
+        """
+        Return the attributes changed since the item was loaded.
+        Untracked (new) items return all their data.
+        """
+        if self._changed is None:
+            return self.get_data().copy()
+        return dict([(k, self.get_attribute(k))
+                     for k in self.get_changed_attributes()])
+
+    def mark_clean(self):
+        """ Take the current state as the loaded one. """
+        self._changed = {}
 
     def get_stream(self):
         """ Get stream of data with format acceptable in GLPI API.  """
+        data = self.get_data()
         input_data = ""
-        for k in self.data:
+        for k in data:
             if input_data != "":
                 input_data = "%s," % input_data
 
-            if self.data[k] == self.null_str:
+            if data[k] == self.null_str:
                 input_data = '%s "%s": null' % (input_data, k)
-            elif isinstance(self.data[k], str):
-                input_data = '%s "%s": "%s"' % (input_data, k, self.data[k])
+            elif isinstance(data[k], str):
+                input_data = '%s "%s": "%s"' % (input_data, k, data[k])
             else:
-                input_data = '%s "%s": %s' % (input_data, k, str(self.data[k]))
+                input_data = '%s "%s": %s' % (input_data, k, str(data[k]))
 
         return input_data
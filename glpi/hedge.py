@@ -0,0 +1,142 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Hedged requests against slow responses.
+#
+#   glpi = GLPI(url, apptoken, auth, hedger=Hedger(percentile=95))
+#   glpi.get('ticket', 12)       # resent if slower than the p95
+#   glpi.api_rest.hedger.metrics()
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .glpi import Deadline, GlpiInvalidArgument
+
+# latencies needed before the percentile is trusted
+MIN_SAMPLES = 20
+
+
+def _discard(future):
+    """ Release the response of a request nobody waits for anymore. """
+    if future.cancelled() or future.exception() is not None:
+        return
+    close = getattr(future.result(), 'close', None)
+    if close is not None:
+        close()
+
+
+class Hedger(object):
+    """
+    Send a second copy of a slow idempotent request and use whichever
+    answer comes first.
+
+    A request still running after the `percentile` latency of the last
+    `window` requests (bounded by min_delay and max_delay, max_delay
+    until MIN_SAMPLES are known) is sent again; the first successful
+    response wins and the other one is cancelled, or discarded when it
+    arrives. At most `budget` (a fraction) of the calls are hedged, so
+    hedging adds at most that much load to the server.
+
+    Requests run on a pool of `workers` threads, under the caller's
+    Deadline. metrics() tells how often hedges fire and win.
+    """
+
+    def __init__(self, percentile=95, min_delay=0.01, max_delay=1.0,
+                 budget=0.05, window=1000, workers=32):
+        if not 0 < percentile < 100:
+            raise GlpiInvalidArgument('percentile must be within 0-100')
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._stats = {'calls': 0, 'hedged': 0, 'won': 0, 'over_budget': 0}
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    def delay(self):
+        """ Seconds to wait before hedging a request. """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < MIN_SAMPLES:
+            return self.max_delay
+        index = int(round(self.percentile / 100.0 * (len(latencies) - 1)))
+        return min(self.max_delay, max(self.min_delay, latencies[index]))
+
+    def _record(self, started, future):
+        if not future.cancelled() and future.exception() is None:
+            with self._lock:
+                self._latencies.append(time.time() - started)
+
+    def _submit(self, function):
+        started = time.time()
+        future = self._pool.submit(function)
+        future.add_done_callback(lambda f: self._record(started, f))
+        return future
+
+    def _may_hedge(self):
+        with self._lock:
+            if self._stats['hedged'] < self.budget * self._stats['calls']:
+                self._stats['hedged'] += 1
+                return True
+            self._stats['over_budget'] += 1
+            return False
+
+    def call(self, function):
+        """ Result of function(), hedged if it is slow. """
+        function = Deadline.bind(function)
+        with self._lock:
+            self._stats['calls'] += 1
+        primary = self._submit(function)
+        done, _ = wait([primary], timeout=self.delay())
+        if done or not self._may_hedge():
+            return primary.result()
+
+        hedge = self._submit(function)
+        pending = [primary, hedge]
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if future.exception() is not None:
+                    continue
+                for other in pending:
+                    other.cancel()
+                    other.add_done_callback(_discard)
+                if future is hedge:
+                    with self._lock:
+                        self._stats['won'] += 1
+                return future.result()
+        # both failed: report the error of the original request
+        return primary.result()
+
+    def metrics(self):
+        """
+        {'calls', 'hedged', 'won', 'over_budget', 'hedge_rate',
+        'win_rate', 'delay'}: hedged calls, hedges answering first, slow
+        calls not hedged because of the budget, and the current delay.
+        """
+        with self._lock:
+            metrics = dict(self._stats)
+        metrics['hedge_rate'] = round(
+            metrics['hedged'] / float(metrics['calls'] or 1), 4)
+        metrics['win_rate'] = round(
+            metrics['won'] / float(metrics['hedged'] or 1), 4)
+        metrics['delay'] = self.delay()
+        return metrics
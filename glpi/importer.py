@@ -0,0 +1,271 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Bulk import of items from CSV/NDJSON streams.
+
+import io
+import csv
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .glpi import GlpiInvalidArgument
+from .glpi_item import GlpiItem
+from .item_ticket import Ticket
+from .item_problem import Problem
+from .item_knowbase import KnowBase
+from .item_network_equipment import NetworkEquipment
+
+# item type -> (API URI, item class giving the defaults, required fields)
+ITEM_TYPES = {
+    'Ticket': ('/Ticket', Ticket, ('name', 'content')),
+    'Problem': ('/Problem', Problem, ('name', 'content')),
+    'KnowBase': ('/Knowbaseitem', KnowBase, ('name', 'answer')),
+    'NetworkEquipment': ('/NetworkEquipment', NetworkEquipment, ('name',)),
+}
+
+
+def _item_type(item_type):
+    """ Look up an item type, case-insensitively. """
+    for name, spec in ITEM_TYPES.items():
+        if item_type.lower() in (name.lower(), spec[0].strip('/').lower()):
+            return name, spec
+    return item_type, ('/' + item_type, GlpiItem, ())
+
+
+def read_rows(source, fmt=None):
+    """
+    Iterate the rows (dicts) of a CSV or NDJSON file, one at a time.
+    source is a path or a text stream; fmt defaults to the file extension.
+    """
+    if fmt is None:
+        name = getattr(source, 'name', source)
+        if isinstance(name, str) and name.lower().endswith('.csv'):
+            fmt = 'csv'
+        else:
+            fmt = 'ndjson'
+
+    stream = source
+    if not hasattr(source, 'read'):
+        stream = io.open(source, encoding='utf-8', newline='')
+    try:
+        if fmt == 'csv':
+            for row in csv.DictReader(stream):
+                yield row
+        elif fmt == 'ndjson':
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise GlpiInvalidArgument('Unknown import format "%s"' % fmt)
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+class ResultLog(object):
+    """
+    Per-row results, one JSON object per line:
+    {"row", "external_id", "status", "id", "message"}.
+    status is 'created', 'invalid', 'failed' or 'skipped'.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stream = None
+
+    def imported_ids(self):
+        """ External IDs already created by a previous run. """
+        done = set()
+        try:
+            with io.open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # line cut by an interrupted run
+                    if entry.get('status') == 'created' and \
+                            entry.get('external_id') is not None:
+                        done.add(str(entry['external_id']))
+        except (IOError, OSError):
+            pass
+        return done
+
+    def write(self, entry):
+        if self.stream is None:
+            self.stream = io.open(self.path, 'a', encoding='utf-8')
+        self.stream.write(json.dumps(entry, ensure_ascii=False) + u'\n')
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+class Importer(object):
+    """
+    Import rows as items of one type with batched array-input creates.
+
+    mapping maps source columns to item fields ({'title': 'name'}); without
+    it every column is used as is. Rows are completed with the defaults of
+    the item type, converted to the defaults' types and validated before
+    being sent by `workers` threads in batches of batch_size.
+
+    With external_id (a source column) and log_path, rows created by a
+    previous run (per the result log) are skipped, so re-running an
+    import is idempotent.
+    """
+
+    def __init__(self, service, item_type, mapping=None, external_id=None,
+                 batch_size=100, workers=4, log_path=None):
+        self.item_type, (uri, self.item_class, self.required) = \
+            _item_type(item_type)
+        self.service = service.for_uri(uri)
+        self.mapping = mapping
+        self.external_id = external_id
+        self.batch_size = batch_size
+        self.workers = workers
+        self.log = ResultLog(log_path) if log_path else None
+        self.stats = {'created': 0, 'skipped': 0, 'invalid': 0,
+                      'failed': 0}
+
+    def build(self, row):
+        """
+        Map and validate a source row.
+        Returns the item input, raises GlpiInvalidArgument if invalid.
+        """
+        if self.mapping is None:
+            mapped = dict(row)
+            mapped.pop(self.external_id, None)
+        else:
+            mapped = dict([(field, row[column])
+                           for column, field in self.mapping.items()
+                           if column in row])
+
+        defaults = self.item_class.defaults
+        data = dict(defaults)
+        for field, value in mapped.items():
+            if value == '' or value is None:
+                continue
+            default = defaults.get(field)
+            if isinstance(default, int) and not isinstance(value, int):
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise GlpiInvalidArgument(
+                        'Field "%s" must be an integer, got %r' % (
+                            field, value))
+            data[field] = value
+
+        missing = [f for f in self.required
+                   if data.get(f) in (None, '', '<DEFAULT_VALUE>')]
+        if missing:
+            raise GlpiInvalidArgument(
+                'Missing required fields: %s' % ', '.join(missing))
+        return data
+
+    def _send(self, batch):
+        """ Create one batch; returns [(row_info, result)]. """
+        try:
+            results = self.service.create_many([data for _, data in batch])
+        except Exception as e:
+            results = str(e)
+
+        out = []
+        for idx, (info, _) in enumerate(batch):
+            if isinstance(results, list) and idx < len(results) and \
+                    isinstance(results[idx], dict):
+                result = results[idx]
+            else:
+                result = {'id': False, 'message': '%s' % (results,)}
+            out.append((info, result))
+        return out
+
+    def _record(self, info, status, item_id=None, message=''):
+        self.stats[status] += 1
+        if self.log is not None:
+            self.log.write({'row': info[0], 'external_id': info[1],
+                            'status': status, 'id': item_id,
+                            'message': message})
+
+    def _collect(self, future):
+        for info, result in future.result():
+            if result.get('id'):
+                self._record(info, 'created', result['id'],
+                             result.get('message', ''))
+            else:
+                self._record(info, 'failed', None,
+                             result.get('message', ''))
+        if self.log is not None:
+            self.log.flush()
+
+    def run(self, rows):
+        """
+        Import an iterable of rows. Returns the stats: counts of
+        created, skipped, invalid and failed rows.
+        """
+        done = self.log.imported_ids() if self.log and self.external_id \
+            else set()
+        pending = deque()
+        batch = []
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            def submit(batch):
+                pending.append(pool.submit(self._send, batch))
+                # bound the rows held in memory to a few batches per worker
+                while len(pending) > 2 * max(1, self.workers):
+                    self._collect(pending.popleft())
+
+            for number, row in enumerate(rows, 1):
+                ext_id = None
+                if self.external_id is not None:
+                    ext_id = row.get(self.external_id)
+                    if ext_id is not None:
+                        ext_id = str(ext_id)
+                info = (number, ext_id)
+                if ext_id is not None and ext_id in done:
+                    self._record(info, 'skipped')
+                    continue
+                try:
+                    data = self.build(row)
+                except GlpiInvalidArgument as e:
+                    self._record(info, 'invalid', message=str(e))
+                    continue
+                if ext_id is not None:
+                    done.add(ext_id)
+                batch.append((info, data))
+                if len(batch) >= self.batch_size:
+                    submit(batch)
+                    batch = []
+
+            if batch:
+                submit(batch)
+            while pending:
+                self._collect(pending.popleft())
+
+        if self.log is not None:
+            self.log.close()
+        return dict(self.stats)
+
+    def import_file(self, source, fmt=None):
+        """ Import a CSV or NDJSON file (path or text stream). """
+        start = time.time()
+        stats = self.run(read_rows(source, fmt))
+        stats['seconds'] = round(time.time() - start, 3)
+        return stats
@@ -0,0 +1,44 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .glpi import GlpiService
+from .glpi_item import GlpiItem
+
+
+class Document(GlpiItem):
+    """ Object of Item Document """
+    __slots__ = ()
+
+
+class GlpiDocument(GlpiService):
+    """ Client for GLPI Document item """
+    item_class = Document
+
+    def __init__(self, url, app_token, username=None,
+                 password=None, token_auth=None):
+        """ Construct an instance for Document item """
+
+        uri = '/Document'
+
+        GlpiService.__init__(self, url, app_token, uri,
+                             username=username, password=password,
+                             token_auth=token_auth)
+
+    def upload(self, source, name=None, **upload_options):
+        """ Upload a file (path or binary file object) as a Document. """
+        return self.upload_document(source, name=name, **upload_options)
+
+    def download(self, document_id, dest, **download_options):
+        """ Stream the file of a Document to dest (path or file object). """
+        return self.download_document(document_id, dest, **download_options)
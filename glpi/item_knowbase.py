@@ -13,28 +13,32 @@
 # limitations under the License.
 
 from .glpi import GlpiService
-from .glpi_item import GlpiItem
+from .glpi_item import GlpiItem, defaults_table
 
 
 class KnowBase(GlpiItem):
     """ Object of KB """
+    __slots__ = ()
+
+    defaults = defaults_table({
+        "knowbaseitemcategories_id": 0,
+        "users_id": 2,
+        "is_faq": 0,
+        "view": 1
+    })
 
     def __init__(self, attributes={}):
         """ Construct an KB Item. """
         GlpiItem.__init__(self, {})
 
-        defaults = {
-            "knowbaseitemcategories_id": 0,
-            "users_id": 2,
-            "is_faq": 0,
-            "view": 1
-        }
+        # defaults take precedence over the given attributes
         self.set_attributes(attributes=attributes)
-        self.set_attributes(attributes=defaults)
+        self.reset_attributes(self.defaults)
 
 
 class GlpiKnowBase(GlpiService):
     """ Client for GLPI Knowledge Base item """
+    item_class = KnowBase
 
     def __init__(self, url, app_token, username,
                  password):
@@ -13,27 +13,31 @@
 # limitations under the License.
 
 from .glpi import GlpiService
-from .glpi_item import GlpiItem
+from .glpi_item import GlpiItem, defaults_table
 
 
 class NetworkEquipment(GlpiItem):
     """ Object of NetworkEquipment """
+    __slots__ = ()
+
+    defaults = defaults_table({
+        "users_id": 2,
+        "is_faq": 0,
+        "view": 1
+    })
 
     def __init__(self, attributes={}):
         """ Construct an NetworkEquipment Item. """
         GlpiItem.__init__(self, {})
 
-        defaults = {
-            "users_id": 2,
-            "is_faq": 0,
-            "view": 1
-        }
+        # defaults take precedence over the given attributes
         self.set_attributes(attributes=attributes)
-        self.set_attributes(attributes=defaults)
+        self.reset_attributes(self.defaults)
 
 
 class GlpiNetworkEquipment(GlpiService):
     """ Client for GLPI NetworkEquipment item """
+    item_class = NetworkEquipment
 
     def __init__(self, url, app_token, username,
                  password):
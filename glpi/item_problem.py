@@ -13,11 +13,46 @@
 # limitations under the License.
 
 from .glpi import GlpiService, GlpiInvalidArgument
-from .glpi_item import GlpiItem
+from .glpi_item import GlpiItem, NULL_STR, defaults_table
 
 
 class Problem(GlpiItem):
     """ Object of Item Problem """
+    __slots__ = ()
+
+    defaults = defaults_table({
+        "name": "<DEFAULT_VALUE>",
+        "content": "<DEFAULT_VALUE>",
+        "actiontime": 0,
+        "begin_waiting_date": NULL_STR,
+        "close_delay_stat": 0,
+        "closedate": NULL_STR,
+        "due_date": NULL_STR,
+        "entities_id": 0,
+        "global_validation": 1,
+        "impact": 3,
+        "itilcategories_id": 0,
+        "locations_id": 0,
+        "priority": 3,
+        "requesttypes_id": 1,
+        "sla_waiting_duration": 0,
+        "slts_tto_id": 0,
+        "slts_ttr_id": 0,
+        "solution": NULL_STR,
+        "solutiontypes_id": 0,
+        "solve_delay_stat": 0,
+        "solvedate": NULL_STR,
+        "status": 1,
+        "takeintoaccount_delay_stat": 0,
+        "time_to_own": NULL_STR,
+        "ttr_slalevels_id": 0,
+        "type": 1,
+        "urgency": 3,
+        "users_id_lastupdater": 2,
+        "users_id_recipient": 2,
+        "validation_percent": 0,
+        "waiting_duration": 0
+    })
 
     def __init__(self, name=None, content=None, attributes={}):
         """
@@ -26,41 +61,6 @@ class Problem(GlpiItem):
         """
         GlpiItem.__init__(self, {})
 
-        defaults = {
-            "name": "<DEFAULT_VALUE>",
-            "content": "<DEFAULT_VALUE>",
-            "actiontime": 0,
-            "begin_waiting_date": self.null_str,
-            "close_delay_stat": 0,
-            "closedate": self.null_str,
-            "due_date": self.null_str,
-            "entities_id": 0,
-            "global_validation": 1,
-            "impact": 3,
-            "itilcategories_id": 0,
-            "locations_id": 0,
-            "priority": 3,
-            "requesttypes_id": 1,
-            "sla_waiting_duration": 0,
-            "slts_tto_id": 0,
-            "slts_ttr_id": 0,
-            "solution": self.null_str,
-            "solutiontypes_id": 0,
-            "solve_delay_stat": 0,
-            "solvedate": self.null_str,
-            "status": 1,
-            "takeintoaccount_delay_stat": 0,
-            "time_to_own": self.null_str,
-            "ttr_slalevels_id": 0,
-            "type": 1,
-            "urgency": 3,
-            "users_id_lastupdater": 2,
-            "users_id_recipient": 2,
-            "validation_percent": 0,
-            "waiting_duration": 0
-        }
-        self.set_attributes(attributes=defaults)
-
         if name is None or content is None:
             raise GlpiInvalidArgument(
                 'Cannot open a problem without Name and Content data')
@@ -75,6 +75,7 @@ class Problem(GlpiItem):
 
 class GlpiProblem(GlpiService):
     """ Client for GLPI Problem item """
+    item_class = Problem
 
     def __init__(self, url, app_token, username,
                  password):
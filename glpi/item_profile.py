@@ -32,6 +32,6 @@ class GlpiProfile(GlpiService):
         """
         Returns profile entitie for user authenticated here.
         This is an example and no secure to be exposed. :)
+        The result is cached until the session or its profile changes.
         """
-        response = self.request('GET', self.uri)
-        return response.json()
+        return self.get_context(self.uri)
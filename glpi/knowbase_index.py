@@ -0,0 +1,424 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Offline full-text index of the knowledge base.
+#
+#   index = KnowBaseIndex(service, 'kb-index')
+#   index.sync()
+#   index.search('printer offline', limit=5)
+
+import os
+import re
+import json
+import math
+import mmap
+import time
+import heapq
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+
+from .glpi import GlpiInvalidArgument
+from .sync import SyncSink, IncrementalSync
+
+try:
+    from html import unescape as _unescape
+except ImportError:  # Python 2
+    from HTMLParser import HTMLParser
+    _unescape = HTMLParser().unescape
+
+# (field, weight): a term in the title counts as three in the answer
+DEFAULT_FIELDS = (('name', 3), ('answer', 1))
+
+_SKIPPED = re.compile(r'<(script|style)\b.*?</\1\s*>', re.I | re.S)
+_TAG = re.compile(r'<[^>]*>')
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+# accents, once decomposed (NFKD)
+_COMBINING = re.compile(u'[\u0300-\u036f]')
+
+# postings are (doc ID, term frequency) pairs of 32-bit unsigned ints
+_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+_PAIR_SIZE = 2 * array(_TYPECODE).itemsize
+
+
+def strip_html(text):
+    """
+    Text of an answer. GLPI stores it HTML-escaped ('&lt;p&gt;...'):
+    it's unescaped, tags (and scripts and styles) are dropped, then the
+    entities of the HTML itself are unescaped.
+    """
+    text = _unescape(text)
+    text = _TAG.sub(' ', _SKIPPED.sub(' ', text))
+    return _unescape(text)
+
+
+def tokenize(text):
+    """
+    Terms of a text: lowercase words without accents, of two characters
+    or more, HTML stripped.
+    """
+    if not text:
+        return []
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8') if isinstance(text, bytes) \
+            else u'%s' % text
+    text = _COMBINING.sub(u'', unicodedata.normalize(
+        'NFKD', strip_html(text).lower()))
+    return [t for t in _TOKEN.findall(text) if len(t) > 1]
+
+
+def _read_pairs(data, offset, count):
+    pairs = array(_TYPECODE)
+    chunk = data[offset * _PAIR_SIZE:(offset + count) * _PAIR_SIZE]
+    if hasattr(pairs, 'frombytes'):
+        pairs.frombytes(chunk)
+    else:  # Python 2
+        pairs.fromstring(chunk)
+    return pairs
+
+
+def _pairs_bytes(pairs):
+    if hasattr(pairs, 'tobytes'):
+        return pairs.tobytes()
+    return pairs.tostring()  # Python 2
+
+
+class KnowBaseIndex(SyncSink):
+    """
+    Local BM25 full-text index of knowledge base articles, answering
+    searches without any request to GLPI.
+
+    sync() brings it up to date with an IncrementalSync (it's the
+    sink): only the articles whose date_mod changed are fetched and
+    re-indexed, and deleted articles are dropped by the periodical
+    deletion scan.
+
+    path is a directory. Every batch of indexed articles is written as
+    an immutable segment of postings, read through mmap; the term
+    dictionary, document lengths and sync state are kept in SQLite.
+    Postings of updated or deleted articles are skipped at search time,
+    and segments are merged into one when there are more than
+    max_segments.
+
+    fields are (field, weight) pairs; k1 and b are the BM25 parameters.
+    The index can be shared between threads.
+    """
+
+    def __init__(self, service, path, item_type='KnowbaseItem',
+                 fields=DEFAULT_FIELDS, max_segments=8, k1=1.2, b=0.75,
+                 page_size=500, workers=1):
+        self.service = service
+        self.path = path
+        self.item_type = item_type
+        self.fields = tuple(fields)
+        self.max_segments = max_segments
+        self.k1 = k1
+        self.b = b
+        self.page_size = page_size
+        self.workers = workers
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._lock = threading.RLock()
+        self._maps = {}
+        self.conn = sqlite3.connect(os.path.join(path, 'index.db'),
+                                    check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS kb_segments ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS kb_terms (segment INTEGER, '
+            'term TEXT, offset INTEGER, count INTEGER, '
+            'PRIMARY KEY (segment, term))')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS kb_docs (id INTEGER PRIMARY KEY, '
+            'segment INTEGER, length INTEGER, name TEXT, date_mod TEXT)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS kb_meta (key TEXT PRIMARY KEY, '
+            'value TEXT)')
+        self._load()
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self._docs)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    """
+    Storage
+    """
+    def _segment_path(self, segment):
+        return os.path.join(self.path, '%d.postings' % segment)
+
+    def _map(self, segment):
+        """ Read-only mmap of a segment (None when it's empty). """
+        with open(self._segment_path(segment), 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _unmap(self):
+        for data in self._maps.values():
+            if data is not None:
+                data.close()
+        self._maps = {}
+
+    def _load(self):
+        """ Read the dictionary and documents, and map the segments. """
+        with self._lock:
+            self._unmap()
+            for (segment,) in self.conn.execute(
+                    'SELECT id FROM kb_segments'):
+                self._maps[segment] = self._map(segment)
+            self._terms = defaultdict(list)
+            for segment, term, offset, count in self.conn.execute(
+                    'SELECT segment, term, offset, count FROM kb_terms'):
+                self._terms[term].append((segment, offset, count))
+            self._docs = dict(
+                (doc, (segment, length)) for doc, segment, length in
+                self.conn.execute('SELECT id, segment, length FROM kb_docs'))
+            self._total_length = sum(
+                length for _, length in self._docs.values())
+
+    def _write_segment(self, conn, postings):
+        """
+        Write postings ({term: [(doc, tf), ...]}) as a new segment;
+        returns its ID and dictionary rows.
+        """
+        segment = conn.execute('INSERT INTO kb_segments (created) '
+                               'VALUES (?)', (time.time(),)).lastrowid
+        rows = []
+        offset = 0
+        try:
+            with open(self._segment_path(segment), 'wb') as f:
+                for term in sorted(postings):
+                    pairs = array(_TYPECODE, [
+                        n for pair in sorted(postings[term]) for n in pair])
+                    f.write(_pairs_bytes(pairs))
+                    count = len(pairs) // 2
+                    rows.append((segment, term, offset, count))
+                    offset += count
+                f.flush()
+                os.fsync(f.fileno())
+            conn.executemany('INSERT INTO kb_terms (segment, term, offset, '
+                             'count) VALUES (?, ?, ?, ?)', rows)
+        except BaseException:
+            self._remove_segment_file(segment)
+            raise
+        return segment, rows
+
+    def _remove_segment_file(self, segment):
+        try:
+            os.remove(self._segment_path(segment))
+        except OSError:
+            pass
+
+    def _check_item_type(self, item_type):
+        if item_type.lower() != self.item_type.lower():
+            raise GlpiInvalidArgument('The index only holds %s, not %s' % (
+                self.item_type, item_type))
+
+    def _document(self, item):
+        """ Term frequencies and length of an article. """
+        counts = defaultdict(int)
+        for field, weight in self.fields:
+            for term in tokenize(item.get(field)):
+                counts[term] += weight
+        return counts, sum(counts.values())
+
+    def add(self, items):
+        """
+        Index (or re-index) articles, dicts with an 'id'. Returns their
+        number.
+        """
+        postings = defaultdict(list)
+        docs = {}
+        for item in items:
+            if not isinstance(item, dict) or item.get('id') is None:
+                continue
+            doc = int(item['id'])
+            counts, length = self._document(item)
+            for term, tf in counts.items():
+                postings[term].append((doc, tf))
+            docs[doc] = (length, item.get('name'), item.get('date_mod'))
+        if not docs:
+            return 0
+
+        with self._lock:
+            with self._transaction() as conn:
+                segment, rows = self._write_segment(conn, postings)
+                conn.executemany(
+                    'INSERT OR REPLACE INTO kb_docs (id, segment, length, '
+                    'name, date_mod) VALUES (?, ?, ?, ?, ?)',
+                    [(doc, segment) + docs[doc] for doc in sorted(docs)])
+            self._maps[segment] = self._map(segment)
+            for _, term, offset, count in rows:
+                self._terms[term].append((segment, offset, count))
+            for doc, (length, _, _) in docs.items():
+                previous = self._docs.get(doc)
+                if previous is not None:
+                    self._total_length -= previous[1]
+                self._docs[doc] = (segment, length)
+                self._total_length += length
+            if len(self._maps) > self.max_segments:
+                self.merge()
+        return len(docs)
+
+    def remove(self, ids):
+        """ Drop articles from the index. Returns the number removed. """
+        with self._lock:
+            ids = [int(i) for i in ids if int(i) in self._docs]
+            with self._transaction() as conn:
+                conn.executemany('DELETE FROM kb_docs WHERE id = ?',
+                                 [(i,) for i in ids])
+            for doc in ids:
+                self._total_length -= self._docs.pop(doc)[1]
+        return len(ids)
+
+    def _live(self, entries):
+        """ Yield (doc, tf, length) of the current postings of a term. """
+        for segment, offset, count in entries:
+            data = self._maps.get(segment)
+            if data is None:
+                continue
+            pairs = _read_pairs(data, offset, count)
+            for i in range(0, len(pairs), 2):
+                doc = pairs[i]
+                current = self._docs.get(doc)
+                if current is not None and current[0] == segment:
+                    yield doc, pairs[i + 1], current[1]
+
+    def merge(self):
+        """
+        Rewrite the current postings as one segment, dropping those of
+        updated and deleted articles.
+        """
+        with self._lock:
+            postings = defaultdict(list)
+            for term, entries in self._terms.items():
+                for doc, tf, _ in self._live(entries):
+                    postings[term].append((doc, tf))
+            old = list(self._maps)
+            with self._transaction() as conn:
+                segment, _ = self._write_segment(conn, postings)
+                conn.execute('DELETE FROM kb_terms WHERE segment != ?',
+                             (segment,))
+                conn.execute('DELETE FROM kb_segments WHERE id != ?',
+                             (segment,))
+                conn.execute('UPDATE kb_docs SET segment = ?', (segment,))
+            self._load()
+            for previous in old:
+                self._remove_segment_file(previous)
+
+    """
+    Search
+    """
+    def search(self, query, limit=10):
+        """
+        The articles best matching query (any of its terms), by BM25
+        score: [{'id', 'name', 'date_mod', 'score'}, ...].
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            total = len(self._docs)
+            if not terms or not total:
+                return []
+            average = float(self._total_length) / total or 1.0
+            k1, b = self.k1, self.b
+            scores = defaultdict(float)
+            for term in terms:
+                postings = list(self._live(self._terms.get(term, ())))
+                if not postings:
+                    continue
+                found = len(postings)
+                idf = math.log(1 + (total - found + 0.5) / (found + 0.5))
+                for doc, tf, length in postings:
+                    scores[doc] += idf * tf * (k1 + 1) / (
+                        tf + k1 * (1 - b + b * length / average))
+            best = heapq.nlargest(limit, scores.items(),
+                                  key=lambda s: (s[1], -s[0]))
+            results = []
+            for doc, score in best:
+                name, date_mod = self.conn.execute(
+                    'SELECT name, date_mod FROM kb_docs WHERE id = ?',
+                    (doc,)).fetchone()
+                results.append({'id': doc, 'name': name,
+                                'date_mod': date_mod,
+                                'score': round(score, 6)})
+        return results
+
+    """
+    Sync
+    """
+    def upsert(self, item_type, items):
+        self._check_item_type(item_type)
+        return self.add(items)
+
+    def delete(self, item_type, ids):
+        self._check_item_type(item_type)
+        return self.remove(ids)
+
+    def known_ids(self, item_type, ids=None):
+        self._check_item_type(item_type)
+        with self._lock:
+            if ids is None:
+                return set(self._docs)
+            return set(int(i) for i in ids if int(i) in self._docs)
+
+    def load_state(self, item_type):
+        self._check_item_type(item_type)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM kb_meta WHERE key = 'state'").fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def save_state(self, item_type, state):
+        self._check_item_type(item_type)
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO kb_meta (key, value) "
+                         "VALUES ('state', ?)", (json.dumps(state),))
+
+    def sync(self, **options):
+        """
+        Bring the index up to date with an IncrementalSync (options are
+        passed to it). Returns the sync result.
+        """
+        options.setdefault('page_size', self.page_size)
+        options.setdefault('workers', self.workers)
+        return IncrementalSync(self.service, self, **options).run(
+            self.item_type)
@@ -0,0 +1,473 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Local SQLite mirror of GLPI item types.
+#
+#   mirror = Mirror(service, 'glpi-mirror.db')
+#   mirror.refresh('Ticket')
+#   mirror.search('Ticket', {'criteria': [
+#       {'field': 'status', 'searchtype': 'equals', 'value': 2}]})
+
+import re
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .glpi import GlpiInvalidArgument, _project
+from .search import SearchQuery, Param
+from .export import iter_pages
+from .sync import SyncSink, IncrementalSync
+
+# Columns indexed when an item type has them
+DEFAULT_INDEXES = ('name', 'status', 'entities_id', 'date_mod',
+                   'is_deleted', 'users_id', 'itilcategories_id')
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# link -> (SQL operator, negate)
+_LINKS = {
+    'AND': ('AND', False),
+    'OR': ('OR', False),
+    'AND NOT': ('AND', True),
+    'OR NOT': ('OR', True),
+}
+
+
+def _quote_name(name):
+    """ SQL identifier for a table or column name. """
+    return '"%s"' % name.replace('"', '""')
+
+
+def _table_name(item_type):
+    if not _IDENTIFIER.match(item_type or ''):
+        raise GlpiInvalidArgument('Invalid item type "%s"' % item_type)
+    return item_type
+
+
+def _column_type(value):
+    """ Column affinity for a value, so '2' == 2 compares as in GLPI. """
+    if isinstance(value, (bool, int)):
+        return 'INTEGER'
+    if isinstance(value, float):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _column_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return value
+
+
+def _like_pattern(value):
+    """
+    LIKE pattern for a 'contains' value. Like GLPI, ^ and $ anchor the
+    value at the start or the end.
+    """
+    value = '%s' % value
+    start = value.startswith('^')
+    end = value.endswith('$') and len(value) > int(start)
+    value = value[int(start):len(value) - int(end)]
+    value = value.replace('\\', '\\\\').replace('%', '\\%') \
+        .replace('_', '\\_')
+    return '%s%s%s' % ('' if start else '%', value, '' if end else '%')
+
+
+class Mirror(SyncSink):
+    """
+    Copy of selected item types in a local SQLite database.
+
+    Each item type is a table with one column per item field (nested
+    values as JSON) and the item itself, so queries return what the API
+    returns. DEFAULT_INDEXES (or the fields given in indexes, per item
+    type) are indexed. search() takes the criteria of
+    GLPI.search_engine() and is answered locally; freshness() tells when
+    an item type was last copied.
+
+    refresh() copies a whole item type; sync() only fetches what changed
+    since the previous sync (see IncrementalSync, whose sink the mirror
+    is).
+
+    path is a database file, or ':memory:'. The mirror can be shared
+    between threads.
+    """
+
+    def __init__(self, service, path=':memory:', indexes=None,
+                 page_size=500, workers=1):
+        self.service = service
+        self.path = path
+        self.indexes = dict(indexes or {})
+        self.page_size = page_size
+        self.workers = workers
+
+        self._lock = threading.RLock()
+        self._columns = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False,
+                                    isolation_level=None)
+        if path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS mirror_meta ('
+            'item_type TEXT PRIMARY KEY, refreshed_at REAL, '
+            'rows INTEGER, seconds REAL, state TEXT)')
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    """
+    Storage
+    """
+    def _table_columns(self, table):
+        if table not in self._columns:
+            rows = self.conn.execute(
+                'PRAGMA table_info(%s)' % _quote_name(table)).fetchall()
+            self._columns[table] = dict((r[1], r[2]) for r in rows)
+        return self._columns[table]
+
+    def _ensure_table(self, table, items):
+        """ Create table, or add the columns of new fields. """
+        columns = self._table_columns(table)
+        if not columns:
+            self.conn.execute(
+                'CREATE TABLE %s (id INTEGER PRIMARY KEY, _item TEXT)'
+                % _quote_name(table))
+            columns.update({'id': 'INTEGER', '_item': 'TEXT'})
+
+        for item in items:
+            for field, value in item.items():
+                if field in columns or value is None:
+                    continue
+                columns[field] = _column_type(value)
+                self.conn.execute('ALTER TABLE %s ADD COLUMN %s %s' % (
+                    _quote_name(table), _quote_name(field), columns[field]))
+
+    def _create_indexes(self, table, item_type):
+        columns = self._table_columns(table)
+        for field in self.indexes.get(item_type, DEFAULT_INDEXES):
+            if field in columns:
+                self.conn.execute(
+                    'CREATE INDEX IF NOT EXISTS %s ON %s (%s)' % (
+                        _quote_name('%s__%s' % (item_type, field)),
+                        _quote_name(table), _quote_name(field)))
+
+    def _write(self, table, items):
+        items = [item for item in items if isinstance(item, dict)]
+        if not items:
+            return 0
+        self._ensure_table(table, items)
+        columns = [c for c in self._table_columns(table) if c != '_item']
+        sql = 'INSERT OR REPLACE INTO %s (%s) VALUES (%s)' % (
+            _quote_name(table),
+            ', '.join(_quote_name(c) for c in columns + ['_item']),
+            ', '.join('?' * (len(columns) + 1)))
+        self.conn.executemany(sql, [
+            [_column_value(item.get(c)) for c in columns] +
+            [json.dumps(item, separators=(',', ':'))] for item in items])
+        return len(items)
+
+    def upsert(self, item_type, items):
+        """ Insert or replace items (dicts with an 'id'). """
+        table = _table_name(item_type)
+        with self._transaction():
+            count = self._write(table, items)
+            self._create_indexes(table, item_type)
+        return count
+
+    def delete(self, item_type, ids):
+        """ Remove the items with these IDs. """
+        table = _table_name(item_type)
+        ids = list(ids)
+        with self._transaction() as conn:
+            if not self._table_columns(table) or not ids:
+                return 0
+            return conn.executemany(
+                'DELETE FROM %s WHERE id = ?' % _quote_name(table),
+                [(int(i),) for i in ids]).rowcount
+
+    def known_ids(self, item_type, ids=None):
+        table = _table_name(item_type)
+        with self._lock:
+            if not self._table_columns(table):
+                return set()
+            sql = 'SELECT id FROM %s' % _quote_name(table)
+            if ids is None:
+                return set(r[0] for r in self.conn.execute(sql))
+            ids = [int(i) for i in ids]
+            known = set()
+            for first in range(0, len(ids), 500):
+                chunk = ids[first:first + 500]
+                known.update(r[0] for r in self.conn.execute(
+                    sql + ' WHERE id IN (%s)' % ', '.join('?' * len(chunk)),
+                    chunk))
+            return known
+
+    def load_state(self, item_type):
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT state FROM mirror_meta WHERE item_type = ?',
+                (item_type,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def save_state(self, item_type, state):
+        with self._transaction():
+            self._set_meta(item_type, state=json.dumps(state))
+
+    def sync(self, item_type, **options):
+        """
+        Bring item_type up to date with an IncrementalSync (options are
+        passed to it). Returns the sync result.
+        """
+        started = time.time()
+        syncer = IncrementalSync(self.service, self,
+                                 page_size=self.page_size,
+                                 workers=self.workers, **options)
+        result = syncer.run(item_type)
+        with self._transaction() as conn:
+            rows = conn.execute('SELECT COUNT(*) FROM %s' % _quote_name(
+                _table_name(item_type))).fetchone()[0] \
+                if self._table_columns(item_type) else 0
+            self._set_meta(item_type, refreshed_at=started, rows=rows,
+                           seconds=result['seconds'])
+        return result
+
+    def refresh(self, item_type, params=None):
+        """
+        Copy every item of item_type. Pages are loaded into a staging
+        table that replaces the current one at the end, so searches keep
+        seeing the previous copy until the refresh is complete.
+        Returns the number of items.
+        """
+        table = _table_name(item_type)
+        staging = table + '__refresh'
+        started = time.time()
+
+        with self._transaction() as conn:
+            conn.execute('DROP TABLE IF EXISTS %s' % _quote_name(staging))
+            self._columns.pop(staging, None)
+
+        def fetch(first, last):
+            return self.service.get_range(item_type, first, last,
+                                          params=params)
+
+        rows = 0
+        for _, items in iter_pages(fetch, self.page_size, 0, self.workers):
+            with self._transaction():
+                rows += self._write(staging, items)
+
+        with self._transaction() as conn:
+            if not self._table_columns(staging):
+                self._ensure_table(staging, [])
+            conn.execute('DROP TABLE IF EXISTS %s' % _quote_name(table))
+            conn.execute('ALTER TABLE %s RENAME TO %s' % (
+                _quote_name(staging), _quote_name(table)))
+            self._columns[table] = self._columns.pop(staging)
+            self._create_indexes(table, item_type)
+            # a full copy has no watermark: the next sync() starts over
+            self._set_meta(item_type, refreshed_at=time.time(), rows=rows,
+                           seconds=round(time.time() - started, 3),
+                           state=None)
+        return rows
+
+    """
+    Freshness
+    """
+    def _set_meta(self, item_type, **values):
+        self.conn.execute(
+            'INSERT OR IGNORE INTO mirror_meta (item_type) VALUES (?)',
+            (item_type,))
+        for key, value in values.items():
+            self.conn.execute(
+                'UPDATE mirror_meta SET %s = ? WHERE item_type = ?' % key,
+                (value, item_type))
+
+    def freshness(self, item_type):
+        """
+        {'refreshed_at', 'age', 'rows', 'seconds'} of the last copy of
+        item_type (timestamps in seconds), None if never copied.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT refreshed_at, rows, seconds FROM mirror_meta '
+                'WHERE item_type = ?', (item_type,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return {'refreshed_at': row[0], 'age': time.time() - row[0],
+                'rows': row[1], 'seconds': row[2]}
+
+    def item_types(self):
+        """ Item types in the mirror. """
+        with self._lock:
+            return [r[0] for r in self.conn.execute(
+                'SELECT item_type FROM mirror_meta ORDER BY item_type')]
+
+    """
+    Queries
+    """
+    def _column(self, table, field):
+        if isinstance(field, int) or ('%s' % field).isdigit():
+            raise GlpiInvalidArgument(
+                'Mirror searches use field names, not search option IDs '
+                '(got %s)' % field)
+        if field not in self._table_columns(table):
+            raise GlpiInvalidArgument('Unknown field "%s" in %s mirror' % (
+                field, table))
+        return _quote_name(field)
+
+    def _condition(self, table, criterion, values):
+        column = self._column(table, criterion.get('field'))
+        searchtype = criterion.get('searchtype') or 'contains'
+        value = criterion.get('value')
+        if isinstance(value, Param):
+            value = values[value.name]
+
+        if searchtype == 'contains':
+            return "%s LIKE ? ESCAPE '\\'" % column, [_like_pattern(value)]
+        if searchtype == 'equals':
+            return '%s = ?' % column, [value]
+        if searchtype == 'notequals':
+            return '%s IS NOT ?' % column, [value]
+        if searchtype == 'lessthan':
+            return '%s < ?' % column, [value]
+        if searchtype == 'morethan':
+            return '%s > ?' % column, [value]
+        raise GlpiInvalidArgument(
+            'Search type "%s" is not supported by the mirror' % searchtype)
+
+    def _where(self, table, criteria, values):
+        """
+        WHERE clause of criteria. Criteria are combined from left to
+        right: a OR b AND c is (a OR b) AND c.
+        """
+        sql = ''
+        args = []
+        for idx, criterion in enumerate(criteria):
+            link = (criterion.get('link') or 'AND').upper()
+            if link not in _LINKS:
+                raise GlpiInvalidArgument('Invalid link "%s" in criterion %s'
+                                          % (link, criterion))
+            operator, negate = _LINKS[link]
+            condition, cond_args = self._condition(table, criterion, values)
+            if negate:
+                condition = 'NOT (%s)' % condition
+            if idx == 0:
+                sql = '(%s)' % condition
+            else:
+                sql = '(%s %s %s)' % (sql, operator, condition)
+            args.extend(cond_args)
+        return sql, args
+
+    def search(self, item_type, criteria=None, fields=None, sort=None,
+               order='ASC', item_range=None, **values):
+        """
+        Search a mirrored item type.
+
+        criteria is a search_engine() query ({'criteria': [...]}) or a
+        SearchQuery, whose Param values are taken from values. Fields are
+        item fields ('status', 'name', ...); searchtypes contains,
+        equals, notequals, lessthan and morethan are supported.
+        item_range is 'start-end' or a (start, end) tuple.
+
+        Returns the shape of a search_engine() result: {'totalcount',
+        'count', 'data', 'refreshed_at'}, items in 'data'.
+        """
+        if isinstance(criteria, SearchQuery):
+            query = criteria
+            item_type = item_type or query.itemtype
+            criteria = query.criteria
+            if query.metacriteria:
+                raise GlpiInvalidArgument(
+                    'Metacriteria are not supported by the mirror')
+            if sort is None and query.sort_field is not None:
+                sort, order = query.sort_field, query.sort_order
+            if item_range is None and query.item_range is not None:
+                item_range = tuple(
+                    values[b.name] if isinstance(b, Param) else b
+                    for b in query.item_range)
+            fields = fields or query.display or None
+        elif isinstance(criteria, dict):
+            if criteria.get('metacriteria'):
+                raise GlpiInvalidArgument(
+                    'Metacriteria are not supported by the mirror')
+            criteria = criteria.get('criteria', [])
+
+        table = _table_name(item_type)
+        result = {'totalcount': 0, 'count': 0, 'data': [],
+                  'refreshed_at': None}
+
+        with self._lock:
+            if not self._table_columns(table):
+                return result
+
+            where, args = self._where(table, criteria or [], values)
+            sql = ' FROM %s' % _quote_name(table)
+            if where:
+                sql += ' WHERE ' + where
+
+            total = self.conn.execute('SELECT COUNT(*)' + sql,
+                                      args).fetchone()[0]
+
+            if sort is not None:
+                order = (order or 'ASC').upper()
+                if order not in ('ASC', 'DESC'):
+                    raise GlpiInvalidArgument('Invalid order "%s"' % order)
+                sql += ' ORDER BY %s %s' % (self._column(table, sort), order)
+            else:
+                sql += ' ORDER BY id'
+
+            if item_range is not None:
+                if not isinstance(item_range, (list, tuple)):
+                    item_range = [int(b) for b in item_range.split('-')]
+                start, end = item_range
+                sql += ' LIMIT %d OFFSET %d' % (end - start + 1, start)
+
+            items = [json.loads(row[0]) for row in self.conn.execute(
+                'SELECT _item' + sql, args)]
+
+        if fields:
+            items = [_project(item, fields) for item in items]
+        result.update({'totalcount': total, 'count': len(items),
+                       'data': items})
+        freshness = self.freshness(item_type)
+        if freshness is not None:
+            result['refreshed_at'] = freshness['refreshed_at']
+        return result
+
+    def get(self, item_type, item_id):
+        """ The mirrored item with this ID, or None. """
+        table = _table_name(item_type)
+        with self._lock:
+            if not self._table_columns(table):
+                return None
+            row = self.conn.execute(
+                'SELECT _item FROM %s WHERE id = ?' % _quote_name(table),
+                (int(item_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_all(self, item_type, fields=None):
+        """ Every mirrored item of item_type. """
+        return self.search(item_type, fields=fields)['data']
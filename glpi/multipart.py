@@ -0,0 +1,136 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Streaming multipart/form-data bodies, so uploads never load whole files.
+
+import os
+import binascii
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return value.encode('utf-8')
+
+
+def _remaining_size(fileobj):
+    """ Bytes left to read in fileobj, or None if it can't be known. """
+    try:
+        return os.fstat(fileobj.fileno()).st_size - fileobj.tell()
+    except (AttributeError, OSError, IOError, ValueError):
+        pass
+    try:
+        pos = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        end = fileobj.tell()
+        fileobj.seek(pos)
+        return end - pos
+    except (AttributeError, OSError, IOError, ValueError):
+        return None
+
+
+class MultipartStream(object):
+    """
+    File-like multipart/form-data body.
+
+    fields is a list of (name, value) form fields, files a list of
+    (name, filename, fileobj, content_type). File contents are read in
+    chunk_size blocks while the body is sent. When every part has a known
+    size the total is exposed as `len` (Content-Length); otherwise the body
+    is sent with chunked transfer encoding.
+    """
+
+    def __init__(self, fields=(), files=(), boundary=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.boundary = boundary or binascii.hexlify(
+            os.urandom(16)).decode('ascii')
+        self.chunk_size = chunk_size
+        self.content_type = 'multipart/form-data; boundary=%s' % (
+            self.boundary)
+        self._parts = []
+
+        for name, value in fields:
+            self._parts.append(self._header(name) + _to_bytes(value) +
+                               b'\r\n')
+        for name, filename, fileobj, content_type in files:
+            self._parts.append(self._header(name, filename, content_type))
+            self._parts.append(fileobj)
+            self._parts.append(b'\r\n')
+        self._parts.append(_to_bytes('--%s--\r\n' % self.boundary))
+
+        self.len = self._total_size()
+        self._buffer = b''
+
+    def _header(self, name, filename=None, content_type=None):
+        disposition = 'form-data; name="%s"' % name
+        if filename is not None:
+            disposition += '; filename="%s"' % filename.replace('"', '%22')
+        lines = ['--%s' % self.boundary,
+                 'Content-Disposition: %s' % disposition]
+        if content_type is not None:
+            lines.append('Content-Type: %s' % content_type)
+        return _to_bytes('\r\n'.join(lines) + '\r\n\r\n')
+
+    def _total_size(self):
+        total = 0
+        for part in self._parts:
+            if isinstance(part, bytes):
+                total += len(part)
+            else:
+                size = _remaining_size(part)
+                if size is None:
+                    return None
+                total += size
+        return total
+
+    def _next_chunk(self):
+        """ Return the next piece of the body, b'' at the end. """
+        while self._parts:
+            part = self._parts[0]
+            if isinstance(part, bytes):
+                self._parts.pop(0)
+                return part
+            chunk = part.read(self.chunk_size)
+            if chunk:
+                return _to_bytes(chunk)
+            self._parts.pop(0)
+        return b''
+
+    def read(self, size=-1):
+        """ Read up to size bytes of the body (all of it if size < 0). """
+        if size is None or size < 0:
+            chunks = [self._buffer]
+            self._buffer = b''
+            chunk = self._next_chunk()
+            while chunk:
+                chunks.append(chunk)
+                chunk = self._next_chunk()
+            return b''.join(chunks)
+
+        while len(self._buffer) < size:
+            chunk = self._next_chunk()
+            if not chunk:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
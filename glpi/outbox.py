@@ -0,0 +1,423 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Durable outbox of writes, replayed when GLPI is reachable.
+#
+#   outbox = Outbox(service, 'glpi-outbox.db')
+#   outbox.start()                       # background replay
+#   outbox.create('Ticket', {...}, key='alert-1234')
+
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from .glpi import GlpiInvalidArgument, _input_data, _update_input, \
+    _updated_ids
+from .glpi_item import GlpiItem
+from .write_queue import _result_message
+
+
+class _Outage(Exception):
+    """ The server didn't process a batch: keep it for later. """
+
+
+class _Rejected(Exception):
+    """ GLPI refused a whole batch (bad input, missing right, ...). """
+
+
+class _Record(object):
+    __slots__ = ('op', 'item_type', 'data', 'key', 'seq')
+
+    def __init__(self, op, item_type, data, key):
+        self.op = op
+        self.item_type = item_type
+        self.data = data
+        self.key = key
+        self.seq = None
+
+
+class Outbox(object):
+    """
+    Durable log of creates and updates, stored in a SQLite file and
+    replayed in order once GLPI is reachable.
+
+    create() and update() return the sequence number of the write once
+    it is on disk. Writes from concurrent threads are committed together
+    (one fsync for all of them), so the log keeps up with many producers.
+    A write with the key of an earlier one (an alert ID, ...) is a
+    duplicate and is not logged again.
+
+    replay() sends pending writes in order, in batches of consecutive
+    writes of one item type (updates of one item in a batch are merged).
+    It stops at the first batch GLPI doesn't process (server down, 5xx
+    error, no session) and resumes from there next time; an expired
+    session is renewed first. Writes
+    GLPI rejects are marked 'failed' with the error instead of blocking
+    the outbox; when it rejects a whole batch, its writes are sent one
+    at a time to find the bad ones. start() replays in a background
+    thread, backing off while the server is unreachable.
+
+    metrics() gives the backlog and replay throughput.
+    """
+
+    def __init__(self, service, path, batch_size=100, interval=5,
+                 max_interval=300):
+        self.service = service
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_interval = max_interval
+
+        self._db_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._committing = False
+        self._services = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._failing = False
+        self._metrics = {'replayed': 0, 'failed': 0, 'replay_rate': None,
+                         'last_replay': None, 'last_error': None}
+
+        self.conn = sqlite3.connect(path, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, '
+            'item_type TEXT NOT NULL, data TEXT NOT NULL, '
+            'dedup_key TEXT UNIQUE, status TEXT NOT NULL, '
+            'queued_at REAL, sent_at REAL, result_id INTEGER, error TEXT)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS outbox_status '
+                          'ON outbox (status, seq)')
+
+    def close(self):
+        self.stop()
+        with self._db_lock:
+            self.conn.close()
+
+    """
+    Logging writes
+    """
+    def _commit(self, records):
+        """ Write records in one transaction (one fsync). """
+        now = time.time()
+        with self._db_lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                for r in records:
+                    cursor = self.conn.execute(
+                        'INSERT OR IGNORE INTO outbox (op, item_type, data, '
+                        'dedup_key, status, queued_at) '
+                        "VALUES (?, ?, ?, ?, 'pending', ?)",
+                        (r.op, r.item_type, json.dumps(r.data), r.key, now))
+                    if cursor.rowcount:
+                        r.seq = cursor.lastrowid
+                    else:
+                        r.seq = self.conn.execute(
+                            'SELECT seq FROM outbox WHERE dedup_key = ?',
+                            (r.key,)).fetchone()[0]
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def _append(self, record):
+        """
+        Log record and return once it is durable. The first waiting
+        thread commits the records of every thread queued meanwhile.
+        """
+        with self._cond:
+            self._buffer.append(record)
+            while record.seq is None:
+                if self._committing:
+                    self._cond.wait()
+                    continue
+                records, self._buffer = self._buffer, []
+                self._committing = True
+                self._cond.release()
+                try:
+                    self._commit(records)
+                except BaseException:
+                    for r in records:
+                        if r is not record:
+                            # let every other writer retry on its own
+                            self._buffer.append(r)
+                    raise
+                finally:
+                    self._cond.acquire()
+                    self._committing = False
+                    self._cond.notify_all()
+        self._wakeup.set()
+        return record.seq
+
+    def create(self, item_type, data, key=None):
+        """ Log the creation of an item; returns its sequence number. """
+        if isinstance(data, GlpiItem):
+            data = data.get_data()
+        return self._append(_Record('create', item_type, dict(data), key))
+
+    def update(self, item_type, data, key=None):
+        """ Log an update of the item data['id']. """
+        data = _update_input(data)
+        if data is None:
+            return None
+        if data.get('id') is None:
+            raise GlpiInvalidArgument('Cannot update an item without "id"')
+        return self._append(_Record('update', item_type, data, key))
+
+    def status(self, seq):
+        """
+        {'status', 'id', 'error'} of a logged write: status is 'pending',
+        'sent' or 'failed', id the ID of the created item.
+        """
+        with self._db_lock:
+            row = self.conn.execute(
+                'SELECT status, result_id, error FROM outbox WHERE seq = ?',
+                (seq,)).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'id': row[1], 'error': row[2]}
+
+    """
+    Replay
+    """
+    def _service(self, item_type):
+        if item_type not in self._services:
+            self._services[item_type] = self.service.for_uri(
+                '/' + item_type.strip('/'))
+        return self._services[item_type]
+
+    def _next_batch(self):
+        """ First pending writes sharing an operation and item type. """
+        with self._db_lock:
+            rows = self.conn.execute(
+                'SELECT seq, op, item_type, data FROM outbox '
+                "WHERE status = 'pending' ORDER BY seq LIMIT ?",
+                (self.batch_size,)).fetchall()
+        batch = []
+        for row in rows:
+            if batch and row[1:3] != batch[0][1:3]:
+                break
+            batch.append(row)
+        return batch
+
+    def _renew_session(self, item_type):
+        """
+        Open a new session after a 401 (GLPI restarted, sessions purged):
+        the services cached for every item type hold the expired token.
+        Raises _Outage when the session can't be opened.
+        """
+        self.service.session = None
+        self._services.clear()
+        try:
+            return self._service(item_type)
+        except Exception as e:
+            raise _Outage('Unable to open a session: %s' % e)
+
+    def _request(self, item_type, method, inputs):
+        """
+        Send an array input and return GLPI's results. An expired session
+        is renewed once. Raises _Outage when the server didn't process it
+        (5xx, session refused, not a JSON answer).
+        """
+        data = json.dumps({'input': inputs})
+        service = self._service(item_type)
+        response = service.request(method, service.uri, accept_json=True,
+                                   data=data)
+        if response.status_code == 401:
+            service = self._renew_session(item_type)
+            response = service.request(method, service.uri,
+                                       accept_json=True, data=data)
+        status = response.status_code
+        if status >= 500 or status == 401:
+            raise _Outage('HTTP %d: %s' % (status, response.text[:200]))
+        try:
+            return response.json()
+        except ValueError:
+            raise _Outage('HTTP %d: %s' % (status, response.text[:200]))
+
+    def _send(self, op, item_type, rows):
+        """ Send a batch; returns {seq: (status, item_id, error)}. """
+        try:
+            return self._send_batch(op, item_type, rows)
+        except _Rejected as e:
+            if len(rows) == 1:
+                return {rows[0][0]: ('failed', None, '%s' % e)}
+
+        # find the rejected writes: send them one at a time
+        outcome = {}
+        for row in rows:
+            try:
+                outcome.update(self._send(op, item_type, [row]))
+            except Exception:
+                if not outcome:
+                    raise
+                # keep what was processed, the rest stays pending
+                break
+        return outcome
+
+    def _send_batch(self, op, item_type, rows):
+        if op == 'create':
+            results = self._request(item_type, 'POST', [
+                _input_data(json.loads(r[3])) for r in rows])
+            if not isinstance(results, list) or len(results) != len(rows) \
+                    or not all(isinstance(r, dict) for r in results):
+                raise _Rejected(_result_message(results))
+            outcome = {}
+            for row, result in zip(rows, results):
+                if result.get('id'):
+                    outcome[row[0]] = ('sent', result['id'], None)
+                else:
+                    outcome[row[0]] = ('failed', None, result.get(
+                        'message') or 'Not created')
+            return outcome
+
+        merged = OrderedDict()
+        for row in rows:
+            data = json.loads(row[3])
+            key = str(data['id'])
+            if key not in merged:
+                merged[key] = ({}, [])
+            merged[key][0].update(data)
+            merged[key][1].append(row[0])
+        results = self._request(item_type, 'PUT',
+                                [d for d, _ in merged.values()])
+        if not isinstance(results, list) or \
+                not any(isinstance(r, dict) for r in results):
+            raise _Rejected(_result_message(results))
+        updated = _updated_ids(results)
+        outcome = {}
+        for key, (_, seqs) in merged.items():
+            for seq in seqs:
+                if key in updated:
+                    outcome[seq] = ('sent', None, None)
+                else:
+                    outcome[seq] = ('failed', None,
+                                    _result_message(results, key))
+        return outcome
+
+    def replay(self):
+        """
+        Send pending writes until the outbox is empty or GLPI fails.
+        Returns the number of writes processed (sent or failed).
+        """
+        with self._replay_lock:
+            return self._replay()
+
+    def _replay(self):
+        started = time.time()
+        processed = 0
+        self._failing = False
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                break
+            op, item_type = batch[0][1], batch[0][2]
+            try:
+                outcome = self._send(op, item_type, batch)
+            except Exception as e:
+                self._metrics['last_error'] = '%s' % e
+                self._failing = True
+                break
+            now = time.time()
+            with self._db_lock:
+                self.conn.execute('BEGIN IMMEDIATE')
+                for seq, (status, item_id, error) in outcome.items():
+                    self.conn.execute(
+                        'UPDATE outbox SET status = ?, result_id = ?, '
+                        'error = ?, sent_at = ? WHERE seq = ?',
+                        (status, item_id, error, now, seq))
+                self.conn.execute('COMMIT')
+            failed = sum(1 for o in outcome.values() if o[0] == 'failed')
+            self._metrics['replayed'] += len(outcome) - failed
+            self._metrics['failed'] += failed
+            processed += len(outcome)
+
+        elapsed = time.time() - started
+        if processed:
+            self._metrics['replay_rate'] = round(
+                processed / max(elapsed, 1e-6), 1)
+        self._metrics['last_replay'] = time.time()
+        return processed
+
+    def backlog(self):
+        """ Number of pending writes. """
+        with self._db_lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def metrics(self):
+        """
+        {'backlog', 'oldest_age', 'replayed', 'failed', 'replay_rate',
+        'last_replay', 'last_error'}: pending writes, age in seconds of
+        the oldest one, writes replayed and rejected by this process,
+        writes per second of the last replay.
+        """
+        with self._db_lock:
+            backlog, oldest = self.conn.execute(
+                'SELECT COUNT(*), MIN(queued_at) FROM outbox '
+                "WHERE status = 'pending'").fetchone()
+        metrics = dict(self._metrics)
+        metrics['backlog'] = backlog
+        metrics['oldest_age'] = time.time() - oldest if oldest else None
+        return metrics
+
+    def prune(self, older_than=7 * 24 * 3600):
+        """
+        Drop sent writes older than older_than seconds. Their keys are
+        forgotten too, so they no longer deduplicate.
+        """
+        with self._db_lock:
+            return self.conn.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?",
+                (time.time() - older_than,)).rowcount
+
+    """
+    Background replay
+    """
+    def _run(self):
+        delay = self.interval
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            self.replay()
+            if self._failing:
+                # GLPI failed: back off, new writes don't wake us up
+                delay = min(delay * 2, self.max_interval)
+                self._stop.wait(delay)
+            else:
+                delay = self.interval
+                self._wakeup.wait(delay)
+
+    def start(self):
+        """ Replay in a background thread until stop(). """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name='glpi-outbox')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,306 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Foreign key resolution with a dropdown cache.
+#
+#   resolver = Resolver(service, DropdownCache(snapshot='dropdowns.json'))
+#   tickets = resolver.resolve(glpi.get_all('ticket'))
+#   tickets[0]['entities_id_name']     # 'Root entity > Paris'
+
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from .glpi import Deadline
+from .compat import replace_file
+
+# GLPI table name (the field without '_id') -> item type
+TABLE_TYPES = {
+    'users': 'User',
+    'groups': 'Group',
+    'entities': 'Entity',
+    'locations': 'Location',
+    'itilcategories': 'ITILCategory',
+    'requesttypes': 'RequestType',
+    'solutiontypes': 'SolutionType',
+    'suppliers': 'Supplier',
+    'manufacturers': 'Manufacturer',
+    'states': 'State',
+    'profiles': 'Profile',
+    'computertypes': 'ComputerType',
+    'computermodels': 'ComputerModel',
+    'networkequipmenttypes': 'NetworkEquipmentType',
+    'networkequipmentmodels': 'NetworkEquipmentModel',
+    'networks': 'Network',
+    'knowbaseitemcategories': 'KnowbaseItemCategory',
+    'documentcategories': 'DocumentCategory',
+    'operatingsystems': 'OperatingSystem',
+    'slas': 'SLA',
+    'olas': 'OLA',
+}
+
+# item types whose ID 0 is an item (the root entity); elsewhere 0 means
+# "no reference"
+ZERO_ID_TYPES = frozenset(['Entity'])
+
+# users_id, users_id_recipient, groups_id_tech, locations_id, ...
+_FOREIGN_KEY = re.compile(r'^([a-z]+)_id(?:_[a-z]+)?$')
+
+# fields fetched for dropdown labels
+LABEL_FIELDS = ('id', 'name', 'completename', 'firstname', 'realname')
+
+_MISSING = object()
+
+
+def foreign_key_type(field, table_types=TABLE_TYPES):
+    """ Item type referenced by a field ('users_id_recipient' -> 'User'). """
+    match = _FOREIGN_KEY.match(field)
+    if match is None:
+        return None
+    return table_types.get(match.group(1))
+
+
+def label(item):
+    """ Display name of a dropdown item (completename, user full name). """
+    if item.get('completename'):
+        return item['completename']
+    names = [item.get('firstname'), item.get('realname')]
+    if all(names):
+        return '%s %s' % tuple(names)
+    return item.get('name')
+
+
+class DropdownCache(object):
+    """
+    Bounded cache of dropdown labels keyed by (item type, ID).
+
+    Holds at most max_size entries, dropping the least recently used
+    ones, and forgets entries after ttl seconds. IDs the server doesn't
+    know are cached as None so they aren't fetched over and over.
+    save() writes a snapshot that load() (or snapshot=path) uses to warm
+    the cache of the next process.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600, snapshot=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if snapshot is not None and os.path.exists(snapshot):
+            self.load(snapshot)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, item_type, item_id, default=None):
+        key = (item_type, int(item_id))
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                self.misses += 1
+                return default
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def put(self, item_type, item_id, value, stored_at=None):
+        key = (item_type, int(item_id))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, stored_at or time.time())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, path):
+        """ Write the unexpired entries to path (JSON). """
+        now = time.time()
+        with self._lock:
+            entries = [[t, i, v, s] for (t, i), (v, s)
+                       in self._entries.items() if now - s <= self.ttl]
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'saved_at': now, 'entries': entries}, f,
+                      separators=(',', ':'))
+        replace_file(tmp_path, path)
+        return len(entries)
+
+    def load(self, path):
+        """
+        Add the entries of a snapshot. They keep their age, so expired
+        ones are skipped. Returns the number of entries loaded.
+        """
+        with open(path) as f:
+            snapshot = json.load(f)
+        now = time.time()
+        loaded = 0
+        for item_type, item_id, value, stored_at in \
+                snapshot.get('entries', []):
+            if now - stored_at <= self.ttl:
+                self.put(item_type, item_id, value, stored_at)
+                loaded += 1
+        return loaded
+
+
+class Resolver(object):
+    """
+    Resolve the foreign keys of result sets to names.
+
+    resolve() collects the foreign keys (users_id, entities_id,
+    locations_id, itilcategories_id, ... see TABLE_TYPES) of every item,
+    fetches the labels missing from the cache with getMultipleItems, in
+    chunks of chunk_size per item type and item types in parallel, and
+    adds a '<field>_name' key next to each foreign key.
+
+    foreign_keys maps extra fields to item types ({'plugin_x_id':
+    'PluginX'}). 0 is no reference, except for the item types in
+    zero_id_types (ZERO_ID_TYPES: entities_id 0 is the root entity).
+    """
+
+    def __init__(self, service, cache=None, foreign_keys=None,
+                 chunk_size=100, workers=4, zero_id_types=ZERO_ID_TYPES):
+        self.service = service
+        self.cache = cache if cache is not None else DropdownCache()
+        self.foreign_keys = dict(foreign_keys or {})
+        self.zero_id_types = frozenset(zero_id_types)
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    def field_type(self, field):
+        """ Item type referenced by field, None if not a foreign key. """
+        if field in self.foreign_keys:
+            return self.foreign_keys[field]
+        return foreign_key_type(field)
+
+    def _reference(self, item_type, value):
+        """ The ID value references, None for no reference. """
+        try:
+            item_id = int(value)
+        except (TypeError, ValueError):
+            return None
+        if item_id > 0 or (item_id == 0 and item_type in self.zero_id_types):
+            return item_id
+        return None
+
+    def _references(self, items):
+        """ {item type: set of IDs} referenced by items. """
+        refs = {}
+        types = {}
+        for item in items:
+            for field, value in item.items():
+                if field not in types:
+                    types[field] = self.field_type(field)
+                if types[field] is None:
+                    continue
+                item_id = self._reference(types[field], value)
+                if item_id is not None:
+                    refs.setdefault(types[field], set()).add(item_id)
+        return refs
+
+    def _fetch(self, item_type, ids):
+        """ Labels of ids, fetched and cached ({id: label or None}). """
+        service = self.service.for_uri('/' + item_type)
+        found = service.get_many(ids, fields=list(LABEL_FIELDS),
+                                 chunk_size=self.chunk_size)
+        labels = dict((int(item['id']), label(item)) for item in found
+                      if 'id' in item)
+        for item_id in ids:
+            # unknown IDs are cached too, as None
+            labels.setdefault(item_id, None)
+            self.cache.put(item_type, item_id, labels[item_id])
+        return labels
+
+    def labels(self, refs):
+        """
+        {(item type, id): label} of {item type: IDs}, fetching the ones
+        missing from the cache.
+        """
+        labels = {}
+        missing = {}
+        for item_type, ids in refs.items():
+            for item_id in ids:
+                value = self.cache.get(item_type, item_id, _MISSING)
+                if value is _MISSING:
+                    missing.setdefault(item_type, []).append(item_id)
+                else:
+                    labels[(item_type, item_id)] = value
+
+        if len(missing) > 1 and self.workers > 1:
+            fetch = Deadline.bind(self._fetch)
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                fetched = [(t, pool.submit(fetch, t, sorted(ids)))
+                           for t, ids in missing.items()]
+                fetched = [(t, future.result()) for t, future in fetched]
+        else:
+            fetched = [(t, self._fetch(t, sorted(ids)))
+                       for t, ids in missing.items()]
+        for item_type, found in fetched:
+            for item_id, value in found.items():
+                labels[(item_type, item_id)] = value
+        return labels
+
+    def lookup(self, item_type, ids):
+        """ {id: label} of IDs of item_type (None if unknown). """
+        ids = set(self._reference(item_type, i) for i in ids)
+        ids.discard(None)
+        labels = self.labels({item_type: ids})
+        return dict((i, labels[(item_type, i)]) for i in ids)
+
+    def name(self, item_type, item_id):
+        """ Label of one item, None if unknown. """
+        item_id = self._reference(item_type, item_id)
+        if item_id is None:
+            return None
+        return self.lookup(item_type, [item_id]).get(item_id)
+
+    def resolve(self, items):
+        """
+        Copies of items (dicts, or the rows of a ColumnarResult) with a
+        '<field>_name' key added for every foreign key; no reference (0,
+        see zero_id_types) and unknown IDs give None.
+        """
+        items = [item for item in items if isinstance(item, Mapping)]
+        labels = self.labels(self._references(items))
+
+        fields = {}
+        resolved = []
+        for item in items:
+            copy = dict(item)
+            for field, value in item.items():
+                if field not in fields:
+                    fields[field] = self.field_type(field)
+                item_type = fields[field]
+                if item_type is None:
+                    continue
+                try:
+                    item_id = int(value)
+                except (TypeError, ValueError):
+                    continue
+                copy[field + '_name'] = labels.get((item_type, item_id))
+            resolved.append(copy)
+        return resolved
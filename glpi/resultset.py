@@ -0,0 +1,368 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Column-wise containers for large GLPI result sets.
+
+from array import array
+from collections import OrderedDict
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    _INTEGER_TYPES = (int, long)  # noqa: F821
+    _TEXT_TYPES = (str, unicode)  # noqa: F821
+except NameError:  # Python 3
+    _INTEGER_TYPES = (int,)
+    _TEXT_TYPES = (str,)
+
+# int64 array typecode: 'q', or 'l' on Python 2 where C longs are 64-bit
+# (None elsewhere: integers then go to object columns)
+try:
+    _INT64 = 'q' if array('q').itemsize == 8 else None
+except ValueError:  # Python 2
+    _INT64 = 'l' if array('l').itemsize == 8 else None
+
+
+# Zero-copy view of a typed array: memoryview, or on Python 2 (where
+# array has no new-style buffer) a read-only buffer of its bytes
+try:
+    memoryview(array('i'))
+    _buffer = memoryview
+except TypeError:  # Python 2
+    _buffer = buffer  # noqa: F821
+
+
+def _is_integer(value):
+    return isinstance(value, _INTEGER_TYPES) and \
+        not isinstance(value, bool)
+
+
+def _import_optional(name):
+    """ Import an optional dependency used only by exporters. """
+    try:
+        return __import__(name)
+    except ImportError:
+        raise ImportError(
+            '%s is required for this export. Install it with: pip install %s'
+            % (name, name))
+
+
+class IntColumn(object):
+    """ Integer column: int64 values plus a byte-per-row validity mask. """
+    kind = 'int'
+
+    def __init__(self, length=0):
+        self.values = array(_INT64, [0] * length)
+        self.valid = bytearray(length)
+
+    def accepts(self, value):
+        return value is None or (_is_integer(value) and
+                                 -2 ** 63 <= value < 2 ** 63)
+
+    def append(self, value):
+        if value is None:
+            self.values.append(0)
+            self.valid.append(0)
+        else:
+            self.values.append(value)
+            self.valid.append(1)
+
+    def get(self, idx):
+        if self.valid[idx]:
+            return self.values[idx]
+        return None
+
+    def __len__(self):
+        return len(self.values)
+
+
+class StrColumn(object):
+    """
+    Dictionary-encoded string column.
+    Every distinct value is stored once in categories; rows keep an int32
+    code into it (-1 for null).
+    """
+    kind = 'str'
+
+    def __init__(self, length=0):
+        self.codes = array('i', [-1] * length)
+        self.categories = []
+        self._lookup = {}
+
+    def accepts(self, value):
+        return value is None or isinstance(value, _TEXT_TYPES)
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.categories)
+            self._lookup[value] = code
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def get(self, idx):
+        code = self.codes[idx]
+        if code < 0:
+            return None
+        return self.categories[code]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class ObjectColumn(object):
+    """ Fallback column for mixed or nested values. """
+    kind = 'object'
+
+    def __init__(self, length=0):
+        self.values = [None] * length
+
+    def accepts(self, value):
+        return True
+
+    def append(self, value):
+        self.values.append(value)
+
+    def get(self, idx):
+        return self.values[idx]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class NullColumn(ObjectColumn):
+    """ Column that only held nulls so far; retyped on first value. """
+
+    def accepts(self, value):
+        return value is None
+
+
+def _new_column(value, length):
+    """ Pick the column type for the first non-null value. """
+    if value is None:
+        column = NullColumn(length)
+    elif _is_integer(value) and _INT64:
+        column = IntColumn(length)
+    elif isinstance(value, _TEXT_TYPES):
+        column = StrColumn(length)
+    else:
+        column = ObjectColumn(length)
+    if not column.accepts(value):
+        column = ObjectColumn(length)
+    return column
+
+
+class RowView(Mapping):
+    """ Read-only dict-like view of one row of a ColumnarResult. """
+    __slots__ = ('_result', '_idx')
+
+    def __init__(self, result, idx):
+        self._result = result
+        self._idx = idx
+
+    def __getitem__(self, key):
+        return self._result._columns[key].get(self._idx)
+
+    def __iter__(self):
+        return iter(self._result._columns)
+
+    def __len__(self):
+        return len(self._result._columns)
+
+    def __repr__(self):
+        return 'RowView(%r)' % dict(self)
+
+
+class ColumnarResult(object):
+    """
+    Column-wise store of GLPI item rows.
+
+    Integer columns (IDs, foreign keys, flags) are kept in typed arrays,
+    string columns are dictionary encoded so repeated values are stored
+    once. Rows are materialized only on demand through RowView.
+    """
+
+    def __init__(self, rows=None):
+        self._columns = OrderedDict()
+        self._length = 0
+        if rows is not None:
+            self.extend(rows)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self._length
+        if not 0 <= idx < self._length:
+            raise IndexError('row index out of range')
+        return RowView(self, idx)
+
+    def __iter__(self):
+        for idx in range(self._length):
+            yield RowView(self, idx)
+
+    @property
+    def columns(self):
+        """ Column names, in first-seen order. """
+        return list(self._columns)
+
+    def column_kind(self, name):
+        """ Storage kind of a column: 'int', 'str' or 'object'. """
+        return self._columns[name].kind
+
+    def append(self, row):
+        """ Add one row (a dict) to the result. """
+        for key, value in row.items():
+            column = self._columns.get(key)
+            if column is None:
+                column = _new_column(value, self._length)
+                self._columns[key] = column
+            elif not column.accepts(value):
+                column = self._convert(key, column, value)
+            column.append(value)
+
+        self._length += 1
+        for column in self._columns.values():
+            if len(column) < self._length:
+                column.append(None)
+
+    def extend(self, rows):
+        """ Add every row of an iterable. """
+        for row in rows:
+            self.append(row)
+
+    def _convert(self, key, column, value):
+        """ Replace a column that cannot store value. """
+        if isinstance(column, NullColumn):
+            converted = _new_column(value, len(column))
+        else:
+            converted = ObjectColumn()
+            converted.values = [column.get(i) for i in range(len(column))]
+        self._columns[key] = converted
+        return converted
+
+    def column(self, name):
+        """ Return the values of a column as a Python list. """
+        column = self._columns[name]
+        return [column.get(i) for i in range(self._length)]
+
+    def to_dicts(self):
+        """ Materialize every row as a plain dict. """
+        return [dict(row) for row in self]
+
+    def buffers(self):
+        """
+        Return the raw column storage, without copying.
+
+        Maps each column name to a dict:
+          int:    {'kind', 'values' (memoryview of int64), 'valid' (bytes
+                  mask, 1 = not null)}
+          str:    {'kind', 'codes' (memoryview of int32, -1 = null),
+                  'categories' (list of str)}
+          object: {'kind', 'values' (list)}
+        On Python 2 the memoryviews are read-only buffers of the bytes.
+        """
+        out = OrderedDict()
+        for name, column in self._columns.items():
+            if column.kind == 'int':
+                out[name] = {'kind': 'int',
+                             'values': _buffer(column.values),
+                             'valid': _buffer(column.valid)}
+            elif column.kind == 'str':
+                out[name] = {'kind': 'str',
+                             'codes': _buffer(column.codes),
+                             'categories': column.categories}
+            else:
+                out[name] = {'kind': 'object', 'values': column.values}
+        return out
+
+    def to_numpy(self):
+        """
+        Export columns to NumPy.
+        Integer columns are zero-copy views over the typed arrays (masked
+        arrays when they hold nulls); strings become object arrays.
+        While such views are alive the result cannot grow.
+        """
+        np = _import_optional('numpy')
+        out = OrderedDict()
+        for name, column in self._columns.items():
+            if column.kind == 'int':
+                values = np.frombuffer(column.values, dtype=np.int64)
+                valid = np.frombuffer(column.valid, dtype=np.uint8)
+                if valid.all():
+                    out[name] = values
+                else:
+                    out[name] = np.ma.MaskedArray(values, mask=valid == 0)
+            elif column.kind == 'str':
+                codes = np.frombuffer(column.codes, dtype=np.int32)
+                categories = np.empty(len(column.categories) + 1,
+                                      dtype=object)
+                categories[:-1] = column.categories
+                out[name] = categories[codes]
+            else:
+                values = np.empty(self._length, dtype=object)
+                values[:] = column.values
+                out[name] = values
+        return out
+
+    def to_pandas(self):
+        """
+        Export to a pandas DataFrame.
+        Integer columns become nullable Int64 arrays sharing the typed
+        buffers, strings become Categoricals built from the codes.
+        """
+        pd = _import_optional('pandas')
+        np = _import_optional('numpy')
+        data = OrderedDict()
+        for name, column in self._columns.items():
+            if column.kind == 'int':
+                values = np.frombuffer(column.values, dtype=np.int64)
+                mask = np.frombuffer(column.valid, dtype=np.uint8) == 0
+                data[name] = pd.arrays.IntegerArray(values, mask)
+            elif column.kind == 'str':
+                codes = np.frombuffer(column.codes, dtype=np.int32)
+                data[name] = pd.Categorical.from_codes(
+                    codes, categories=column.categories)
+            else:
+                data[name] = column.values
+        return pd.DataFrame(data, index=pd.RangeIndex(self._length))
+
+    def to_arrow(self):
+        """
+        Export to a pyarrow Table.
+        Strings are exported as dictionary arrays over the codes.
+        """
+        pa = _import_optional('pyarrow')
+        np = _import_optional('numpy')
+        arrays = []
+        for name, column in self._columns.items():
+            if column.kind == 'int':
+                values = np.frombuffer(column.values, dtype=np.int64)
+                mask = np.frombuffer(column.valid, dtype=np.uint8) == 0
+                arrays.append(pa.array(values, mask=mask))
+            elif column.kind == 'str':
+                codes = np.frombuffer(column.codes, dtype=np.int32)
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(codes, mask=codes < 0),
+                    pa.array(column.categories, type=pa.string())))
+            else:
+                arrays.append(pa.array(column.values))
+        return pa.Table.from_arrays(arrays, names=list(self._columns))
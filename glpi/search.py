@@ -0,0 +1,275 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Search engine query builder.
+#
+#   query = (SearchQuery('Ticket')
+#            .where('status', Param('status'), searchtype='equals')
+#            .where('entities_id', Param('entity'), searchtype='equals')
+#            .forcedisplay('name', 'status')
+#            .sort('date_mod', 'DESC'))
+#   open_tickets = glpi.compile_search(query)     # field names checked once
+#   glpi.execute_search(open_tickets, status=2, entity=4)
+
+import re
+
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
+
+from .glpi import GlpiInvalidArgument
+from .compat import text_type, to_bytes
+
+
+class Param(object):
+    """ Placeholder for a criterion value given when the search runs. """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'Param(%r)' % self.name
+
+
+def field_map(item_name, search_options):
+    """
+    Map field names to search option IDs.
+    Names are the option uids with the item type stripped:
+    {"1": {"uid": "Computer.name"}} gives {"name": 1}.
+    """
+    fields = {}
+    prefix = re.compile('^' + re.escape(item_name) + '.', re.IGNORECASE)
+    if not isinstance(search_options, dict):
+        return fields
+    for field_id, field_opts in search_options.items():
+        if field_id.isdigit() and isinstance(field_opts, dict) and \
+                'uid' in field_opts:
+            fields[prefix.sub('', field_opts['uid'])] = int(field_id)
+    return fields
+
+
+def _field_id(fields, field, what):
+    """ Search option ID of field (a name, an ID or a numeric string). """
+    if isinstance(field, int):
+        return field
+    if field is None:
+        raise GlpiInvalidArgument('Missing "field" parameter for ' + what)
+    if field.isdigit():
+        return int(field)
+    if field in fields:
+        return fields[field]
+    raise GlpiInvalidArgument('Cannot map field name "%s" to a field id '
+                              'for %s' % (field, what))
+
+
+def _quote(value):
+    if value is True or value is False:
+        value = 'true' if value else 'false'
+    if not isinstance(value, (text_type, bytes)):
+        value = text_type(value)
+    # quoted as UTF-8 (py2 unicode and str included)
+    return quote(to_bytes(value), safe='')
+
+
+class SearchQuery(object):
+    """
+    Builder of GLPI search engine queries: criteria, metacriteria, sort,
+    range and forcedisplay. Fields are given by name (option uid without
+    the item type) or by search option ID; values may be Param
+    placeholders. compile() validates the fields and returns a reusable
+    CompiledSearch.
+    """
+
+    def __init__(self, itemtype):
+        self.itemtype = itemtype
+        self.criteria = []
+        self.metacriteria = []
+        self.sort_field = None
+        self.sort_order = None
+        self.item_range = None
+        self.display = []
+
+    def copy(self):
+        """ Independent copy, to extend a shared base query. """
+        query = SearchQuery(self.itemtype)
+        query.criteria = list(self.criteria)
+        query.metacriteria = list(self.metacriteria)
+        query.sort_field = self.sort_field
+        query.sort_order = self.sort_order
+        query.item_range = self.item_range
+        query.display = list(self.display)
+        return query
+
+    def where(self, field, value='', searchtype=None, link=None):
+        """
+        Add a criterion. link ('AND', 'OR', 'AND NOT', 'OR NOT') defaults
+        to AND for every criterion but the first.
+        """
+        self.criteria.append({'field': field, 'value': value,
+                              'searchtype': searchtype, 'link': link})
+        return self
+
+    def meta(self, itemtype, field, value='', searchtype=None, link='AND'):
+        """ Add a metacriterion on a linked item type. """
+        self.metacriteria.append({'itemtype': itemtype, 'field': field,
+                                  'value': value, 'searchtype': searchtype,
+                                  'link': link})
+        return self
+
+    def sort(self, field, order='ASC'):
+        self.sort_field = field
+        self.sort_order = order
+        return self
+
+    def range(self, start, end):
+        """ Rows start..end (inclusive); values may be Params. """
+        self.item_range = (start, end)
+        return self
+
+    def forcedisplay(self, *fields):
+        self.display.extend(fields)
+        return self
+
+    def compile(self, search_options):
+        """
+        Check the fields and build the URL-encoded query template.
+        search_options is a callable returning the listSearchOptions of
+        an item type (like GLPI.cached_search_options).
+        """
+        maps = {}
+
+        def fields_of(itemtype):
+            if itemtype not in maps:
+                maps[itemtype] = field_map(itemtype,
+                                           search_options(itemtype))
+            return maps[itemtype]
+
+        fields = fields_of(self.itemtype)
+        pairs = []
+
+        for idx, c in enumerate(self.criteria):
+            what = '%d. criterion %s' % (idx + 1, c)
+            key = 'criteria[%d]' % idx
+            pairs.append((key + '[field]', _field_id(fields, c['field'],
+                                                     what)))
+            pairs.append((key + '[value]', c['value']
+                          if c['value'] is not None else ''))
+            pairs.append((key + '[searchtype]', c['searchtype'] or ''))
+            link = c['link'] or (idx > 0 and 'AND')
+            if link:
+                pairs.append((key + '[link]', link))
+
+        for idx, m in enumerate(self.metacriteria):
+            what = '%d. metacriterion %s' % (idx + 1, m)
+            key = 'metacriteria[%d]' % idx
+            pairs.append((key + '[link]', m['link'] or 'AND'))
+            pairs.append((key + '[itemtype]', m['itemtype']))
+            pairs.append((key + '[field]', _field_id(
+                fields_of(m['itemtype']), m['field'], what)))
+            pairs.append((key + '[searchtype]', m['searchtype'] or ''))
+            pairs.append((key + '[value]', m['value']
+                          if m['value'] is not None else ''))
+
+        if self.sort_field is not None:
+            pairs.append(('sort', _field_id(fields, self.sort_field,
+                                            'sort')))
+            pairs.append(('order', self.sort_order or 'ASC'))
+
+        if self.item_range is not None:
+            start, end = self.item_range
+            if isinstance(start, Param) or isinstance(end, Param):
+                pairs.append(('range', _RangeParam(start, end)))
+            else:
+                pairs.append(('range', '%d-%d' % (start, end)))
+
+        for idx, f in enumerate(self.display):
+            pairs.append(('forcedisplay[%d]' % idx,
+                          _field_id(fields, f, 'forcedisplay')))
+
+        return CompiledSearch(self.itemtype, pairs)
+
+
+class _RangeParam(object):
+    """ A range whose bounds are (partly) Params. """
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    def params(self):
+        return [p.name for p in (self.start, self.end)
+                if isinstance(p, Param)]
+
+    def render(self, values):
+        bounds = []
+        for p in (self.start, self.end):
+            bounds.append(values[p.name] if isinstance(p, Param) else p)
+        return '%d-%d' % tuple(bounds)
+
+
+class CompiledSearch(object):
+    """
+    A search with its fields resolved and its query string pre-encoded.
+    Only Param values are encoded when the search is rendered.
+    """
+
+    def __init__(self, itemtype, pairs):
+        self.itemtype = itemtype
+        self.path = 'search/%s' % itemtype
+        self.params = []
+        # search option IDs of the result columns, in forcedisplay order
+        self.forcedisplay = [value for key, value in pairs
+                             if key.startswith('forcedisplay[')]
+        self._segments = []
+
+        literal = []
+        for key, value in pairs:
+            prefix = _quote(key) + '='
+            if isinstance(value, (Param, _RangeParam)):
+                self._segments.append('&'.join(literal + [prefix]))
+                self._segments.append(value)
+                literal = ['']
+                if isinstance(value, Param):
+                    self.params.append(value.name)
+                else:
+                    self.params.extend(value.params())
+            else:
+                literal.append(prefix + _quote(value))
+        self._segments.append('&'.join(literal))
+
+    def render(self, **values):
+        """ Query string with the Param values filled in. """
+        missing = [p for p in self.params if p not in values]
+        if missing:
+            raise GlpiInvalidArgument('Missing search parameters: %s' %
+                                      ', '.join(missing))
+        parts = []
+        for segment in self._segments:
+            if isinstance(segment, Param):
+                parts.append(_quote(values[segment.name]))
+            elif isinstance(segment, _RangeParam):
+                parts.append(_quote(segment.render(values)))
+            else:
+                parts.append(segment)
+        return ''.join(parts)
+
+    def uri(self, **values):
+        """ URI relative to the API root: 'search/Ticket?criteria...' """
+        return '%s?%s' % (self.path, self.render(**values))
+
+    def __repr__(self):
+        return 'CompiledSearch(%r, params=%r)' % (self.itemtype, self.params)
@@ -0,0 +1,145 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# On-disk session token cache shared between processes.
+
+import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from .compat import replace_file
+
+
+def default_cache_dir():
+    """ Per-user cache directory for session tokens. """
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'glpi-sdk', 'sessions')
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+@contextmanager
+def _file_lock(path):
+    """ Exclusive lock on path, held for the duration of the block. """
+    f = open(path, 'a+')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        f.close()
+
+
+class SessionCache(object):
+    """
+    Cache of GLPI session tokens, shared by every process of a user.
+
+    Entries are keyed by API URL, App-Token and a fingerprint of the
+    credentials (never stored themselves), one file per key. A token
+    validated less than `revalidate_after` seconds ago is reused as is,
+    an older one is checked with a cheap request first, and entries not
+    validated for `ttl` seconds are dropped.
+    """
+
+    def __init__(self, path=None, ttl=1200, revalidate_after=300):
+        self.path = path or default_cache_dir()
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o700)
+
+    def key(self, url, app_token, credentials):
+        """ Cache key of a session: URL, app token and credentials. """
+        return _sha256(url.rstrip('/'), app_token,
+                       _sha256(credentials))
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    @contextmanager
+    def lock(self, key):
+        """ Serialize session setup for key between processes. """
+        with _file_lock(os.path.join(self.path, key + '.lock')):
+            yield
+
+    def get(self, key):
+        """
+        Return the entry of key ({'session_token', 'created',
+        'validated'}) or None if missing or expired.
+        """
+        try:
+            with open(self._entry_path(key)) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if time.time() - entry.get('validated', 0) > self.ttl:
+            self.invalidate(key)
+            return None
+        return entry
+
+    def needs_revalidation(self, entry):
+        """ True if the entry should be checked before it's reused. """
+        return time.time() - entry.get('validated', 0) > \
+            self.revalidate_after
+
+    def put(self, key, session_token, created=None):
+        """ Store (or refresh) the session token of key. """
+        now = time.time()
+        entry = {'session_token': session_token,
+                 'created': created or now,
+                 'validated': now}
+        path = self._entry_path(key)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        replace_file(tmp_path, path)
+        return entry
+
+    def touch(self, key, entry):
+        """ Record that the token of entry was just validated. """
+        return self.put(key, entry['session_token'],
+                        created=entry.get('created'))
+
+    def invalidate(self, key):
+        """ Forget the session token of key. """
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
@@ -0,0 +1,261 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Incremental sync of item types using date_mod watermarks.
+#
+#   syncer = IncrementalSync(service, sink)
+#   syncer.run('Ticket')    # first run copies everything, then only changes
+
+import time
+from datetime import datetime, timedelta
+
+from .search import SearchQuery, Param
+from .export import iter_pages
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(('%s' % value)[:19], DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+class SyncSink(object):
+    """
+    Receiver of the changes found by IncrementalSync.
+
+    Subclasses implement upsert(), delete() and known_ids(); insert() and
+    update() default to upsert(). The sync state (watermark, scan time)
+    is kept in memory unless load_state()/save_state() are overridden to
+    store it with the data.
+    """
+
+    def upsert(self, item_type, items):
+        """ Store items (dicts with an 'id'), new or changed. """
+        raise NotImplementedError
+
+    def insert(self, item_type, items):
+        """ Store items that are new to the sink. """
+        self.upsert(item_type, items)
+
+    def update(self, item_type, items):
+        """ Store items that changed since the last sync. """
+        self.upsert(item_type, items)
+
+    def delete(self, item_type, ids):
+        """ Remove the items with these IDs. """
+        raise NotImplementedError
+
+    def known_ids(self, item_type, ids=None):
+        """ IDs held by the sink: all of them, or those among ids. """
+        raise NotImplementedError
+
+    def load_state(self, item_type):
+        return getattr(self, '_sync_state', {}).get(item_type)
+
+    def save_state(self, item_type, state):
+        if not hasattr(self, '_sync_state'):
+            self._sync_state = {}
+        self._sync_state[item_type] = state
+
+
+class IncrementalSync(object):
+    """
+    Keep a SyncSink up to date with item types of a GLPI server.
+
+    The first run copies every item. Later runs search only the items
+    whose date_field is newer than the stored watermark, minus `overlap`
+    seconds to absorb clock skew and changes committed late, and fetch
+    them with getMultipleItems. Search pages are walked by date, not by
+    offset, so items modified during a sync can't shift others out of
+    it. Items that were already in the sink are passed to update(), the
+    others to insert().
+
+    Deletions can't be seen in date_mod, so every `scan_interval` seconds
+    the list of IDs (only_id, a few bytes per item) is compared with the
+    sink's, and the missing items are passed to delete().
+    """
+
+    def __init__(self, service, sink, overlap=60, scan_interval=3600,
+                 page_size=500, workers=1, date_field='date_mod'):
+        self.service = service
+        self.sink = sink
+        self.overlap = overlap
+        self.scan_interval = scan_interval
+        self.page_size = page_size
+        self.workers = workers
+        self.date_field = date_field
+        self._searches = {}
+
+    def _search_options(self, item_type):
+        return self.service.get_path('listSearchOptions/%s' % item_type)
+
+    def _changed_search(self, item_type):
+        """ Compiled search of the items changed since a date. """
+        if item_type not in self._searches:
+            query = (SearchQuery(item_type)
+                     .where(self.date_field, Param('since'),
+                            searchtype='morethan')
+                     .forcedisplay('id', self.date_field)
+                     .sort(self.date_field, 'ASC'))
+            compiled = query.compile(self._search_options)
+            # result columns are keyed by search option ID
+            id_col, date_col = compiled.forcedisplay
+            self._searches[item_type] = (compiled, str(id_col),
+                                         str(date_col))
+        return self._searches[item_type]
+
+    def changed_since(self, item_type, since):
+        """
+        Yield (id, date) of the items changed after since, a datetime,
+        in date order.
+        """
+        compiled, id_col, date_col = self._changed_search(item_type)
+        seen = set()
+        offset = 0
+        while True:
+            path = compiled.uri(since=since.strftime(DATE_FORMAT))
+            rows, _ = self.service.get_range(path, offset,
+                                             offset + self.page_size - 1)
+            last = None
+            for row in rows:
+                item_id = int(row[id_col])
+                date = _parse_date(row.get(date_col))
+                if date is not None:
+                    last = date if last is None else max(last, date)
+                if item_id not in seen:
+                    seen.add(item_id)
+                    yield item_id, date
+            if len(rows) < self.page_size:
+                return
+            # next page: restart after the last date seen (one second
+            # before it, as morethan is strict); if the whole page had
+            # that date, move on by offset
+            next_since = last - timedelta(seconds=1) if last else since
+            if next_since > since:
+                since = next_since
+                offset = 0
+            else:
+                offset += self.page_size
+
+    def _store(self, item_type, items):
+        """ Pass items to insert() or update(); returns the counts. """
+        if not items:
+            return 0, 0
+        known = self.sink.known_ids(item_type, [i['id'] for i in items])
+        inserted = [i for i in items if i['id'] not in known]
+        updated = [i for i in items if i['id'] in known]
+        if inserted:
+            self.sink.insert(item_type, inserted)
+        if updated:
+            self.sink.update(item_type, updated)
+        return len(inserted), len(updated)
+
+    def _max_date(self, items, watermark):
+        for item in items:
+            date = _parse_date(item.get(self.date_field))
+            if date is not None and (watermark is None or date > watermark):
+                watermark = date
+        return watermark
+
+    def _full_copy(self, item_type, result):
+        watermark = None
+
+        def fetch(first, last):
+            return self.service.get_range(item_type, first, last)
+
+        for _, items in iter_pages(fetch, self.page_size, 0, self.workers):
+            items = [i for i in items if isinstance(i, dict)]
+            inserted, updated = self._store(item_type, items)
+            result['inserted'] += inserted
+            result['updated'] += updated
+            watermark = self._max_date(items, watermark)
+        return watermark
+
+    def _copy_changes(self, item_type, watermark, result):
+        since = watermark - timedelta(seconds=self.overlap)
+        service = self.service.for_uri('/' + item_type)
+        batch = []
+        for item_id, date in self.changed_since(item_type, since):
+            batch.append(item_id)
+            if len(batch) >= self.page_size:
+                watermark = self._copy_items(service, item_type, batch,
+                                             watermark, result)
+                batch = []
+        if batch:
+            watermark = self._copy_items(service, item_type, batch,
+                                         watermark, result)
+        return watermark
+
+    def _copy_items(self, service, item_type, ids, watermark, result):
+        items = service.get_many(ids)
+        inserted, updated = self._store(item_type, items)
+        result['inserted'] += inserted
+        result['updated'] += updated
+        return self._max_date(items, watermark)
+
+    def scan_deleted(self, item_type):
+        """
+        Compare the IDs on the server with the sink's and delete the
+        missing ones. Returns the number of deleted items.
+        """
+        def fetch(first, last):
+            return self.service.get_range(item_type, first, last,
+                                          params={'only_id': True})
+
+        server_ids = set()
+        for _, rows in iter_pages(fetch, max(self.page_size, 1000), 0,
+                                  self.workers):
+            server_ids.update(int(row['id']) for row in rows
+                              if isinstance(row, dict) and 'id' in row)
+        deleted = set(self.sink.known_ids(item_type)) - server_ids
+        if deleted:
+            self.sink.delete(item_type, sorted(deleted))
+        return len(deleted)
+
+    def run(self, item_type, scan=None):
+        """
+        Sync item_type once. scan forces (True) or skips (False) the
+        deletion scan, which by default runs every scan_interval seconds.
+
+        Returns {'inserted', 'updated', 'deleted', 'watermark',
+        'seconds'}.
+        """
+        started = time.time()
+        state = dict(self.sink.load_state(item_type) or {})
+        watermark = _parse_date(state.get('watermark') or '')
+        result = {'inserted': 0, 'updated': 0, 'deleted': 0}
+
+        if watermark is None:
+            watermark = self._full_copy(item_type, result)
+            state['scanned_at'] = started
+        else:
+            watermark = self._copy_changes(item_type, watermark, result)
+            if scan is None:
+                scan = started - state.get('scanned_at', 0) >= \
+                    self.scan_interval
+            if scan:
+                result['deleted'] = self.scan_deleted(item_type)
+                state['scanned_at'] = started
+
+        state['watermark'] = watermark.strftime(DATE_FORMAT) \
+            if watermark is not None else None
+        state['synced_at'] = time.time()
+        self.sink.save_state(item_type, state)
+
+        result['watermark'] = state['watermark']
+        result['seconds'] = round(time.time() - started, 3)
+        return result
@@ -0,0 +1,299 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# HTTP transports for GlpiService.
+#
+#   glpi = GLPI(url, apptoken, auth, transport=RequestsTransport())
+#   glpi = GLPI(url, apptoken, auth, transport=Urllib3Transport())
+#   glpi = GLPI(url, apptoken, auth, transport=HttpxTransport(http2=True))
+
+import json as json_import
+import base64
+
+from .glpi import GlpiTimeout, GlpiInvalidArgument
+
+try:
+    from urllib.parse import urlencode
+except ImportError:  # Python 2
+    from urllib import urlencode
+
+try:
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:  # Python 2
+    from cookielib import DefaultCookiePolicy
+
+
+def _import_optional(name, package):
+    """ Import an optional dependency used by one transport. """
+    try:
+        return __import__(name)
+    except ImportError:
+        raise ImportError(
+            '%s is required for this transport. Install it with: '
+            'pip install %s' % (name, package))
+
+
+def _timeouts(timeout):
+    """ (connect, read) seconds of a requests-style timeout. """
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+def _url(url, params):
+    if not params:
+        return url
+    return '%s%s%s' % (url, '&' if '?' in url else '?',
+                       urlencode(params, doseq=True))
+
+
+def _body(data, json, headers):
+    """ Request body (bytes, file or iterable) and its headers. """
+    if json is not None:
+        headers.setdefault('Content-Type', 'application/json')
+        return json_import.dumps(json).encode('utf-8')
+    if data is None:
+        return None
+    if isinstance(data, dict):
+        headers.setdefault('Content-Type',
+                           'application/x-www-form-urlencoded')
+        return urlencode(data, doseq=True).encode('utf-8')
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, type(u'')):
+        return data.encode('utf-8')
+    # streamed body (MultipartStream, file): length if known
+    size = getattr(data, 'len', None)
+    if size is not None:
+        headers.setdefault('Content-Length', str(size))
+    return data
+
+
+def _basic_auth(auth, headers):
+    if auth is not None:
+        token = base64.b64encode(('%s:%s' % auth).encode('utf-8'))
+        headers['Authorization'] = 'Basic ' + token.decode('ascii')
+
+
+def _timed(chunks, errors, url):
+    """ chunks(size) of a streamed body, raising GlpiTimeout on errors. """
+    def read(size):
+        try:
+            for chunk in chunks(size):
+                yield chunk
+        except errors as e:
+            raise GlpiTimeout('Timed out reading %s: %s' % (url, e))
+    return read
+
+
+class TransportResponse(object):
+    """
+    Response of the urllib3 and httpx transports, with the parts of a
+    requests Response that GlpiService uses.
+
+    With stream=True the body is read by iter_content() (or on first
+    access to content) instead of being loaded at once.
+    """
+
+    def __init__(self, status_code, headers, content=None, chunks=None,
+                 release=None):
+        from requests.structures import CaseInsensitiveDict
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self._content = content
+        self._chunks = chunks
+        self._release = release
+
+    @property
+    def encoding(self):
+        content_type = self.headers.get('Content-Type', '')
+        if 'charset=' in content_type:
+            return content_type.split('charset=')[-1].split(';')[0].strip()
+        return 'utf-8'
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b''.join(self._chunks(64 * 1024))
+            self.close()
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self, **kwargs):
+        return json_import.loads(self.text, **kwargs)
+
+    def iter_content(self, chunk_size=1):
+        if self._content is not None:
+            for i in range(0, len(self._content), chunk_size):
+                yield self._content[i:i + chunk_size]
+            return
+        try:
+            for chunk in self._chunks(chunk_size):
+                if chunk:
+                    yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            release()
+
+
+class Transport(object):
+    """
+    Sends the HTTP requests of a GlpiService.
+
+    A transport is called like requests.request(method, url, params,
+    data, json, headers, auth, files, timeout, stream) and returns a
+    response with status_code, headers, text, content, json(),
+    iter_content() and close(). Timeouts raise GlpiTimeout.
+
+    It sits below sessions, 401 retries, deadlines, hedging and
+    cassettes, so all of them work with any transport. Transports keep
+    connections open between requests: share one between services and
+    close() it when done.
+    """
+
+    def __call__(self, method, url, **kwargs):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """
+    requests with a pooled Session: connections are reused instead of
+    opened for every request. Cookies are not kept (the session is in
+    the Session-Token header).
+    """
+
+    def __init__(self, pool_size=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.cookies.set_policy(
+            DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __call__(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class Urllib3Transport(Transport):
+    """
+    urllib3 connection pools used directly, without the per-request
+    work of requests (sessions, hooks, cookie handling).
+    """
+
+    def __init__(self, pool_size=10, **pool_options):
+        import urllib3
+        self._urllib3 = urllib3
+        self.pool = urllib3.PoolManager(maxsize=pool_size, retries=False,
+                                        **pool_options)
+
+    def __call__(self, method, url, params=None, data=None, json=None,
+                 headers=None, auth=None, files=None, timeout=None,
+                 stream=False, **kwargs):
+        if files:
+            raise GlpiInvalidArgument(
+                'Urllib3Transport does not encode files, send a '
+                'MultipartStream as data')
+        urllib3 = self._urllib3
+        headers = dict(headers or {})
+        body = _body(data, json, headers)
+        _basic_auth(auth, headers)
+        connect, read = _timeouts(timeout)
+        try:
+            r = self.pool.request(
+                method, _url(url, params), body=body, headers=headers,
+                timeout=urllib3.Timeout(connect=connect, read=read),
+                preload_content=not stream)
+        except urllib3.exceptions.TimeoutError as e:
+            raise GlpiTimeout('Timed out requesting %s: %s' % (url, e))
+        if not stream:
+            return TransportResponse(r.status, r.headers, content=r.data)
+        chunks = _timed(r.stream, urllib3.exceptions.TimeoutError, url)
+        return TransportResponse(r.status, r.headers, chunks=chunks,
+                                 release=r.release_conn)
+
+
+class HttpxTransport(Transport):
+    """
+    httpx client; with http2=True (needs httpx[http2]) concurrent
+    requests from several threads are multiplexed over one HTTP/2
+    connection per server, where the server supports it.
+    """
+
+    def __init__(self, http2=True, pool_size=10):
+        httpx = _import_optional('httpx', 'httpx[http2]' if http2
+                                 else 'httpx')
+        self._httpx = httpx
+        self.client = httpx.Client(
+            http2=http2, limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size))
+
+    def __call__(self, method, url, params=None, data=None, json=None,
+                 headers=None, auth=None, files=None, timeout=None,
+                 stream=False, **kwargs):
+        if files:
+            raise GlpiInvalidArgument(
+                'HttpxTransport does not encode files, send a '
+                'MultipartStream as data')
+        httpx = self._httpx
+        headers = dict(headers or {})
+        body = _body(data, json, headers)
+        _basic_auth(auth, headers)
+        connect, read = _timeouts(timeout)
+        if body is not None and hasattr(body, 'read') and \
+                hasattr(body, '__iter__'):
+            body = iter(body)
+        try:
+            request = self.client.build_request(
+                method, url, params=params, content=body, headers=headers,
+                timeout=httpx.Timeout(read, connect=connect))
+            r = self.client.send(request, stream=True)
+            if not stream:
+                try:
+                    r.read()
+                finally:
+                    r.close()
+        except httpx.TimeoutException as e:
+            raise GlpiTimeout('Timed out requesting %s: %s' % (url, e))
+        if not stream:
+            return TransportResponse(r.status_code, r.headers,
+                                     content=r.content)
+        chunks = _timed(r.iter_bytes, httpx.TimeoutException, url)
+        return TransportResponse(r.status_code, r.headers,
+                                 chunks=chunks, release=r.close)
+
+    def close(self):
+        self.client.close()
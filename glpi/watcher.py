@@ -0,0 +1,247 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Change feed of tickets and problems.
+#
+#   watcher = Watcher(service, checkpoint='watcher.json')
+#   watcher.on('status_changed', notify)
+#   watcher.run_forever()
+
+import json
+import hashlib
+import threading
+from collections import namedtuple
+
+from .glpi import GlpiInvalidArgument
+from .compat import replace_file
+from .sync import SyncSink, IncrementalSync
+
+EVENT_KINDS = ('created', 'updated', 'status_changed', 'deleted')
+
+WatchEvent = namedtuple('WatchEvent', [
+    'kind', 'item_type', 'item_id', 'item', 'old_status'])
+WatchEvent.__doc__ = """
+A change of an item. item is the new item (None when deleted),
+old_status the status before a status_changed event.
+"""
+
+
+def item_hash(item):
+    """ Compact fingerprint of an item: 16 hex chars of its SHA-1. """
+    data = json.dumps(item, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+class Watcher(SyncSink):
+    """
+    Poll item types for changes and report them as events.
+
+    Each poll is an IncrementalSync: only items modified since the last
+    poll are fetched. The watcher keeps a hash and the status of every
+    item, so items fetched again without real changes (the sync overlap)
+    are ignored, and changes are reported as 'created', 'updated',
+    'status_changed' (an update that changed the status) or 'deleted'.
+    The first poll only records the current items, unless
+    initial_events=True.
+
+    The interval between polls drops to min_interval after a poll that
+    found changes and doubles up to max_interval while nothing happens.
+
+    With checkpoint (a file path), hashes and watermarks are saved after
+    each item type is polled so a restarted watcher carries on where it
+    stopped. Events are delivered at least once: when a callback raises,
+    or a poll is interrupted before its checkpoint, the events of that
+    item type are delivered again by the next poll.
+    """
+
+    def __init__(self, service, item_types=('Ticket', 'Problem'),
+                 checkpoint=None, min_interval=5, max_interval=300,
+                 initial_events=False, **sync_options):
+        self.item_types = list(item_types)
+        self.checkpoint = checkpoint
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.initial_events = initial_events
+        self.syncer = IncrementalSync(service, self, **sync_options)
+
+        self._callbacks = []
+        self._events = []
+        self._undo = []
+        self._stop = threading.Event()
+        self._items = {}
+        self._states = {}
+        self._load_checkpoint()
+
+    """
+    Checkpoint
+    """
+    def _load_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        try:
+            with open(self.checkpoint) as f:
+                saved = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        for item_type, data in saved.items():
+            self._states[item_type] = data.get('state')
+            self._items[item_type] = dict(
+                (int(item_id), tuple(entry))
+                for item_id, entry in data.get('items', {}).items())
+
+    def _save_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        saved = {}
+        for item_type in set(self._items) | set(self._states):
+            saved[item_type] = {
+                'state': self._states.get(item_type),
+                'items': dict((str(k), list(v)) for k, v in
+                              self._items.get(item_type, {}).items()),
+            }
+        tmp_path = self.checkpoint + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(saved, f, separators=(',', ':'))
+        replace_file(tmp_path, self.checkpoint)
+
+    """
+    Sync sink
+    """
+    def _emit(self, kind, item_type, item_id, item=None, old_status=None):
+        self._events.append(WatchEvent(kind, item_type, item_id, item,
+                                       old_status))
+
+    def upsert(self, item_type, items):
+        known = self._items.setdefault(item_type, {})
+        first_poll = self._states.get(item_type) is None
+        for item in items:
+            item_id = int(item['id'])
+            entry = (item_hash(item), item.get('status'))
+            old = known.get(item_id)
+            self._undo.append((item_type, item_id, old))
+            known[item_id] = entry
+            if old is None:
+                if not first_poll or self.initial_events:
+                    self._emit('created', item_type, item_id, item)
+            elif old[0] != entry[0]:
+                if old[1] != entry[1]:
+                    self._emit('status_changed', item_type, item_id, item,
+                               old[1])
+                else:
+                    self._emit('updated', item_type, item_id, item)
+
+    def delete(self, item_type, ids):
+        known = self._items.setdefault(item_type, {})
+        for item_id in ids:
+            old = known.pop(int(item_id), None)
+            if old is not None:
+                self._undo.append((item_type, int(item_id), old))
+                self._emit('deleted', item_type, int(item_id))
+
+    def known_ids(self, item_type, ids=None):
+        known = self._items.get(item_type, {})
+        if ids is None:
+            return set(known)
+        return set(int(i) for i in ids if int(i) in known)
+
+    def load_state(self, item_type):
+        return self._states.get(item_type)
+
+    def save_state(self, item_type, state):
+        self._states[item_type] = state
+
+    """
+    Polling
+    """
+    def on(self, kind, callback=None):
+        """
+        Call callback(event) for events of kind, or for every event when
+        called as on(callback).
+        """
+        if callback is None:
+            kind, callback = None, kind
+        elif kind not in EVENT_KINDS:
+            raise GlpiInvalidArgument('Unknown event kind "%s"' % kind)
+        self._callbacks.append((kind, callback))
+        return callback
+
+    def _rollback(self, item_type, undo, state):
+        """ Forget the changes of a sync, so the next one finds them. """
+        known = self._items.setdefault(item_type, {})
+        for _, item_id, old in reversed(undo):
+            if old is None:
+                known.pop(item_id, None)
+            else:
+                known[item_id] = old
+        self._states[item_type] = state
+
+    def _sync(self, item_type):
+        """
+        Sync item_type; returns its events and rollback(), which forgets
+        them. They are forgotten on errors.
+        """
+        self._events = []
+        self._undo = []
+        state = self._states.get(item_type)
+        try:
+            self.syncer.run(item_type)
+        except BaseException:
+            self._rollback(item_type, self._undo, state)
+            raise
+        finally:
+            events, undo = self._events, self._undo
+            self._events, self._undo = [], []
+        return events, lambda: self._rollback(item_type, undo, state)
+
+    def poll(self):
+        """
+        Check every item type once, run the callbacks and return the
+        events. Also sets the interval before the next poll.
+        """
+        events = []
+        for item_type in self.item_types:
+            found, rollback = self._sync(item_type)
+            try:
+                for event in found:
+                    for kind, callback in self._callbacks:
+                        if kind is None or kind == event.kind:
+                            callback(event)
+            except BaseException:
+                rollback()
+                raise
+            self._save_checkpoint()
+            events.extend(found)
+
+        if events:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        return events
+
+    def events(self):
+        """ Yield events as they are found, until stop() is called. """
+        while not self._stop.is_set():
+            for event in self.poll():
+                yield event
+            self._stop.wait(self.interval)
+
+    def run_forever(self):
+        """ Poll and run the callbacks until stop() is called. """
+        for _ in self.events():
+            pass
+
+    def stop(self):
+        """ Stop events()/run_forever() (from another thread). """
+        self._stop.set()
@@ -0,0 +1,288 @@
+# Copyright 2017 Predict & Truly Systems All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Write-behind queue batching creates and updates.
+#
+#   with WriteQueue(service) as queue:
+#       future = queue.create('Ticket', {'name': 'Disk full', ...})
+#       queue.update('Ticket', {'id': 12, 'status': 5})
+#   print(future.result())    # ID of the new ticket
+
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .glpi import GlpiException, GlpiInvalidArgument, _update_input, \
+    _updated_ids
+from .glpi_item import GlpiItem
+
+
+class _Write(object):
+    __slots__ = ('item_id', 'data', 'future', 'queued_at')
+
+    def __init__(self, item_id, data):
+        self.item_id = item_id
+        self.data = data
+        self.future = Future()
+        self.queued_at = time.time()
+
+
+def _result_message(results, item_id=None):
+    """ Error message of a batch result, for one item if possible. """
+    if isinstance(results, list):
+        for r in results:
+            if isinstance(r, dict) and str(item_id) in r:
+                return r.get('message') or 'Not updated'
+    return '%s' % (results,)
+
+
+class WriteQueue(object):
+    """
+    Queue creates and updates and send them as batched array-input
+    requests from background threads.
+
+    create() and update() return at once with a Future: its result is
+    the ID of the created item, or True for an update; failed writes
+    set a GlpiException. Updates of an item ID still in the queue are
+    merged into one (later values win) and share its future.
+
+    A batch of one item type is sent when it holds batch_size writes or
+    its oldest write waited max_delay seconds, by `workers` threads. An
+    item is never part of two batches in flight, so its updates are
+    applied in order. When max_pending writes are queued or in flight,
+    create() and update() block until there is room (GLPI is slower than
+    the producers), or raise GlpiException after `timeout` seconds.
+
+    Updates of GlpiItems send their changes at the time of the call.
+    """
+
+    def __init__(self, service, batch_size=100, max_delay=0.5,
+                 max_pending=1000, workers=2):
+        self.service = service
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.stats = {'queued': 0, 'merged': 0, 'batches': 0, 'sent': 0,
+                      'failed': 0}
+
+        self._cond = threading.Condition()
+        self._batches = OrderedDict()
+        self._inflight = set()
+        self._pending = 0
+        self._flushing = 0
+        self._closed = False
+        self._counter = itertools.count()
+        self._services = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._thread = threading.Thread(target=self._run,
+                                        name='glpi-write-queue')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """ Writes queued or in flight. """
+        return self._pending
+
+    """
+    Producers
+    """
+    def _wait(self, deadline):
+        """ Wait for room in the queue, until deadline (or forever). """
+        remaining = None if deadline is None else deadline - time.time()
+        if remaining is not None and remaining <= 0:
+            raise GlpiException('Write queue is full (%d writes)' %
+                                self._pending)
+        self._cond.wait(remaining)
+
+    def _check_open(self):
+        if self._closed:
+            raise GlpiException('Write queue is closed')
+
+    def _add(self, op, item_type, key, data):
+        entry = _Write(data.get('id'), data)
+        self._batches.setdefault((op, item_type), OrderedDict())[key] = entry
+        self._pending += 1
+        self.stats['queued'] += 1
+        self._cond.notify_all()
+        return entry.future
+
+    def create(self, item_type, data, timeout=None):
+        """ Queue the creation of an item (dict or GlpiItem). """
+        if isinstance(data, GlpiItem):
+            data = data.get_data()
+        data = dict(data)
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            self._check_open()
+            while self._pending >= self.max_pending:
+                self._wait(deadline)
+                self._check_open()
+            return self._add('create', item_type, next(self._counter), data)
+
+    def update(self, item_type, data, timeout=None):
+        """ Queue an update of the item data['id'] (dict or GlpiItem). """
+        data = _update_input(data)
+        if data is None:
+            future = Future()
+            future.set_result(True)
+            return future
+        if data.get('id') is None:
+            raise GlpiInvalidArgument('Cannot update an item without "id"')
+
+        key = str(data['id'])
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                self._check_open()
+                entry = self._batches.get(('update', item_type), {}).get(key)
+                if entry is not None:
+                    entry.data.update(data)
+                    self.stats['merged'] += 1
+                    return entry.future
+                if self._pending < self.max_pending:
+                    return self._add('update', item_type, key, data)
+                self._wait(deadline)
+
+    """
+    Sending
+    """
+    def _ready(self, op, item_type, batch):
+        """ Writes of batch that can be sent now, oldest first. """
+        if op == 'create':
+            return list(batch)
+        return [key for key in batch
+                if (item_type, key) not in self._inflight]
+
+    def _run(self):
+        with self._cond:
+            while True:
+                timeout = None
+                now = time.time()
+                for (op, item_type), batch in list(self._batches.items()):
+                    keys = self._ready(op, item_type, batch)
+                    if not keys:
+                        continue
+                    due = batch[keys[0]].queued_at + self.max_delay
+                    if len(keys) >= self.batch_size or due <= now or \
+                            self._flushing or self._closed:
+                        self._submit(op, item_type, batch,
+                                     keys[:self.batch_size])
+                        timeout = 0
+                    elif timeout is None or due - now < timeout:
+                        timeout = due - now
+                if timeout == 0:
+                    continue
+                if self._closed and not self._batches and \
+                        not self._pending:
+                    return
+                self._cond.wait(timeout)
+
+    def _submit(self, op, item_type, batch, keys):
+        entries = [batch.pop(key) for key in keys]
+        if not batch:
+            del self._batches[(op, item_type)]
+        if op == 'update':
+            self._inflight.update((item_type, key) for key in keys)
+        self.stats['batches'] += 1
+        self._pool.submit(self._send, op, item_type, keys, entries)
+
+    def _service(self, item_type):
+        if item_type not in self._services:
+            self._services[item_type] = self.service.for_uri(
+                '/' + item_type.strip('/'))
+        return self._services[item_type]
+
+    def _send(self, op, item_type, keys, entries):
+        failed = 0
+        try:
+            service = self._service(item_type)
+            if op == 'create':
+                results = service.create_many([e.data for e in entries])
+            else:
+                results = service.update_many([e.data for e in entries])
+        except Exception as e:
+            failed = len(entries)
+            for entry in entries:
+                entry.future.set_exception(e)
+        else:
+            if op == 'update':
+                updated = _updated_ids(results)
+            for idx, entry in enumerate(entries):
+                if op == 'create':
+                    result = results[idx] if isinstance(results, list) and \
+                        idx < len(results) else None
+                    if isinstance(result, dict) and result.get('id'):
+                        entry.future.set_result(result['id'])
+                        continue
+                    message = result.get('message') \
+                        if isinstance(result, dict) else None
+                    message = message or _result_message(results)
+                else:
+                    if str(entry.item_id) in updated:
+                        entry.future.set_result(True)
+                        continue
+                    message = _result_message(results, entry.item_id)
+                failed += 1
+                entry.future.set_exception(GlpiException(
+                    'Failed to %s %s: %s' % (op, item_type, message)))
+        finally:
+            with self._cond:
+                self._pending -= len(entries)
+                self.stats['sent'] += len(entries) - failed
+                self.stats['failed'] += failed
+                if op == 'update':
+                    self._inflight.difference_update(
+                        (item_type, key) for key in keys)
+                self._cond.notify_all()
+
+    """
+    Shutdown
+    """
+    def flush(self, timeout=None):
+        """
+        Send every queued write now and wait until all are done.
+        Returns False if timeout expired first.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending:
+                    remaining = None if deadline is None \
+                        else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def close(self):
+        """ Send the queued writes and stop the background threads. """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
@@ -32,5 +32,14 @@ setup(
     install_requires=[
         'requests',
         'future',
-    ]
+        'futures; python_version < "3"',
+    ],
+    extras_require={
+        'http2': ['httpx[http2]'],
+    },
+    entry_points={
+        'console_scripts': [
+            'glpi = glpi.cli:main',
+        ],
+    },
 )
@@ -0,0 +1,31 @@
+# Shared fixtures for the offline tests: requests.request is replaced by a
+# recorder returning canned responses.
+
+import pytest
+import requests
+
+from glpi.glpi import GlpiService
+
+
+class Calls(list):
+    body = None
+
+
+@pytest.fixture()
+def calls(monkeypatch):
+    sent = Calls()
+
+    def fake_request(method, url, **kwargs):
+        sent.append((method, url, kwargs))
+        return sent.body
+
+    monkeypatch.setattr(requests, 'request', fake_request)
+    return sent
+
+
+@pytest.fixture()
+def service():
+    s = GlpiService('http://glpi/apirest.php', 'app', '/Computer',
+                    token_auth='user')
+    s.session = 'session'
+    return s
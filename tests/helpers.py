@@ -0,0 +1,77 @@
+# Fakes shared by the offline tests.
+
+import json
+
+try:
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:
+    from urlparse import urlsplit, parse_qs
+
+
+class FakeResponse(object):
+    def __init__(self, body, status_code=200, headers=None):
+        if isinstance(body, bytes):
+            self.content = body
+            self.text = body.decode('latin-1')
+        else:
+            self.text = json.dumps(body)
+            self.content = self.text.encode('utf-8')
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def json(self, **kwargs):
+        return json.loads(self.text, **kwargs)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServer(object):
+    """
+    Item lists, searches and getMultipleItems over a dict of items of
+    one type.
+    """
+
+    def __init__(self, item_type='Ticket'):
+        self.item_type = item_type
+        self.items = {}
+        self.searches = []
+        self.fetched = []
+
+    def put(self, item_id, date_mod, name='item', **fields):
+        self.items[item_id] = dict(fields, id=item_id, name=name,
+                                   date_mod=date_mod)
+
+    def get_path(self, path):
+        assert path == 'listSearchOptions/%s' % self.item_type
+        return {"2": {"uid": "%s.id" % self.item_type},
+                "19": {"uid": "%s.date_mod" % self.item_type}}
+
+    def for_uri(self, uri):
+        assert uri == '/' + self.item_type
+        return self
+
+    def get_many(self, ids):
+        self.fetched.extend(ids)
+        return [dict(self.items[i]) for i in ids if i in self.items]
+
+    def get_range(self, path, start, end, params=None):
+        if path.startswith('search/'):
+            query = parse_qs(urlsplit(path).query)
+            assert query['criteria[0][searchtype]'] == ['morethan']
+            since = query['criteria[0][value]'][0]
+            self.searches.append((since, start))
+            rows = sorted((i for i in self.items.values()
+                           if i['date_mod'] > since),
+                          key=lambda i: i['date_mod'])
+            rows = [{"2": i['id'], "19": i['date_mod']} for i in rows]
+        elif params and params.get('only_id'):
+            rows = [{"id": i} for i in sorted(self.items)]
+        else:
+            rows = [dict(self.items[i]) for i in sorted(self.items)]
+        return rows[start:end + 1], len(rows)
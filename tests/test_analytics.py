@@ -0,0 +1,90 @@
+# Offline tests for the NumPy/pandas analytics.
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+np = pytest.importorskip('numpy')
+
+from glpi.analytics import to_frame, to_arrays, sla_summary  # noqa: E402
+from glpi.resultset import ColumnarResult  # noqa: E402
+
+TICKETS = [
+    {'id': 1, 'status': 5, 'itilcategories_id': 3,
+     'date': '2017-01-02 08:00:00', 'solvedate': '2017-01-02 12:00:00',
+     'time_to_resolve': '2017-01-02 10:00:00',
+     'time_to_own': '2017-01-02 09:00:00',
+     'takeintoaccount_delay_stat': 600, 'solve_delay_stat': 14400,
+     'waiting_duration': 0},
+    {'id': 2, 'status': 6, 'itilcategories_id': 3,
+     'date': '2017-01-03 08:00:00', 'solvedate': '2017-01-03 09:00:00',
+     'time_to_resolve': '2017-01-03 18:00:00',
+     'time_to_own': '2017-01-03 08:05:00',
+     'takeintoaccount_delay_stat': 1200, 'solve_delay_stat': 3600,
+     'waiting_duration': 300},
+    {'id': 3, 'status': 2, 'itilcategories_id': 0,
+     'date': '2017-01-04 08:00:00', 'solvedate': None,
+     'time_to_resolve': '2017-01-04 12:00:00', 'time_to_own': None,
+     'takeintoaccount_delay_stat': 0, 'solve_delay_stat': 0,
+     'waiting_duration': 0},
+]
+
+
+@pytest.mark.parametrize('rows', [TICKETS, ColumnarResult(TICKETS),
+                                  list(ColumnarResult(TICKETS))])
+def test_to_frame_parses_dates_and_integers(rows):
+    frame = to_frame(rows)
+    assert str(frame['date'].dtype).startswith('datetime64')
+    assert frame['solvedate'].isna().tolist() == [False, False, True]
+    assert frame['status'].dtype == 'Int64'
+    assert frame['solve_delay_stat'].tolist() == [14400, 3600, 0]
+
+
+def test_to_frame_renames_search_columns():
+    frame = to_frame({'totalcount': 1, 'data': [
+        {'2': 7, '12': '2', '15': '2017-05-01 10:00:00'}]},
+        columns={2: 'id', 12: 'status', 15: 'date'})
+    assert frame['status'].tolist() == [2]
+    assert frame['date'][0] == pd.Timestamp('2017-05-01 10:00:00')
+
+
+def test_to_arrays():
+    arrays = to_arrays(TICKETS)
+    assert arrays['id'].dtype == np.int64
+    assert arrays['date'].dtype.kind == 'M'
+    assert np.isnat(arrays['solvedate'][2])
+
+
+def test_sla_summary():
+    now = '2017-01-05 00:00:00'
+    summary = sla_summary(TICKETS, now=now)
+    row = summary.iloc[0]
+    assert (row['count'], row['solved']) == (3, 2)
+    assert row['resolution_time_mean'] == (4 * 3600 + 3600) / 2.0
+    # not reached steps (0) are left out
+    assert row['takeintoaccount_delay_stat_p50'] == 900
+    assert row['waiting_duration_mean'] == 100
+    # ticket 1 solved late, ticket 3 still open after its deadline
+    assert row['ttr_breached'] == 2
+    # ticket 2 taken into account 15 minutes after time_to_own
+    assert row['tto_breached'] == 1
+
+    by_category = sla_summary(to_frame(TICKETS), by='itilcategories_id',
+                              now=now)
+    assert by_category.loc[3, 'count'] == 2
+    assert by_category.loc[0, 'ttr_breached_rate'] == 1.0
+
+
+def test_expanded_dropdown_names_are_kept():
+    tickets = [dict(t) for t in TICKETS]
+    names = ['Network > VPN', 'Printer', None]
+    for ticket, name in zip(tickets, names):
+        ticket['itilcategories_id'] = name
+    frame = to_frame(tickets)
+    assert frame['itilcategories_id'].tolist()[:2] == names[:2]
+    assert frame['itilcategories_id'].isna().tolist() == [False, False, True]
+    assert frame['status'].dtype == 'Int64'
+
+    by_category = sla_summary(frame, by='itilcategories_id',
+                              now='2017-01-05 00:00:00')
+    assert by_category.loc['Network > VPN', 'count'] == 1
+    assert by_category.loc['Printer', 'count'] == 1
@@ -0,0 +1,70 @@
+# Offline tests for request recording and replay.
+
+import time
+
+import pytest
+
+from glpi.glpi import GlpiService, GlpiException
+from glpi.cassette import Cassette, request_key
+from tests.helpers import FakeResponse
+
+
+def test_request_key_ignores_host_and_session():
+    assert request_key('get', 'http://a/apirest.php/Ticket', {'range': '0-9'}) \
+        == request_key('GET', 'https://b/apirest.php/Ticket',
+                       {'range': '0-9'})
+    assert request_key('GET', 'http://a/apirest.php/Ticket') != \
+        request_key('GET', 'http://a/apirest.php/Ticket', {'range': '0-9'})
+    assert request_key('PUT', 'http://a/x', data='{"input": 1}') != \
+        request_key('PUT', 'http://a/x', data='{"input": 2}')
+
+
+def test_record_then_replay(calls, tmp_path):
+    cassette = Cassette(str(tmp_path / 'glpi.cassette'))
+    recording = GlpiService('http://prod/apirest.php', 'app', '/Ticket',
+                            token_auth='user',
+                            transport=cassette.recorder())
+    recording.session = 'prod-session'
+
+    calls.body = FakeResponse([{'id': 1}], headers={
+        'Content-Range': '0-0/1'})
+    assert recording.get_all() == [{'id': 1}]
+    calls.body = FakeResponse([{'id': 1}, {'id': 2}])
+    assert recording.get_all() == [{'id': 1}, {'id': 2}]
+    calls.body = FakeResponse([{'1': True, 'message': ''}])
+    recording.update_many([{'id': 1, 'status': 5}])
+    assert len(cassette) == 3 and len(calls) == 3
+
+    player = cassette.player()
+    replay = GlpiService('http://localhost/apirest.php', 'app', '/Ticket',
+                         token_auth='user', transport=player)
+    replay.session = 'local-session'
+    # same order as recorded, then the last response again
+    assert replay.get_all() == [{'id': 1}]
+    assert replay.get_all() == [{'id': 1}, {'id': 2}]
+    assert replay.get_all() == [{'id': 1}, {'id': 2}]
+    assert replay.update_many([{'id': 1, 'status': 5}]) == \
+        [{'1': True, 'message': ''}]
+    assert len(calls) == 3
+
+    with pytest.raises(GlpiException):
+        replay.get(42)
+
+
+def test_replay_timing(calls, tmp_path):
+    cassette = Cassette(str(tmp_path / 'glpi.cassette'))
+
+    def slow_transport(method, url, **kwargs):
+        time.sleep(0.1)
+        return FakeResponse({'id': 3})
+
+    service = GlpiService('http://prod/apirest.php', 'app', '/Ticket',
+                          token_auth='user',
+                          transport=cassette.recorder(slow_transport))
+    service.session = 'session'
+    service.get(3)
+
+    service.transport = cassette.player(speed=4)
+    started = time.time()
+    assert service.get(3) == {'id': 3}
+    assert 0.02 <= time.time() - started < 0.09
@@ -0,0 +1,142 @@
+# Offline tests for counts and group counts.
+
+import threading
+
+import requests
+
+from glpi import GLPI, SearchQuery
+from glpi.glpi import GlpiService
+from tests.helpers import FakeResponse
+
+OPTIONS = {"1": {"name": "Title", "uid": "Ticket.name"},
+           "2": {"name": "ID", "uid": "Ticket.id"},
+           "7": {"name": "Category", "uid": "Ticket.ITILCategory.completename",
+                 "table": "glpi_itilcategories", "field": "completename"},
+           "12": {"name": "Status", "uid": "Ticket.status",
+                  "table": "glpi_tickets", "field": "status"},
+           "80": {"name": "Entity", "uid": "Ticket.Entity.completename"}}
+
+
+def make_glpi():
+    glpi = GLPI('http://glpi/apirest.php', 'app', 'user')
+    glpi.api_session = 'session'
+    glpi.api_rest = GlpiService('http://glpi/apirest.php', 'app',
+                                token_auth='user')
+    glpi.api_rest.session = 'session'
+    glpi._search_options['ticket'] = OPTIONS
+    return glpi
+
+
+def test_count_reads_the_total_of_one_row(calls):
+    glpi = make_glpi()
+    calls.body = FakeResponse([{'id': 1}], headers={
+        'Content-Range': '0-0/1234'})
+    assert glpi.count('ticket') == 1234
+    method, url, kwargs = calls[-1]
+    assert url == 'http://glpi/apirest.php/Ticket'
+    assert kwargs['params'] == {'range': '0-0'}
+
+    calls.body = FakeResponse({'totalcount': 56, 'count': 1,
+                               'data': [{'2': 1}]})
+    assert glpi.count('Ticket', [{'field': 'status', 'value': 2,
+                                  'searchtype': 'equals'}]) == 56
+    assert calls[-1][1].startswith(
+        'http://glpi/apirest.php/search/Ticket?criteria%5B0%5D%5Bfield'
+        '%5D=12&criteria%5B0%5D%5Bvalue%5D=2')
+    assert calls[-1][2]['params'] == {'range': '0-0'}
+
+    calls.body = FakeResponse(['ERROR_RANGE_EXCEED_TOTAL', ''], 400)
+    assert glpi.count('Ticket', SearchQuery('Ticket').where(
+        'name', 'nothing')) == 0
+
+    # errors are returned as a set, like the other GLPI methods
+    calls.body = FakeResponse(['ERROR_GLPI_LOGIN', 'session expired'], 400)
+    result = glpi.count('Ticket')
+    assert isinstance(result, set) and 'ERROR_GLPI_LOGIN' in result.pop()
+
+
+def test_group_count_runs_one_count_per_value(monkeypatch):
+    totals = {'1': 10, '2': 4, '5': 0}
+    threads = set()
+
+    def fake_request(method, url, **kwargs):
+        threads.add(threading.current_thread().name)
+        status = url.split('criteria%5B1%5D%5Bvalue%5D=')[1].split('&')[0]
+        assert 'criteria%5B1%5D%5Blink%5D=AND' in url
+        return FakeResponse({'totalcount': totals[status], 'data': []})
+
+    monkeypatch.setattr(requests, 'request', fake_request)
+    glpi = make_glpi()
+    base = SearchQuery('Ticket').where(80, 3)
+    counts = glpi.group_count('Ticket', 'status', values=[1, 2, 5],
+                              criteria=base, workers=3)
+    assert list(counts.items()) == [(1, 10), (2, 4), (5, 0)]
+    # the base query is left untouched
+    assert len(base.criteria) == 1
+
+
+def test_group_count_with_one_projected_search(calls):
+    glpi = make_glpi()
+    calls.body = FakeResponse({'totalcount': 3, 'count': 3, 'data': [
+        {'2': 1, '12': 1}, {'2': 2, '12': 2}, {'2': 3, '12': 1}]})
+    assert glpi.group_count('Ticket', 'status') == {1: 2, 2: 1}
+    assert len(calls) == 1
+    assert 'forcedisplay%5B0%5D=12' in calls[0][1]
+
+
+def dropdown_server(sent, categories, tickets, totals):
+    """ requests.request() of a GLPI with categories and tickets. """
+    def fake_request(method, url, **kwargs):
+        params = kwargs.get('params') or {}
+        sent.append((url, params))
+        if url.endswith('/ITILCategory'):
+            # the dropdown list, IDs only
+            assert params['only_id'] == 'true'
+            start, end = [int(i) for i in params['range'].split('-')]
+            rows = [{'id': i} for i in categories[start:end + 1]]
+            return FakeResponse(rows, headers={
+                'Content-Range': '%d-%d/%d' % (start, end, len(categories))})
+        if 'forcedisplay' in url:
+            return FakeResponse({'totalcount': len(tickets),
+                                 'data': [{'2': i, '7': c} for i, c
+                                          in enumerate(tickets)]})
+        if 'criteria%5B0%5D%5Bvalue%5D=' not in url:
+            return FakeResponse({'totalcount': len(tickets), 'data': []})
+        category = url.split('criteria%5B0%5D%5Bvalue%5D=')[1]
+        assert 'criteria%5B0%5D%5Bfield%5D=7' in url
+        return FakeResponse({'totalcount': totals[category.split('&')[0]],
+                             'data': []})
+    return fake_request
+
+
+def test_group_count_of_a_small_dropdown_counts_each_id(monkeypatch):
+    sent = []
+    monkeypatch.setattr(requests, 'request', dropdown_server(
+        sent, [3, 4, 9], ['Network'] * 7 + ['Printer'] * 2,
+        {'3': 7, '4': 0, '9': 2}))
+    glpi = make_glpi()
+    counts = glpi.group_count('Ticket', 'ITILCategory.completename')
+    assert list(counts.items()) == [(3, 7), (4, 0), (9, 2)]
+    # the dropdown size, the number of tickets, the dropdown list,
+    # then one single-row count per ID
+    assert len(sent) == 6
+    assert all(params == {'range': '0-0'} for _, params in sent[3:])
+
+
+def test_group_count_of_a_large_dropdown_uses_one_search(monkeypatch):
+    tickets = ['Network'] * 3 + ['Printer']
+    sent = []
+    monkeypatch.setattr(requests, 'request', dropdown_server(
+        sent, list(range(1, 500)), tickets, {}))
+    glpi = make_glpi()
+    # more categories than max_groups
+    counts = glpi.group_count('Ticket', 'ITILCategory.completename')
+    assert counts == {'Network': 3, 'Printer': 1}
+    assert len(sent) == 2 and 'forcedisplay' in sent[-1][0]
+
+    # fewer tickets than categories
+    del sent[:]
+    counts = glpi.group_count('Ticket', 'ITILCategory.completename',
+                              max_groups=1000)
+    assert counts == {'Network': 3, 'Printer': 1}
+    assert len(sent) == 3 and 'forcedisplay' in sent[-1][0]
@@ -0,0 +1,128 @@
+# Offline tests for request timeouts and deadlines.
+
+import time
+import socket
+import threading
+
+import pytest
+import requests
+
+from glpi import GLPI
+from glpi.glpi import (Deadline, GlpiException, GlpiTimeout, GlpiService,
+                       DEFAULT_TIMEOUT, MIN_TIMEOUT)
+from glpi.export import iter_pages
+from tests.helpers import FakeResponse
+
+
+def test_requests_use_the_service_timeout(calls, service):
+    calls.body = FakeResponse([])
+    service.get_all()
+    assert calls[-1][2]['timeout'] == DEFAULT_TIMEOUT
+
+    service.timeout = 3
+    service.get_all()
+    assert calls[-1][2]['timeout'] == 3
+
+    service.request('GET', 'Computer', timeout=(1, 2))
+    assert calls[-1][2]['timeout'] == (1, 2)
+
+
+def test_deadline_caps_timeouts_and_expires(calls, service):
+    calls.body = FakeResponse([])
+    with Deadline(5):
+        with Deadline(60):
+            service.get_all()
+    connect, read = calls[-1][2]['timeout']
+    assert 4 < connect <= 5 and 4 < read <= 5
+
+    with Deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(GlpiTimeout):
+            service.get_all()
+    assert len(calls) == 1
+    assert Deadline.current() is None
+
+
+def test_spent_deadline_never_gives_a_zero_timeout(calls, service,
+                                                   monkeypatch):
+    calls.body = FakeResponse([])
+    with Deadline(5) as deadline:
+        monkeypatch.setattr(deadline, 'remaining', lambda: 0.0)
+        service.get_all()
+    assert calls[-1][2]['timeout'] == (MIN_TIMEOUT, MIN_TIMEOUT)
+
+
+def test_transport_timeouts_raise_glpi_timeout(service):
+    def transport(method, url, **kwargs):
+        raise socket.timeout('timed out')
+
+    service.transport = transport
+    with pytest.raises(GlpiTimeout):
+        service.get_all()
+
+
+def test_session_setup_is_bounded(calls, service):
+    service.session = None
+    calls.body = FakeResponse({'session_token': 'abc'})
+    with Deadline(2):
+        service.get_all()
+    assert [c[1] for c in calls] == ['http://glpi/apirest.php/initSession',
+                                     'http://glpi/apirest.php/Computer']
+    assert all(c[2]['timeout'][1] <= 2 for c in calls)
+
+
+def test_get_many_timeout_keeps_fetched_chunks(monkeypatch, service):
+    sent = []
+
+    def fake_request(method, url, **kwargs):
+        sent.append(kwargs)
+        if len(sent) > 1:
+            raise requests.exceptions.ReadTimeout('read timed out')
+        return FakeResponse([{'id': 1}, {'id': 2}])
+
+    monkeypatch.setattr(requests, 'request', fake_request)
+    with pytest.raises(GlpiTimeout) as error:
+        service.get_many([1, 2, 3, 4], chunk_size=2)
+    assert error.value.partial == [{'id': 1}, {'id': 2}]
+
+
+def test_page_workers_run_under_the_callers_deadline():
+    seen = []
+
+    def fetch(start, end):
+        seen.append((threading.current_thread().name,
+                     Deadline.current()))
+        return list(range(start, min(end + 1, 10))), 10
+
+    with Deadline(30) as deadline:
+        pages = list(iter_pages(fetch, 2, workers=3))
+    assert [s for s, _ in pages] == [0, 2, 4, 6, 8]
+    assert all(d is deadline for _, d in seen)
+    assert any(name != threading.current_thread().name for name, _ in seen)
+
+
+def test_glpi_raises_timeouts_instead_of_returning_them(monkeypatch):
+    glpi = GLPI('http://glpi/apirest.php', 'app', 'user')
+    glpi.api_session = 'session'
+    glpi.api_rest = GlpiService('http://glpi/apirest.php', 'app',
+                                token_auth='user')
+    glpi.api_rest.session = 'session'
+    sent = []
+
+    def fake_request(method, url, **kwargs):
+        sent.append(kwargs)
+        if len(sent) > 1:
+            raise requests.exceptions.ReadTimeout('read timed out')
+        return FakeResponse([{'id': 1}, {'id': 2}])
+
+    monkeypatch.setattr(requests, 'request', fake_request)
+    with pytest.raises(GlpiTimeout) as error:
+        glpi.get_many('Ticket', [1, 2, 3, 4], chunk_size=2)
+    assert error.value.partial == [{'id': 1}, {'id': 2}]
+
+    # other errors are still returned as a set
+    def failing(*args, **kwargs):
+        raise GlpiException('ERROR_ITEM_NOT_FOUND')
+
+    monkeypatch.setattr(glpi.api_rest, 'get_many', failing)
+    assert glpi.get_many('Ticket', [5]) == {'ERROR_ITEM_NOT_FOUND'}
@@ -0,0 +1,60 @@
+# Offline tests for streaming document upload and download.
+
+import io
+import json
+
+from glpi.multipart import MultipartStream
+from tests.helpers import FakeResponse
+
+
+def test_multipart_stream_reads_in_chunks():
+    fileobj = io.BytesIO(b'x' * 1000)
+    body = MultipartStream(fields=[('uploadManifest', '{}')],
+                           files=[('filename[0]', 'a.bin', fileobj,
+                                   'application/octet-stream')],
+                           boundary='b', chunk_size=100)
+
+    chunks = list(body)
+    data = b''.join(chunks)
+    assert body.len == len(data)
+    assert max(len(c) for c in chunks) <= 100
+    assert data.startswith(b'--b\r\nContent-Disposition: form-data; '
+                           b'name="uploadManifest"\r\n\r\n{}\r\n')
+    assert b'filename="a.bin"' in data
+    assert data.endswith(b'x' * 1000 + b'\r\n--b--\r\n')
+
+
+def test_upload_document(calls, service):
+    fileobj = io.BytesIO(b'hello')
+    fileobj.name = '/tmp/report.txt'
+    service.set_uri('/Document')
+    calls.body = FakeResponse({"id": 9, "message": ""})
+
+    assert service.upload_document(fileobj)['id'] == 9
+
+    method, url, kwargs = calls[0]
+    assert (method, url) == ('POST', 'http://glpi/apirest.php/Document')
+    content_type = kwargs['headers']['Content-Type']
+    assert content_type.startswith('multipart/form-data; boundary=')
+    body = kwargs['data'].read()
+    manifest = {"input": {"name": "report.txt",
+                          "_filename": ["report.txt"]}}
+    assert json.dumps(manifest).encode('utf-8') in body
+    assert b'hello' in body
+
+
+def test_download_document_resumes(calls, service, tmp_path):
+    dest = tmp_path / 'file.bin'
+    (tmp_path / 'file.bin.part').write_bytes(b'abc')
+    service.set_uri('/Document')
+    calls.body = FakeResponse(b'defgh', status_code=206)
+
+    assert service.download_document(9, str(dest), chunk_size=2) == 5
+
+    headers = calls[0][2]['headers']
+    assert headers['Range'] == 'bytes=3-'
+    assert headers['accept'] == 'application/octet-stream'
+    assert calls[0][2]['stream'] is True
+    assert dest.read_bytes() == b'abcdefgh'
+    assert not (tmp_path / 'file.bin.part').exists()
+    assert calls.body.closed
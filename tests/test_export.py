@@ -0,0 +1,73 @@
+# Offline tests for streaming exports.
+
+import io
+import json
+
+import pytest
+
+from glpi import export
+
+
+class FakeService(object):
+    """ get_range() over an in-memory table, failing once on request. """
+
+    def __init__(self, total, fail_at=None):
+        self.rows = [{"id": i, "name": "item %d" % i} for i in range(total)]
+        self.fail_at = fail_at
+
+    def get_range(self, path, start, end, params=None, fields=None):
+        if start == self.fail_at:
+            self.fail_at = None
+            raise RuntimeError('connection lost')
+        return self.rows[start:end + 1], len(self.rows)
+
+
+def test_pages_are_written_in_order():
+    out = io.BytesIO()
+    written = export.export(FakeService(23), 'Computer', out,
+                            page_size=5, workers=3)
+
+    lines = out.getvalue().decode('utf-8').splitlines()
+    assert written == 23
+    assert [json.loads(line)['id'] for line in lines] == list(range(23))
+    assert lines[0] == '{"id":0,"name":"item 0"}'
+
+
+def test_csv_export():
+    out = io.BytesIO()
+    export.export(FakeService(3), 'Computer', out, fmt='csv', page_size=2)
+
+    assert out.getvalue().decode('utf-8') == (
+        'id,name\n0,item 0\n1,item 1\n2,item 2\n')
+
+
+def test_non_ascii_values_are_written_as_utf8():
+    rows = [{'name': u'Caf\xe9', 'tags': [u'cr\xe8me']}]
+    out = io.BytesIO()
+    export.CsvWriter(out).write_rows(rows)
+    export.NdjsonWriter(out).write_rows(rows)
+
+    assert out.getvalue().decode('utf-8') == (
+        u'name,tags\nCaf\xe9,"[""cr\xe8me""]"\n'
+        u'{"name":"Caf\xe9","tags":["cr\xe8me"]}\n')
+
+
+def test_resume_after_failure(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    state_path = path + '.state'
+    service = FakeService(10, fail_at=6)
+
+    with open(path, 'wb') as out:
+        with pytest.raises(RuntimeError):
+            export.export(service, 'Computer', out, fmt='csv', page_size=3,
+                          state_path=state_path)
+    assert json.load(open(state_path))['next_start'] == 6
+
+    with open(path, 'r+b') as out:
+        assert export.export(service, 'Computer', out, fmt='csv',
+                             page_size=3, state_path=state_path,
+                             resume=True) == 10
+
+    lines = open(path).read().splitlines()
+    assert lines[0] == 'id,name'
+    assert [int(line.split(',')[0]) for line in lines[1:]] == list(range(10))
@@ -0,0 +1,70 @@
+# Offline tests for the fan-out client.
+
+import time
+import threading
+
+from glpi.fanout import MultiGLPI
+
+
+class FakeGLPI(object):
+    def __init__(self, tickets, delay=0, error=None):
+        self.tickets = tickets
+        self.delay = delay
+        self.error = error
+        self.release = threading.Event()
+        self.calls = []
+
+    def get_all(self, item_name, **read_options):
+        self.calls.append((item_name, read_options))
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.error:
+            return {self.error}
+        return [dict(t) for t in self.tickets]
+
+    def search_engine(self, item_name, criteria, **search_options):
+        return {'totalcount': len(self.tickets), 'count': len(self.tickets),
+                'data': [dict(t) for t in self.tickets]}
+
+
+def test_fanout_merges_tagged_rows():
+    eu = FakeGLPI([{'id': 1}, {'id': 2}])
+    us = FakeGLPI([{'id': 1}])
+    with MultiGLPI([('eu', eu), ('us', us)]) as regions:
+        result = regions.get_all('ticket', fields=['id'])
+        assert result.complete
+        assert eu.calls == [('ticket', {'fields': ['id']})]
+        assert sorted((r['_source'], r['id']) for r in result.rows()) == \
+            [('eu', 1), ('eu', 2), ('us', 1)]
+        assert len(regions.search_engine('ticket', []).rows('region')) == 3
+
+
+def test_fanout_partial_results_on_error_and_timeout():
+    eu = FakeGLPI([{'id': 1}])
+    down = FakeGLPI([], error='ERROR_GLPI_LOGIN')
+    slow = FakeGLPI([{'id': 7}], delay=5)
+    regions = MultiGLPI({'eu': eu, 'down': down, 'slow': slow},
+                        timeout={'slow': 0.2})
+    try:
+        started = time.time()
+        result = regions.get_all('ticket')
+        assert time.time() - started < 2
+        assert not result.complete
+        assert list(result.results) == ['eu']
+        assert 'ERROR_GLPI_LOGIN' in str(result.errors['down'])
+        assert 'Timed out' in str(result.errors['slow'])
+        assert [r['id'] for r in result.rows()] == [1]
+    finally:
+        slow.release.set()
+        regions.close()
+
+
+def test_fanout_stream_yields_fastest_first():
+    fast = FakeGLPI([{'id': 1}])
+    slow = FakeGLPI([{'id': 2}], delay=5)
+    with MultiGLPI({'slow': slow, 'fast': fast}, timeout=None) as regions:
+        stream = regions.stream('get_all', 'ticket')
+        name, result, error = next(stream)
+        assert (name, error) == ('fast', None)
+        slow.release.set()
+        assert next(stream)[:2] == ('slow', [{'id': 2}])
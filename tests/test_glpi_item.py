@@ -0,0 +1,111 @@
+# Offline tests for item objects.
+
+import pytest
+
+from glpi import GlpiItem, Ticket, KnowBase
+from glpi.glpi import GlpiInvalidArgument
+
+
+def test_ticket_defaults_are_shared():
+    t1 = Ticket(name="a", content="b")
+    t2 = Ticket(name="c", content="d", attributes={"urgency": 5})
+
+    assert t1.get_attribute('urgency') == 3
+    assert t2.get_attribute('urgency') == 5
+    assert t1.get_attribute('closedate') == "<DEFAULT_NULL>"
+    assert list(t1.get_data())[:3] == ["name", "content", "actiontime"]
+    assert t1.get_data()['name'] == "a"
+    assert Ticket.defaults['urgency'] == 3
+    assert not hasattr(t1, '__dict__')
+
+    with pytest.raises(TypeError):
+        Ticket.defaults['urgency'] = 1
+
+    with pytest.raises(GlpiInvalidArgument):
+        Ticket(name="a")
+
+
+def test_knowbase_defaults_win():
+    kb = KnowBase({"name": "kb", "view": 9})
+
+    assert kb.get_attribute('view') == 1
+    assert kb.get_attribute('name') == "kb"
+
+
+def test_unset_attributes():
+    t = Ticket(name="a", content="b")
+    t.unset_attributes()
+
+    assert t.get_data() == {}
+    assert t.get_attribute('urgency') is None
+
+
+def test_from_json_decodes_nested_lazily():
+    item = GlpiItem.from_json(
+        '{"id": 7, "name": "pc", "links": [{"rel": "Entity", "href": "]"}]}')
+
+    assert item.get_attribute('id') == 7
+    assert type(item._values['links']).__name__ == '_RawJSON'
+    assert item.get_attribute('links') == [{"rel": "Entity", "href": "]"}]
+    assert item.get_data() == {"id": 7, "name": "pc",
+                               "links": [{"rel": "Entity", "href": "]"}]}
+
+
+def test_loaded_item_tracks_changes():
+    item = GlpiItem.load({"id": 4, "name": "old", "status": 1})
+    assert not item.is_dirty()
+
+    item.set_attribute('name', 'new')
+    item.set_attribute('status', 1)
+    assert item.get_changes() == {"name": "new"}
+
+    item.set_attribute('name', 'old')
+    assert not item.is_dirty()
+
+    item.set_attributes({"urgency": 4})
+    assert item.get_changes() == {"urgency": 4}
+    item.mark_clean()
+    assert item.get_changes() == {}
+
+
+def test_new_item_sends_everything():
+    t = Ticket(name="a", content="b")
+
+    assert t.is_dirty()
+    assert t.get_changes() == t.get_data()
+
+
+def test_data_writes_through_to_the_item():
+    item = GlpiItem.load({"id": 4, "name": "old"})
+    data = item.data
+    data['name'] = 'new'
+    item.get_data()['status'] = 2
+    assert item.get_attribute('name') == 'new'
+    assert item.get_changes() == {"name": "new", "status": 2}
+
+    item.set_attribute('urgency', 5)
+    assert data['urgency'] == 5
+    del data['urgency']
+    assert item.get_attribute('urgency') is None
+
+    t = Ticket(name="a", content="b")
+    t.data.update({"urgency": 1})
+    t.data.pop('closedate')
+    assert t.get_attribute('urgency') == 1
+    assert 'closedate' not in t.get_data()
+    assert Ticket.defaults['closedate'] == "<DEFAULT_NULL>"
+    assert isinstance(t.data.copy(), dict)
+
+
+def test_data_is_read_lazily():
+    item = GlpiItem.from_json('{"id": 7, "links": [{"rel": "Entity"}]}')
+    data = item.get_data()
+    assert list(data) == ['id', 'links'] and len(data) == 2
+    assert type(item._values['links']).__name__ == '_RawJSON'
+    assert data['links'] == [{"rel": "Entity"}]
+
+    t = Ticket(name="a", content="b")
+    assert t.get_data()['urgency'] == 3
+    # the defaults are read from the shared table, not copied
+    assert 'urgency' not in t._values
+    assert t._base is Ticket.defaults
@@ -0,0 +1,83 @@
+# Offline tests for hedged requests.
+
+import time
+import threading
+
+import requests
+
+from glpi.hedge import Hedger, MIN_SAMPLES
+from tests.helpers import FakeResponse
+
+
+class SlowOnce(object):
+    """ The first call waits for release, the next ones answer at once. """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+        self.responses = []
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            self.release.wait(5)
+        response = FakeResponse({'first': first})
+        self.responses.append(response)
+        return response
+
+
+def test_slow_call_is_hedged_and_hedge_wins():
+    hedger = Hedger(max_delay=0.05, budget=1)
+    slow = SlowOnce()
+    try:
+        started = time.time()
+        assert hedger.call(slow).json() == {'first': False}
+        assert time.time() - started < 1
+    finally:
+        slow.release.set()
+    metrics = hedger.metrics()
+    assert (metrics['calls'], metrics['hedged'], metrics['won']) == (1, 1, 1)
+
+    # the late original response is released
+    for _ in range(100):
+        if len(slow.responses) == 2:
+            break
+        time.sleep(0.01)
+    assert slow.responses[1].closed
+    hedger.close()
+
+
+def test_budget_caps_hedges_and_delay_follows_latencies():
+    hedger = Hedger(max_delay=0.05, budget=0)
+    slow = SlowOnce()
+    threading.Timer(0.2, slow.release.set).start()
+    assert hedger.call(slow).json() == {'first': True}
+    assert slow.calls == 1
+    assert hedger.metrics()['over_budget'] == 1
+
+    assert hedger.delay() == 0.05
+    for _ in range(MIN_SAMPLES):
+        hedger.call(lambda: None)
+    assert hedger.min_delay <= hedger.delay() < 0.05
+    hedger.close()
+
+
+def test_service_hedges_reads_only(monkeypatch, service):
+    slow = SlowOnce()
+    monkeypatch.setattr(requests, 'request', slow)
+    service.hedger = Hedger(max_delay=0.05, budget=1)
+    try:
+        assert service.get(1) == {'first': False}
+        assert slow.calls == 2
+
+        slow.calls = 0
+        slow.release.clear()
+        threading.Timer(0.2, slow.release.set).start()
+        service.update({'id': 1, 'name': 'pc'})
+        assert slow.calls == 1
+    finally:
+        slow.release.set()
+        service.hedger.close()
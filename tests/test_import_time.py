@@ -0,0 +1,19 @@
+# Startup guard: importing the package must not pull in heavy dependencies.
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_load_requests():
+    code = ('import sys\n'
+            'from glpi import GLPI, Ticket, GlpiTicket\n'
+            'GLPI("http://localhost", "app", "user")\n'
+            'heavy = [m for m in ("requests", "urllib3", "html.parser",\n'
+            '                     "glpi.resultset")\n'
+            '         if m in sys.modules]\n'
+            'assert not heavy, heavy\n')
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.check_call([sys.executable, '-c', code], env=env)
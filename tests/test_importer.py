@@ -0,0 +1,70 @@
+# Offline tests for the bulk importer.
+
+import io
+import json
+
+from glpi.importer import Importer, read_rows
+
+
+class FakeService(object):
+    """ create_many() handing out increasing IDs. """
+
+    def __init__(self):
+        self.batches = []
+        self.uri = None
+
+    def for_uri(self, uri):
+        self.uri = uri
+        return self
+
+    def create_many(self, items):
+        self.batches.append(items)
+        first = sum(len(b) for b in self.batches) - len(items) + 100
+        return [{"id": first + i, "message": ""} for i in range(len(items))]
+
+
+CSV = (u'alert,title,body,urgency\n'
+       u'a1,Disk full,/var is full,5\n'
+       u'a2,No body,,3\n'
+       u'a3,CPU,load 40,high\n'
+       u'a4,Ping,host down,\n')
+
+
+def test_import_csv_with_mapping(tmp_path):
+    service = FakeService()
+    log_path = str(tmp_path / 'log.ndjson')
+    importer = Importer(service, 'ticket', external_id='alert',
+                        mapping={'title': 'name', 'body': 'content',
+                                 'urgency': 'urgency'},
+                        batch_size=1, workers=2, log_path=log_path)
+
+    stats = importer.run(read_rows(io.StringIO(CSV), 'csv'))
+
+    assert service.uri == '/Ticket'
+    assert stats == {'created': 2, 'skipped': 0, 'invalid': 2, 'failed': 0}
+    sent = [item for batch in service.batches for item in batch]
+    assert [t['name'] for t in sent] == ['Disk full', 'Ping']
+    assert sent[0]['urgency'] == 5
+    assert sent[1]['urgency'] == 3
+    assert sent[0]['closedate'] == '<DEFAULT_NULL>'
+
+    log = [json.loads(line) for line in open(log_path)]
+    assert sorted((e['external_id'], e['status']) for e in log) == [
+        ('a1', 'created'), ('a2', 'invalid'), ('a3', 'invalid'),
+        ('a4', 'created')]
+
+
+def test_rerun_skips_imported_rows(tmp_path):
+    log_path = str(tmp_path / 'log.ndjson')
+    rows = [{"id": "1", "name": "a", "content": "x"},
+            {"id": "2", "name": "b", "content": "y"}]
+    Importer(FakeService(), 'Problem', external_id='id',
+             log_path=log_path).run(rows[:1])
+
+    service = FakeService()
+    stats = Importer(service, 'Problem', external_id='id',
+                     log_path=log_path).run(rows)
+
+    assert stats['skipped'] == 1 and stats['created'] == 1
+    assert [i['name'] for b in service.batches for i in b] == ['b']
+    assert 'id' not in service.batches[0][0]
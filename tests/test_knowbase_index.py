@@ -0,0 +1,94 @@
+# Offline tests for the knowledge base full-text index.
+
+import os
+
+import pytest
+
+from glpi import KnowBaseIndex
+from glpi.glpi import GlpiInvalidArgument
+from glpi.knowbase_index import tokenize
+from tests.helpers import FakeServer
+
+
+def test_tokenize_strips_escaped_html_and_accents():
+    answer = ('&lt;p&gt;Red&#233;marrer l&amp;#39;imprimante&lt;/p&gt;'
+              '&lt;script&gt;var hidden = 1;&lt;/script&gt;'
+              '&lt;ul&gt;&lt;li&gt;Wi-Fi &amp;amp; VPN&lt;/li&gt;&lt;/ul&gt;')
+    assert tokenize(answer) == ['redemarrer', 'imprimante', 'wi', 'fi',
+                                'vpn']
+    assert tokenize(None) == []
+
+
+def test_bm25_ranking(tmp_path):
+    with KnowBaseIndex(None, str(tmp_path)) as index:
+        index.add([
+            {'id': 1, 'name': 'Printer offline',
+             'answer': '&lt;p&gt;Restart the print spooler.&lt;/p&gt;'},
+            {'id': 2, 'name': 'VPN access',
+             'answer': 'Install the client, then check the printer list.'},
+            {'id': 3, 'name': 'Email quota',
+             'answer': 'Archive old email to free space.'},
+        ])
+        results = index.search('printer spooler')
+        assert [r['id'] for r in results] == [1, 2]
+        assert results[0]['name'] == 'Printer offline'
+        assert results[0]['score'] > results[1]['score'] > 0
+        assert index.search('EMAIL', limit=1)[0]['id'] == 3
+        assert index.search('nothing here') == []
+        assert index.search('') == []
+
+
+def test_updates_deletes_and_merges(tmp_path):
+    path = str(tmp_path)
+    index = KnowBaseIndex(None, path, max_segments=2)
+    index.add([{'id': 1, 'name': 'Printer offline'}])
+    index.add([{'id': 2, 'name': 'Printer jam'}])
+    # the new version replaces the postings of the previous one
+    index.add([{'id': 1, 'name': 'Scanner offline'}])
+    assert [r['id'] for r in index.search('printer')] == [2]
+    assert [r['id'] for r in index.search('scanner')] == [1]
+    # three segments: merged into one
+    assert [f for f in os.listdir(path) if f.endswith('.postings')] == \
+        ['4.postings']
+
+    assert index.remove([2, 99]) == 1
+    assert index.search('jam') == []
+    assert len(index) == 1
+    index.close()
+
+    # reopened from disk
+    with KnowBaseIndex(None, path) as index:
+        assert [r['id'] for r in index.search('offline')] == [1]
+        assert index.known_ids('KnowbaseItem') == set([1])
+        index.merge()
+        assert index.search('printer') == []
+        assert index.search('scanner')[0]['name'] == 'Scanner offline'
+
+
+def test_incremental_sync(tmp_path):
+    server = FakeServer('KnowbaseItem')
+    server.put(1, '2024-01-01 10:00:00', 'Printer offline',
+               answer='&lt;p&gt;Restart the spooler&lt;/p&gt;')
+    server.put(2, '2024-01-01 10:00:01', 'VPN access')
+    index = KnowBaseIndex(server, str(tmp_path), page_size=10)
+
+    result = index.sync()
+    assert (result['inserted'], result['updated']) == (2, 0)
+    assert index.search('spooler')[0]['id'] == 1
+
+    server.put(2, '2024-01-01 11:00:00', 'VPN spooler errors')
+    server.put(3, '2024-01-01 11:00:01', 'Email quota')
+    del server.items[1]
+    server.fetched = []
+
+    result = index.sync(overlap=0, scan_interval=0)
+    assert (result['inserted'], result['updated'],
+            result['deleted']) == (1, 1, 1)
+    assert server.fetched == [2, 3]
+    assert [r['id'] for r in index.search('spooler')] == [2]
+    assert index.load_state('KnowbaseItem')['watermark'] == \
+        '2024-01-01 11:00:01'
+
+    with pytest.raises(GlpiInvalidArgument):
+        index.upsert('Ticket', [{'id': 1}])
+    index.close()
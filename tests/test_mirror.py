@@ -0,0 +1,96 @@
+# Offline tests for the SQLite mirror.
+
+import pytest
+
+from glpi import Mirror, SearchQuery, Param
+from glpi.glpi import GlpiInvalidArgument
+
+
+class FakeService(object):
+    """ get_range() over in-memory item lists. """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.requests = 0
+
+    def get_range(self, path, start, end, params=None, fields=None):
+        self.requests += 1
+        rows = self.tables[path]
+        return rows[start:end + 1], len(rows)
+
+
+TICKETS = [
+    {"id": 1, "name": "Disk full", "status": 2, "entities_id": 0,
+     "date_mod": "2024-01-02 10:00:00", "_links": [{"rel": "Entity"}]},
+    {"id": 2, "name": "Printer 100% broken", "status": 5, "entities_id": 1,
+     "date_mod": "2024-01-01 09:00:00"},
+    {"id": 3, "name": "disk slow", "status": 2, "entities_id": 1,
+     "date_mod": "2024-01-03 08:00:00", "priority": 4},
+]
+
+
+@pytest.fixture()
+def mirror(tmp_path):
+    m = Mirror(FakeService({'Ticket': TICKETS}), str(tmp_path / 'm.db'),
+               page_size=2)
+    assert m.refresh('Ticket') == 3
+    yield m
+    m.close()
+
+
+def ids(result):
+    return [item['id'] for item in result['data']]
+
+
+def test_refresh_copies_items(mirror):
+    assert mirror.get('Ticket', 1) == TICKETS[0]
+    assert mirror.get('Ticket', 9) is None
+    assert mirror.freshness('Ticket')['rows'] == 3
+    assert mirror.freshness('Computer') is None
+    assert mirror.item_types() == ['Ticket']
+
+    indexes = [r[1] for r in mirror.conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE type = 'index'")]
+    assert 'Ticket__status' in indexes and 'Ticket__date_mod' in indexes
+
+
+def test_search_criteria(mirror):
+    result = mirror.search('Ticket', {'criteria': [
+        {'field': 'status', 'searchtype': 'equals', 'value': '2'},
+        {'link': 'AND NOT', 'field': 'name', 'value': '^disk full$'}]})
+    assert ids(result) == [3]
+    assert result['totalcount'] == 1
+    assert result['refreshed_at'] is not None
+
+    result = mirror.search('Ticket', {'criteria': [
+        {'field': 'name', 'value': '100%'},
+        {'link': 'OR', 'field': 'date_mod', 'searchtype': 'morethan',
+         'value': '2024-01-02 12:00:00'}]}, sort='id', order='DESC')
+    assert ids(result) == [3, 2]
+
+    with pytest.raises(GlpiInvalidArgument):
+        mirror.search('Ticket', {'criteria': [{'field': 12, 'value': 2}]})
+
+
+def test_search_query_and_range(mirror):
+    query = (SearchQuery('Ticket')
+             .where('name', 'disk')
+             .sort('date_mod', 'DESC')
+             .range(Param('start'), Param('end'))
+             .forcedisplay('id', 'name'))
+    result = mirror.search(None, query, start=0, end=0)
+    assert result['data'] == [{'id': 3, 'name': 'disk slow'}]
+    assert result['totalcount'] == 2
+
+
+def test_upsert_delete_and_refresh(mirror):
+    mirror.upsert('Ticket', [{"id": 4, "name": "new", "status": 1,
+                              "urgency": 3}])
+    mirror.delete('Ticket', [1])
+    assert ids(mirror.search('Ticket', {'criteria': [
+        {'field': 'urgency', 'searchtype': 'equals', 'value': 3}]})) == [4]
+    assert [i['id'] for i in mirror.get_all('Ticket')] == [2, 3, 4]
+
+    mirror.service.tables['Ticket'] = TICKETS[:1]
+    assert mirror.refresh('Ticket') == 1
+    assert [i['id'] for i in mirror.get_all('Ticket')] == [1]
@@ -0,0 +1,220 @@
+# Offline tests for the durable outbox.
+
+import json
+import threading
+
+from glpi.glpi import GlpiService
+from glpi.outbox import Outbox
+from tests.helpers import FakeResponse
+
+
+class FakeService(object):
+    """
+    Array-input writes. Unreachable while `down` is set, answers
+    `status` (a 5xx) when set, and rejects batches with a 'bad' item.
+    """
+
+    def __init__(self):
+        self.down = False
+        self.status = None
+        self.sent = []
+        self.next_id = 100
+
+    def for_uri(self, uri):
+        return FakeItemService(self, uri)
+
+
+class FakeItemService(object):
+    def __init__(self, server, uri):
+        self.server = server
+        self.uri = uri
+
+    def request(self, method, url, accept_json=False, data=None):
+        assert url == self.uri
+        items = json.loads(data)['input']
+        if self.server.down:
+            if method == 'POST':
+                raise IOError('Connection refused')
+            return FakeResponse(['ERROR_SESSION_TOKEN_INVALID',
+                                 'session expired'], 401)
+        if self.server.status:
+            return FakeResponse(b'<html>Maintenance</html>',
+                                self.server.status)
+        if any(item.get('bad') for item in items):
+            return FakeResponse(['ERROR_BAD_ARRAY', 'Bad input'], 400)
+        if method == 'POST':
+            return FakeResponse(self.create_many(items), 201)
+        return FakeResponse(self.update_many(items))
+
+    def create_many(self, items):
+        self.server.sent.append(('create', self.uri, list(items)))
+        results = []
+        for item in items:
+            if item.get('name'):
+                self.server.next_id += 1
+                results.append({'id': self.server.next_id, 'message': ''})
+            else:
+                results.append({'id': False, 'message': 'Name required'})
+        return results
+
+    def update_many(self, items):
+        self.server.sent.append(('update', self.uri, list(items)))
+        return [{str(i['id']): True, 'message': ''} for i in items]
+
+
+def test_writes_survive_an_outage(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    service = FakeService()
+    service.down = True
+    outbox = Outbox(service, path)
+
+    first = outbox.create('Ticket', {'name': 'Disk full'}, key='alert-1')
+    assert outbox.create('Ticket', {'name': 'Disk full'},
+                         key='alert-1') == first
+    bad = outbox.create('Ticket', {'name': ''})
+    outbox.update('Ticket', {'id': 7, 'status': 2})
+    outbox.update('Ticket', {'id': 7, 'urgency': 4})
+    outbox.create('Problem', {'name': 'Storage'})
+
+    assert outbox.replay() == 0
+    assert outbox.metrics()['backlog'] == 5
+    assert 'Connection refused' in outbox.metrics()['last_error']
+    outbox.close()
+
+    # a new process replays the log in order once GLPI is back
+    service.down = False
+    outbox = Outbox(service, path, batch_size=10)
+    assert outbox.replay() == 5
+    assert service.sent == [
+        ('create', '/Ticket', [{'name': 'Disk full'}, {'name': ''}]),
+        ('update', '/Ticket', [{'id': 7, 'status': 2, 'urgency': 4}]),
+        ('create', '/Problem', [{'name': 'Storage'}])]
+    assert outbox.status(first) == {'status': 'sent', 'id': 101,
+                                    'error': None}
+    assert outbox.status(bad)['error'] == 'Name required'
+
+    metrics = outbox.metrics()
+    assert (metrics['backlog'], metrics['replayed'],
+            metrics['failed']) == (0, 4, 1)
+    assert metrics['replay_rate'] > 0
+    outbox.close()
+
+
+def test_concurrent_writers_share_commits(tmp_path):
+    outbox = Outbox(FakeService(), str(tmp_path / 'outbox.db'))
+    commits = []
+    commit = outbox._commit
+
+    def counting_commit(records):
+        commits.append(len(records))
+        commit(records)
+
+    outbox._commit = counting_commit
+    threads = [threading.Thread(target=outbox.create,
+                                args=('Ticket', {'name': 'n%d' % i}))
+               for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(commits) == 20
+    assert outbox.backlog() == 20
+    outbox.close()
+
+
+def test_background_replay(tmp_path):
+    service = FakeService()
+    outbox = Outbox(service, str(tmp_path / 'outbox.db'), interval=30)
+    outbox.start()
+    try:
+        seq = outbox.create('Ticket', {'name': 'Disk full'})
+        # a new write wakes the replay thread up
+        for _ in range(500):
+            if outbox.status(seq)['status'] == 'sent':
+                break
+            threading.Event().wait(0.01)
+        assert outbox.status(seq)['status'] == 'sent'
+    finally:
+        outbox.close()
+
+
+def test_rejected_batch_does_not_block_the_outbox(tmp_path):
+    service = FakeService()
+    outbox = Outbox(service, str(tmp_path / 'outbox.db'))
+    first = outbox.create('Ticket', {'name': 'a'})
+    bad = outbox.create('Ticket', {'name': 'b', 'bad': True})
+    last = outbox.create('Ticket', {'name': 'c'})
+
+    # a 5xx is an outage: the writes stay pending
+    service.status = 503
+    assert outbox.replay() == 0
+    assert outbox.backlog() == 3
+    assert '503' in outbox.metrics()['last_error']
+
+    # a rejected batch is sent again one write at a time
+    service.status = None
+    assert outbox.replay() == 3
+    assert service.sent == [('create', '/Ticket', [{'name': 'a'}]),
+                            ('create', '/Ticket', [{'name': 'c'}])]
+    assert outbox.status(first) == {'status': 'sent', 'id': 101,
+                                    'error': None}
+    assert outbox.status(bad)['status'] == 'failed'
+    assert 'ERROR_BAD_ARRAY' in outbox.status(bad)['error']
+    assert outbox.status(last)['id'] == 102
+    assert outbox.backlog() == 0
+    outbox.close()
+
+
+class SessionServer(object):
+    """ Transport of a GLPI server that only accepts its open sessions. """
+
+    def __init__(self):
+        self.sessions = set()
+        self.logins = 0
+        self.refuse_logins = False
+        self.created = []
+
+    def restart(self):
+        self.sessions.clear()
+
+    def __call__(self, method, url, headers=None, data=None, **kwargs):
+        if url.endswith('/initSession'):
+            if self.refuse_logins:
+                return FakeResponse(['ERROR_GLPI_LOGIN', 'refused'], 401)
+            self.logins += 1
+            token = 'token-%d' % self.logins
+            self.sessions.add(token)
+            return FakeResponse({'session_token': token})
+        if headers.get('Session-Token') not in self.sessions:
+            return FakeResponse(['ERROR_SESSION_TOKEN_INVALID',
+                                 'session expired'], 401)
+        items = json.loads(data)['input']
+        self.created.extend(items)
+        return FakeResponse([{'id': 200 + len(self.created), 'message': ''}
+                             for _ in items], 201)
+
+
+def test_expired_session_is_renewed(tmp_path):
+    server = SessionServer()
+    service = GlpiService('http://glpi/apirest.php', 'app',
+                          token_auth='user', transport=server)
+    outbox = Outbox(service, str(tmp_path / 'outbox.db'))
+    first = outbox.create('Ticket', {'name': 'a'})
+    assert outbox.replay() == 1
+    assert server.logins == 1
+
+    # GLPI restarted: its sessions are gone
+    server.restart()
+    server.refuse_logins = True
+    second = outbox.create('Ticket', {'name': 'b'})
+    assert outbox.replay() == 0
+    assert 'Unable to open a session' in outbox.metrics()['last_error']
+
+    server.refuse_logins = False
+    assert outbox.replay() == 1
+    assert server.logins == 2
+    assert [outbox.status(s)['status'] for s in (first, second)] == \
+        ['sent', 'sent']
+    assert server.created == [{'name': 'a'}, {'name': 'b'}]
+    outbox.close()
@@ -0,0 +1,127 @@
+# Offline tests for read options and client-side projection.
+
+import json
+
+import pytest
+
+from glpi import glpi as glpi_module
+from glpi.glpi import GlpiInvalidArgument
+from tests.helpers import FakeResponse
+
+
+def test_iter_json_array():
+    text = ' [ {"id": 1, "name": "a"} , {"id": 2}, 3 ] '
+    assert list(glpi_module._iter_json_array(text)) == [
+        {"id": 1, "name": "a"}, {"id": 2}, 3]
+    assert list(glpi_module._iter_json_array('[]')) == []
+
+
+def test_get_all_read_options_and_projection(calls, service):
+    calls.body = FakeResponse([{"id": 1, "name": "pc", "serial": "x"},
+                               {"id": 2, "name": "srv"}])
+    res = service.get_all(fields=['id', 'name'], only_id=False,
+                          expand_dropdowns=True, item_range='0-49')
+
+    assert res == [{"id": 1, "name": "pc"}, {"id": 2, "name": "srv"}]
+    method, url, kwargs = calls[0]
+    assert url == 'http://glpi/apirest.php/Computer'
+    assert kwargs['params'] == {'only_id': 'false',
+                                'expand_dropdowns': 'true',
+                                'range': '0-49'}
+
+
+def test_get_with_flags(calls, service):
+    calls.body = FakeResponse({"id": 3, "name": "pc", "_disks": []})
+    res = service.get(3, fields=['name'], with_disks=True)
+
+    assert res == {"name": "pc"}
+    assert calls[0][2]['params'] == {'with_disks': 'true'}
+
+    with pytest.raises(GlpiInvalidArgument):
+        service.get(3, with_everything=True)
+
+
+def test_search_engine_forcedisplay(calls, service):
+    service.set_uri('/search')
+    calls.body = FakeResponse({"totalcount": 0, "data": []})
+    service.search_engine('Computer?criteria[0][field]=1',
+                          forcedisplay=[2, 1], item_range='0-9')
+
+    assert calls[0][2]['params'] == {'forcedisplay[0]': 2,
+                                     'forcedisplay[1]': 1,
+                                     'range': '0-9'}
+
+
+def test_update_sends_only_changes(calls, service):
+    calls.body = FakeResponse({"id": 5, "name": "pc", "serial": "x",
+                               "links": [{"rel": "Entity"}]})
+    item = service.get(5, as_item=True)
+    assert calls[0][2]['params'] == {}
+
+    assert service.update(item) == []
+    assert len(calls) == 1
+
+    item.set_attribute('serial', 'y')
+    calls.body = FakeResponse([{"5": True, "message": ""}])
+    service.update(item)
+
+    method, url, kwargs = calls[1]
+    assert (method, url) == ('PUT', 'http://glpi/apirest.php/Computer/5')
+    assert json.loads(kwargs['data']) == {"input": {"id": 5, "serial": "y"}}
+    assert not item.is_dirty()
+
+
+def test_create_sends_valid_json(calls, service):
+    from glpi import Ticket
+
+    ticket = Ticket(name='Disk "C:\\" full', content='a\nb')
+    calls.body = FakeResponse({"id": 8, "message": ""}, 201)
+    assert service.create(ticket) == {"id": 8, "message": ""}
+
+    method, url, kwargs = calls[0]
+    assert (method, url) == ('POST', 'http://glpi/apirest.php/Computer')
+    sent = json.loads(kwargs['data'])['input']
+    assert sent['name'] == 'Disk "C:\\" full'
+    assert sent['content'] == 'a\nb'
+    assert sent['closedate'] is None
+
+
+def test_update_many_skips_clean_items(calls, service):
+    from glpi import GlpiItem
+
+    clean = GlpiItem.load({"id": 1, "name": "a"})
+    dirty = GlpiItem.load({"id": 2, "name": "b"})
+    dirty.set_attribute('name', 'c')
+    calls.body = FakeResponse([{"2": True, "message": ""}])
+
+    service.update_many([clean, dirty, {"id": 3, "name": None}])
+
+    method, url, kwargs = calls[0]
+    assert (method, url) == ('PUT', 'http://glpi/apirest.php/Computer')
+    assert json.loads(kwargs['data']) == {"input": [
+        {"id": 2, "name": "c"}, {"id": 3, "name": None}]}
+    assert not dirty.is_dirty()
+
+
+def test_get_range_reads_total(calls, service):
+    calls.body = FakeResponse([{"id": 1}], headers={
+        'Content-Range': '0-0/42'})
+    assert service.get_range('Computer', 0, 0) == ([{"id": 1}], 42)
+    assert calls[0][2]['params'] == {'range': '0-0'}
+
+    calls.body = FakeResponse({"totalcount": 7, "data": [{"1": "pc"}]})
+    assert service.get_range('search/Computer?', 0, 0) == ([{"1": "pc"}], 7)
+
+
+def test_get_many_chunks_ids(calls, service):
+    calls.body = FakeResponse([{"id": 1, "name": "a"}, {}])
+    items = service.get_many([1, 2, 3], fields=['id'], chunk_size=2)
+
+    assert items == [{"id": 1}, {"id": 1}]
+    assert [c[1] for c in calls] == [
+        'http://glpi/apirest.php/getMultipleItems'] * 2
+    assert calls[0][2]['params'] == {
+        'items[0][itemtype]': 'Computer', 'items[0][items_id]': 1,
+        'items[1][itemtype]': 'Computer', 'items[1][items_id]': 2}
+    assert calls[1][2]['params'] == {
+        'items[0][itemtype]': 'Computer', 'items[0][items_id]': 3}
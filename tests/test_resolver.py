@@ -0,0 +1,111 @@
+# Offline tests for foreign key resolution.
+
+import time
+
+from glpi.resolver import Resolver, DropdownCache, foreign_key_type
+from glpi.resultset import ColumnarResult
+
+DROPDOWNS = {
+    '/User': {2: {'id': 2, 'name': 'glpi'},
+              5: {'id': 5, 'name': 'jdoe', 'firstname': 'John',
+                  'realname': 'Doe'}},
+    '/Entity': {0: {'id': 0, 'name': 'Root entity',
+                    'completename': 'Root entity'},
+                3: {'id': 3, 'name': 'Paris',
+                    'completename': 'Root entity > Paris'}},
+    '/Location': {8: {'id': 8, 'name': 'Floor 2'}},
+}
+
+
+class FakeService(object):
+    def __init__(self):
+        self.requests = []
+
+    def for_uri(self, uri):
+        return FakeDropdowns(self, uri)
+
+
+class FakeDropdowns(object):
+    def __init__(self, server, uri):
+        self.server = server
+        self.uri = uri
+
+    def get_many(self, ids, fields=None, chunk_size=100):
+        self.server.requests.append((self.uri, list(ids)))
+        items = DROPDOWNS[self.uri]
+        return [items[i] for i in ids if i in items]
+
+
+TICKETS = [
+    {'id': 1, 'users_id_recipient': 5, 'entities_id': 3, 'locations_id': 8,
+     'status': 2},
+    {'id': 2, 'users_id_recipient': 2, 'entities_id': 3, 'locations_id': 9,
+     'users_id_lastupdater': 5},
+    {'id': 3, 'users_id_recipient': 0, 'entities_id': '3'},
+    {'id': 4, 'users_id_recipient': 0, 'entities_id': 0},
+]
+
+
+def test_foreign_key_type():
+    assert foreign_key_type('users_id_recipient') == 'User'
+    assert foreign_key_type('itilcategories_id') == 'ITILCategory'
+    assert foreign_key_type('status') is None
+    assert foreign_key_type('id') is None
+
+
+def test_resolve_fetches_each_reference_once():
+    service = FakeService()
+    resolver = Resolver(service, workers=1)
+    tickets = resolver.resolve(TICKETS)
+
+    assert tickets[0]['users_id_recipient_name'] == 'John Doe'
+    assert tickets[0]['entities_id_name'] == 'Root entity > Paris'
+    assert tickets[1]['users_id_recipient_name'] == 'glpi'
+    assert tickets[1]['users_id_lastupdater_name'] == 'John Doe'
+    assert tickets[1]['locations_id_name'] is None   # unknown location
+    assert tickets[2]['users_id_recipient_name'] is None
+    assert tickets[2]['entities_id_name'] == 'Root entity > Paris'
+    # users_id 0 is no user, entities_id 0 the root entity
+    assert tickets[3]['users_id_recipient_name'] is None
+    assert tickets[3]['entities_id_name'] == 'Root entity'
+    assert 'status_name' not in tickets[0]
+    assert 'users_id_recipient_name' not in TICKETS[0]
+    assert sorted(service.requests) == [
+        ('/Entity', [0, 3]), ('/Location', [8, 9]), ('/User', [2, 5])]
+
+    # everything is cached now, unknown IDs included
+    resolver.resolve(TICKETS)
+    assert resolver.lookup('User', [5, 2, 0]) == {5: 'John Doe', 2: 'glpi'}
+    assert resolver.name('Entity', 0) == 'Root entity'
+    assert resolver.name('User', 0) is None
+    assert len(service.requests) == 3
+
+
+def test_resolve_columnar_rows():
+    resolver = Resolver(FakeService(), workers=1)
+    tickets = resolver.resolve(ColumnarResult(TICKETS))
+    assert [t['id'] for t in tickets] == [1, 2, 3, 4]
+    assert tickets[0]['users_id_recipient_name'] == 'John Doe'
+    assert tickets[3]['entities_id_name'] == 'Root entity'
+
+
+def test_cache_bounds_ttl_and_snapshot(tmp_path):
+    cache = DropdownCache(max_size=2, ttl=60)
+    cache.put('User', 1, 'a')
+    cache.put('User', 2, 'b')
+    cache.get('User', 1)
+    cache.put('User', 3, 'c')  # evicts the least recently used: 2
+    assert cache.get('User', 2) is None
+    assert cache.get('User', 1) == 'a'
+
+    expiring = DropdownCache(ttl=60)
+    expiring.put('User', 4, 'old', stored_at=time.time() - 120)
+    assert expiring.get('User', 4, 'expired') == 'expired'
+
+    path = str(tmp_path / 'dropdowns.json')
+    assert cache.save(path) == 2
+    warm = DropdownCache(ttl=60, snapshot=path)
+    assert len(warm) == 2
+    service = FakeService()
+    assert Resolver(service, warm).name('User', 3) == 'c'
+    assert service.requests == []
@@ -0,0 +1,62 @@
+# Offline tests for the columnar result container.
+
+from array import array
+
+import pytest
+
+from glpi import ColumnarResult
+
+
+ROWS = [
+    {"id": 1, "name": "pc-01", "entities_id": 0, "serial": None},
+    {"id": 2, "name": "pc-02", "entities_id": 0, "serial": "ABC"},
+    {"id": 3, "name": "pc-01", "entities_id": 4, "comment": ["x"]},
+]
+
+
+def test_columns_and_rows():
+    result = ColumnarResult(ROWS)
+
+    assert len(result) == 3
+    assert result.columns == ['id', 'name', 'entities_id', 'serial',
+                              'comment']
+    assert result.column_kind('id') == 'int'
+    assert result.column_kind('name') == 'str'
+    assert result.column_kind('serial') == 'str'
+    assert result.column_kind('comment') == 'object'
+    assert result[1]['serial'] == 'ABC'
+    assert result[-1]['serial'] is None
+    assert dict(result[2]) == {"id": 3, "name": "pc-01", "entities_id": 4,
+                               "serial": None, "comment": ["x"]}
+    assert result.column('comment') == [None, None, ["x"]]
+
+
+def test_repeated_strings_are_stored_once():
+    result = ColumnarResult(ROWS)
+    buffers = result.buffers()
+
+    assert buffers['name']['categories'] == ['pc-01', 'pc-02']
+    # bytes() works on the memoryviews and on the Python 2 buffers
+    codes = array('i', bytes(buffers['name']['codes']))
+    assert codes.tolist() == [0, 1, 0]
+    ids = array(result._columns['id'].values.typecode,
+                bytes(buffers['id']['values']))
+    assert ids.tolist() == [1, 2, 3]
+    assert bytes(buffers['id']['valid']) == b'\x01\x01\x01'
+
+
+def test_mixed_column_is_demoted():
+    result = ColumnarResult([{"id": 1, "value": 3}, {"id": 2, "value": "a"}])
+
+    assert result.column_kind('value') == 'object'
+    assert result.column('value') == [3, "a"]
+
+
+def test_to_numpy_shares_int_buffers():
+    np = pytest.importorskip('numpy')
+    result = ColumnarResult(ROWS)
+    arrays = result.to_numpy()
+
+    assert arrays['id'].dtype == np.int64
+    assert list(arrays['id']) == [1, 2, 3]
+    assert list(arrays['serial']) == [None, 'ABC', None]
@@ -0,0 +1,87 @@
+# Offline tests for the search query builder.
+
+import pytest
+
+from glpi import SearchQuery, Param, GLPI
+from glpi.glpi import GlpiInvalidArgument
+from tests.helpers import FakeResponse
+
+OPTIONS = {
+    'Ticket': {"common": "Characteristics",
+               "1": {"name": "Title", "uid": "Ticket.name"},
+               "12": {"name": "Status", "uid": "Ticket.status"},
+               "19": {"name": "Last update", "uid": "Ticket.date_mod"},
+               "80": {"name": "Entity", "uid": "Ticket.Entity.completename"}},
+    'User': {"1": {"name": "Login", "uid": "User.name"}},
+}
+
+
+def test_compile_and_render():
+    query = (SearchQuery('Ticket')
+             .where('status', Param('status'), searchtype='equals')
+             .where('name', 'disk & cpu', link='OR')
+             .meta('User', 'name', Param('login'), searchtype='contains')
+             .sort('date_mod', 'DESC')
+             .forcedisplay('name', 12))
+    compiled = query.compile(OPTIONS.get)
+
+    assert compiled.params == ['status', 'login']
+    assert compiled.uri(status=2, login='j.doe') == (
+        'search/Ticket?'
+        'criteria%5B0%5D%5Bfield%5D=12&criteria%5B0%5D%5Bvalue%5D=2&'
+        'criteria%5B0%5D%5Bsearchtype%5D=equals&'
+        'criteria%5B1%5D%5Bfield%5D=1&'
+        'criteria%5B1%5D%5Bvalue%5D=disk%20%26%20cpu&'
+        'criteria%5B1%5D%5Bsearchtype%5D=&criteria%5B1%5D%5Blink%5D=OR&'
+        'metacriteria%5B0%5D%5Blink%5D=AND&'
+        'metacriteria%5B0%5D%5Bitemtype%5D=User&'
+        'metacriteria%5B0%5D%5Bfield%5D=1&'
+        'metacriteria%5B0%5D%5Bsearchtype%5D=contains&'
+        'metacriteria%5B0%5D%5Bvalue%5D=j.doe&'
+        'sort=19&order=DESC&forcedisplay%5B0%5D=1&forcedisplay%5B1%5D=12')
+
+    with pytest.raises(GlpiInvalidArgument):
+        compiled.render(status=2)
+
+
+def test_unknown_field_is_rejected_at_compile_time():
+    with pytest.raises(GlpiInvalidArgument):
+        SearchQuery('Ticket').where('nope', 1).compile(OPTIONS.get)
+
+
+def test_range_param():
+    compiled = SearchQuery('Ticket').range(Param('a'), Param('b')).compile(
+        OPTIONS.get)
+    assert compiled.render(a=0, b=49) == 'range=0-49'
+
+
+def test_non_ascii_values_are_quoted_as_utf8():
+    compiled = SearchQuery('Ticket').where('name', Param('name')).compile(
+        OPTIONS.get)
+    expected = 'criteria%5B0%5D%5Bvalue%5D=Caf%C3%A9'
+    assert expected in compiled.render(name=u'Caf\xe9')
+    assert expected in compiled.render(name=u'Caf\xe9'.encode('utf-8'))
+
+
+def test_search_engine_sends_searchtype(calls):
+    glpi = GLPI('http://glpi/apirest.php', 'app', 'user')
+    glpi.api_session = 'session'
+    glpi.init_api = None
+    from glpi.glpi import GlpiService
+    glpi.api_rest = GlpiService('http://glpi/apirest.php', 'app',
+                                token_auth='user')
+    glpi.api_rest.session = 'session'
+
+    calls.body = FakeResponse(OPTIONS['Ticket'])
+    glpi.cached_search_options('Ticket')
+    calls.body = FakeResponse({"totalcount": 0, "data": []})
+    glpi.search_engine('Ticket', {'criteria': [
+        {'field': 'status', 'searchtype': 'equals', 'value': 1}]})
+    glpi.search_engine('Ticket', {'criteria': [
+        {'field': 'status', 'searchtype': 'equals', 'value': 2}]})
+
+    assert len(calls) == 3
+    assert calls[2][1] == (
+        'http://glpi/apirest.php/search/Ticket?'
+        'criteria%5B0%5D%5Bfield%5D=12&criteria%5B0%5D%5Bvalue%5D=2&'
+        'criteria%5B0%5D%5Bsearchtype%5D=equals')
@@ -0,0 +1,71 @@
+# Offline tests for the cross-process session token cache.
+
+import time
+
+import pytest
+import requests
+
+from glpi import SessionCache
+from glpi.glpi import GlpiService
+from tests.helpers import FakeResponse
+
+
+class ServerLog(list):
+    valid_status = 200
+
+
+@pytest.fixture()
+def server(monkeypatch):
+    """ Fake GLPI server handing out numbered session tokens. """
+    log = ServerLog()
+
+    def fake_request(method, url, **kwargs):
+        path = url.rsplit('/', 1)[-1]
+        log.append(path)
+        if path == 'initSession':
+            return FakeResponse({"session_token": "s%d" % len(log)})
+        if path == 'getActiveProfile':
+            return FakeResponse({}, status_code=log.valid_status)
+        return FakeResponse([])
+
+    monkeypatch.setattr(requests, 'request', fake_request)
+    return log
+
+
+def new_service(cache):
+    return GlpiService('http://glpi/apirest.php', 'app', '/Ticket',
+                       token_auth='user', session_cache=cache)
+
+
+def test_token_is_shared_between_services(server, tmp_path):
+    cache = SessionCache(str(tmp_path))
+
+    assert new_service(cache).get_session_token() == 's1'
+    assert new_service(cache).get_session_token() == 's1'
+    assert server == ['initSession']
+
+    other = GlpiService('http://glpi/apirest.php', 'app', '/Ticket',
+                        token_auth='other-user', session_cache=cache)
+    assert other.get_session_token() == 's2'
+
+
+def test_stale_token_is_revalidated(server, tmp_path):
+    cache = SessionCache(str(tmp_path), revalidate_after=0)
+    new_service(cache).get_session_token()
+    time.sleep(0.01)
+
+    assert new_service(cache).get_session_token() == 's1'
+    assert server == ['initSession', 'getActiveProfile']
+
+    server.valid_status = 401
+    time.sleep(0.01)
+    assert new_service(cache).get_session_token() == 's4'
+
+
+def test_expired_entry_is_dropped(tmp_path):
+    cache = SessionCache(str(tmp_path), ttl=0)
+    key = cache.key('http://glpi', 'app', 'user')
+    cache.put(key, 'token')
+    time.sleep(0.01)
+
+    assert cache.get(key) is None
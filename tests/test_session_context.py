@@ -0,0 +1,67 @@
+# Offline tests for the session context cache.
+
+from glpi import GLPI
+from glpi.item_profile import GlpiProfile
+from tests.helpers import FakeResponse
+
+
+def urls(calls):
+    return [url.rsplit('/', 1)[1] for _, url, _ in calls]
+
+
+def test_context_reads_are_cached_per_session(calls, service):
+    calls.body = FakeResponse({"active_profile": {"id": 4}})
+    assert service.get_path('getActiveProfile') == {
+        "active_profile": {"id": 4}}
+    assert service.get_path('/getActiveProfile/') == {
+        "active_profile": {"id": 4}}
+    service.get_path('getMyEntities', params={'is_recursive': True})
+    service.get_path('getMyEntities', params={'is_recursive': True})
+    assert urls(calls) == ['getActiveProfile', 'getMyEntities']
+
+    # changing the active profile invalidates the cache, also for the
+    # services sharing the session
+    clone = service.for_uri('changeActiveProfile')
+    calls.body = FakeResponse('')
+    clone.post(4, change='changeActiveProfile')
+    calls.body = FakeResponse({"active_profile": {"id": 6}})
+    assert service.get_path('getActiveProfile') == {
+        "active_profile": {"id": 6}}
+
+    # a renewed session starts with an empty cache
+    service.update_session_token('other-session')
+    service.get_path('getActiveProfile')
+    assert urls(calls) == ['getActiveProfile', 'getMyEntities',
+                           'changeActiveProfile', 'getActiveProfile',
+                           'getActiveProfile']
+
+
+def test_errors_are_not_cached(calls, service):
+    calls.body = FakeResponse(["ERROR_SESSION_TOKEN_INVALID", "x"],
+                              status_code=401)
+    service.get_path('getFullSession')
+    calls.body = FakeResponse({"session": {"glpiID": 2}})
+    assert service.get_path('getFullSession') == {"session": {"glpiID": 2}}
+    assert len(calls) == 2
+
+
+def test_glpi_and_profile_use_the_cache(calls):
+    glpi = GLPI('http://glpi/apirest.php', 'app', 'user')
+    glpi.init_api = None
+    glpi.api_session = 'session'
+    glpi.api_rest = GlpiProfile('http://glpi/apirest.php', 'app',
+                                username='u', password='p')
+    glpi.api_rest.session = 'session'
+
+    calls.body = FakeResponse({"myprofiles": [{"id": 4}]})
+    glpi.api_rest.get_my_profiles()
+    glpi.api_rest.get_my_profiles()
+    calls.body = FakeResponse({"active_entity": {"id": 0}})
+    glpi.get('getActiveEntities')
+    glpi.get('getActiveEntities')
+    calls.body = FakeResponse('')
+    glpi.post('changeActiveEntities', 3)
+    calls.body = FakeResponse({"active_entity": {"id": 3}})
+    assert glpi.get('getActiveEntities') == {"active_entity": {"id": 3}}
+    assert urls(calls) == ['getMyProfiles', 'getActiveEntities',
+                           'changeActiveEntities', 'getActiveEntities']
@@ -0,0 +1,53 @@
+# Offline tests for the incremental sync.
+
+from datetime import datetime
+
+from glpi import Mirror
+from glpi.sync import IncrementalSync
+from tests.helpers import FakeServer
+
+
+def test_incremental_sync_into_mirror():
+    server = FakeServer()
+    for i in range(1, 6):
+        server.put(i, '2024-01-01 10:00:0%d' % i)
+    mirror = Mirror(server, page_size=2)
+
+    result = mirror.sync('Ticket')
+    assert (result['inserted'], result['updated']) == (5, 0)
+    assert result['watermark'] == '2024-01-01 10:00:05'
+    assert server.searches == []
+
+    server.put(3, '2024-01-01 11:00:00', name='changed')
+    server.put(6, '2024-01-01 11:00:01')
+    del server.items[1]
+
+    result = mirror.sync('Ticket', overlap=0, scan_interval=0)
+    assert (result['inserted'], result['updated'],
+            result['deleted']) == (1, 1, 1)
+    assert server.fetched == [3, 6]
+    assert result['watermark'] == '2024-01-01 11:00:01'
+    assert mirror.get('Ticket', 3)['name'] == 'changed'
+    assert mirror.known_ids('Ticket') == set([2, 3, 4, 5, 6])
+    assert mirror.freshness('Ticket')['rows'] == 5
+    mirror.close()
+
+
+def test_search_pages_walk_by_date():
+    server = FakeServer()
+    sink = Mirror(server)
+    syncer = IncrementalSync(server, sink, page_size=2)
+    for i in range(1, 4):
+        server.put(i, '2024-01-01 10:00:00')
+    server.put(4, '2024-01-01 10:00:05')
+    server.put(5, '2024-01-01 10:00:09')
+
+    changed = list(syncer.changed_since('Ticket', datetime(2024, 1, 1)))
+    assert [i for i, _ in changed] == [1, 2, 3, 4, 5]
+    # pages restart after the last date seen, and move on by offset
+    # when a whole page has the same date
+    assert server.searches == [('2024-01-01 00:00:00', 0),
+                               ('2024-01-01 09:59:59', 0),
+                               ('2024-01-01 09:59:59', 2),
+                               ('2024-01-01 10:00:04', 0),
+                               ('2024-01-01 10:00:08', 0)]
@@ -0,0 +1,171 @@
+# Tests for the HTTP transports, against a local HTTP server.
+
+import json
+import time
+import threading
+
+import pytest
+
+from glpi.glpi import GlpiService, GlpiTimeout
+from glpi.multipart import MultipartStream
+from glpi.transport import RequestsTransport, Urllib3Transport, \
+    HttpxTransport
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.startswith('/apirest.php/initSession'):
+            return self._reply(200, {
+                'session_token': 'abc',
+                'authorization': self.headers.get('Authorization')})
+        if self.path.startswith('/apirest.php/slow'):
+            time.sleep(0.5)
+        if self.path.startswith('/apirest.php/Document/1'):
+            # the headers arrive, the rest of the body stalls
+            self.send_response(200)
+            self.send_header('Content-Length', '8')
+            self.end_headers()
+            self.wfile.write(b'abcd')
+            self.wfile.flush()
+            time.sleep(0.5)
+            try:
+                self.wfile.write(b'efgh')
+            except (IOError, OSError):
+                pass  # the client gave up
+            return
+        if self.path.startswith('/apirest.php/Computer'):
+            return self._reply(200, [{'id': 1}, {'id': 2}],
+                               {'Content-Range': '0-1/2'})
+        self._reply(200, {'path': self.path,
+                          'session': self.headers.get('Session-Token')})
+
+    def do_POST(self):
+        size = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(size).decode('utf-8')
+        self._reply(201, {'body': body,
+                          'type': self.headers.get('Content-Type')})
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield 'http://127.0.0.1:%d/apirest.php' % httpd.server_address[1]
+    httpd.shutdown()
+
+
+def transports():
+    yield RequestsTransport
+    yield Urllib3Transport
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        return
+    yield lambda: HttpxTransport(http2=False)
+
+
+@pytest.mark.parametrize('make_transport', list(transports()))
+def test_transport_requests(server, make_transport):
+    with make_transport() as transport:
+        service = GlpiService(server, 'app', '/Ticket',
+                              username='glpi', password='secret',
+                              transport=transport)
+        assert service.get_session_token() == 'abc'
+
+        result = service.get_path('Ticket', params={'range': '0-1',
+                                                    'is_deleted': True})
+        assert result['path'] == \
+            '/apirest.php/Ticket?range=0-1&is_deleted=true'
+        assert result['session'] == 'abc'
+        assert service.get_range('Computer', 0, 1) == \
+            ([{'id': 1}, {'id': 2}], 2)
+
+        response = service.request('POST', 'Ticket',
+                                   data='{"input": {"name": "x"}}')
+        assert response.status_code == 201
+        assert response.json()['body'] == '{"input": {"name": "x"}}'
+
+        upload = MultipartStream(fields=[('uploadManifest', '{}')])
+        response = service.request('POST', 'Document', data=upload,
+                                   headers={'Content-Type':
+                                            upload.content_type})
+        assert 'uploadManifest' in response.json()['body']
+
+        streamed = service.request('GET', 'Ticket', stream=True)
+        assert b''.join(streamed.iter_content(4)).startswith(b'{"path"')
+
+        with pytest.raises(GlpiTimeout):
+            service.request('GET', 'slow', timeout=(1, 0.1))
+
+
+@pytest.mark.parametrize('make_transport', list(transports())[1:])
+def test_stalled_stream_raises_glpi_timeout(server, make_transport):
+    with make_transport() as transport:
+        response = transport('GET', server + '/Document/1', stream=True,
+                             timeout=(1, 0.1))
+        with pytest.raises(GlpiTimeout):
+            b''.join(response.iter_content(4096))
+
+
+def test_basic_auth_header(server):
+    with Urllib3Transport() as transport:
+        response = transport('GET', server + '/initSession',
+                             auth=('glpi', 'secret'), timeout=5)
+        assert response.json()['authorization'] == \
+            'Basic Z2xwaTpzZWNyZXQ='
+
+
+def test_httpx_http2_transport(server):
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    # the test server speaks HTTP/1.1 only, which an HTTP/2 client
+    # negotiates down to over plain http
+    with HttpxTransport(http2=True, pool_size=4) as transport:
+        service = GlpiService(server, 'app', '/Ticket',
+                              username='glpi', password='secret',
+                              transport=transport)
+        assert service.get_session_token() == 'abc'
+
+        results = []
+
+        def fetch():
+            results.append(service.get_range('Computer', 0, 1))
+
+        threads = [threading.Thread(target=fetch) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [([{'id': 1}, {'id': 2}], 2)] * 8
+
+        response = service.request('POST', 'Ticket',
+                                   data='{"input": {"name": "x"}}')
+        assert response.json()['body'] == '{"input": {"name": "x"}}'
+        with pytest.raises(GlpiTimeout):
+            service.request('GET', 'slow', timeout=(1, 0.1))
@@ -0,0 +1,92 @@
+# Offline tests for the change watcher.
+
+import pytest
+
+from glpi.watcher import Watcher
+from tests.helpers import FakeServer
+
+
+def kinds(events):
+    return [(e.kind, e.item_id) for e in events]
+
+
+def test_events_and_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / 'watch.json')
+    server = FakeServer()
+    server.put(1, '2024-01-01 10:00:00')
+    server.items[1]['status'] = 1
+    server.put(2, '2024-01-01 10:00:00')
+
+    watcher = Watcher(server, ['Ticket'], checkpoint=checkpoint,
+                      min_interval=1, max_interval=4, scan_interval=0)
+    seen = []
+    watcher.on('status_changed', seen.append)
+    assert watcher.poll() == []
+    assert watcher.interval == 2
+
+    server.put(3, '2024-01-01 10:01:00')
+    server.items[1].update(status=2, date_mod='2024-01-01 10:01:00')
+    del server.items[2]
+    # a restarted watcher resumes from the checkpoint
+    watcher = Watcher(server, ['Ticket'], checkpoint=checkpoint,
+                      min_interval=1, max_interval=4, scan_interval=0)
+    watcher.on('status_changed', seen.append)
+    events = watcher.poll()
+    assert sorted(kinds(events)) == [('created', 3), ('deleted', 2),
+                                     ('status_changed', 1)]
+    assert [(e.item_id, e.old_status) for e in seen] == [(1, 1)]
+    assert watcher.interval == 1
+
+    # items fetched again by the overlap window are not reported
+    assert watcher.poll() == []
+    assert watcher.interval == 2
+
+
+def test_failed_poll_keeps_changes_for_the_next_one():
+    server = FakeServer()
+    server.put(1, '2024-01-01 10:00:00')
+    server.put(2, '2024-01-01 10:00:00')
+    watcher = Watcher(server, ['Ticket'], scan_interval=3600, page_size=1)
+    watcher.poll()
+
+    server.put(1, '2024-01-01 10:05:00', name='renamed')
+    server.put(2, '2024-01-01 10:06:00', name='renamed')
+    get_many = server.get_many
+    batches = []
+
+    def failing(ids):
+        # the first batch is applied, the second one fails
+        batches.append(ids)
+        if len(batches) == 2:
+            raise RuntimeError('connection lost')
+        return get_many(ids)
+
+    server.get_many = failing
+    with pytest.raises(RuntimeError):
+        watcher.poll()
+
+    server.get_many = get_many
+    assert kinds(watcher.poll()) == [('updated', 1), ('updated', 2)]
+
+
+def test_events_of_a_failed_callback_are_delivered_again():
+    server = FakeServer()
+    server.put(1, '2024-01-01 10:00:00')
+    watcher = Watcher(server, ['Ticket'], overlap=0, scan_interval=3600)
+    watcher.poll()
+
+    server.put(1, '2024-01-01 10:05:00', name='renamed')
+    server.put(2, '2024-01-01 10:06:00')
+    delivered = []
+
+    def callback(event):
+        if not delivered:
+            delivered.append(None)
+            raise RuntimeError('notification failed')
+        delivered.append((event.kind, event.item_id))
+
+    watcher.on(callback)
+    with pytest.raises(RuntimeError):
+        watcher.poll()
+    assert sorted(kinds(watcher.poll())) == [('created', 2), ('updated', 1)]
+    assert sorted(delivered[1:]) == [('created', 2), ('updated', 1)]
@@ -0,0 +1,92 @@
+# Offline tests for the write-behind queue.
+
+import threading
+
+import pytest
+
+from glpi.glpi import GlpiException
+from glpi.write_queue import WriteQueue
+
+
+class FakeService(object):
+    """ Array-input writes recorded per batch; sends can be held back. """
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+        self.sending = threading.Event()
+        self.next_id = 100
+
+    def for_uri(self, uri):
+        self.uri = uri
+        return self
+
+    def create_many(self, items):
+        self.release.wait()
+        self.batches.append(('create', list(items)))
+        results = []
+        for item in items:
+            if item.get('name'):
+                self.next_id += 1
+                results.append({'id': self.next_id, 'message': ''})
+            else:
+                results.append({'id': False, 'message': 'Name required'})
+        return results
+
+    def update_many(self, items):
+        self.sending.set()
+        self.release.wait()
+        self.batches.append(('update', [dict(i) for i in items]))
+        return [{str(i['id']): True, 'message': ''} for i in items]
+
+
+def test_creates_are_batched_and_resolved():
+    service = FakeService()
+    with WriteQueue(service, batch_size=3, max_delay=60) as queue:
+        futures = [queue.create('Ticket', {'name': 't%d' % i})
+                   for i in range(4)]
+        bad = queue.create('Ticket', {'name': ''})
+        # a full batch goes at once, the rest waits for flush()/close()
+        assert futures[0].result(timeout=5) == 101
+    assert [f.result() for f in futures] == [101, 102, 103, 104]
+    with pytest.raises(GlpiException) as error:
+        bad.result()
+    assert 'Name required' in str(error.value)
+    assert [len(items) for _, items in service.batches] == [3, 2]
+    assert queue.stats['failed'] == 1
+
+
+def test_updates_of_one_item_are_merged():
+    service = FakeService()
+    queue = WriteQueue(service, max_delay=60)
+    first = queue.update('Ticket', {'id': 7, 'status': 2})
+    second = queue.update('Ticket', {'id': 7, 'status': 5, 'urgency': 4})
+    queue.update('Ticket', {'id': 8, 'status': 1})
+    assert first is second
+    assert queue.flush(timeout=5)
+    assert first.result() is True
+    assert service.batches == [('update', [
+        {'id': 7, 'status': 5, 'urgency': 4}, {'id': 8, 'status': 1}])]
+    queue.close()
+    with pytest.raises(GlpiException):
+        queue.update('Ticket', {'id': 7, 'status': 6})
+
+
+def test_backpressure_and_ordering():
+    service = FakeService()
+    service.release.clear()
+    queue = WriteQueue(service, batch_size=1, max_delay=0, max_pending=2)
+    try:
+        queue.update('Ticket', {'id': 1, 'status': 2})
+        assert service.sending.wait(5)
+        # item 1 is in flight: this update waits for it, not merged
+        queue.update('Ticket', {'id': 1, 'status': 3})
+        # two writes pending while GLPI hangs: the next one has to wait
+        with pytest.raises(GlpiException):
+            queue.update('Ticket', {'id': 2, 'status': 1}, timeout=0.05)
+    finally:
+        service.release.set()
+    queue.close()
+    assert service.batches == [('update', [{'id': 1, 'status': 2}]),
+                               ('update', [{'id': 1, 'status': 3}])]